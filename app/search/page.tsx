@@ -19,9 +19,9 @@ interface Product {
 
 interface SearchResponse {
   results: Product[]
-  total: number
-  page: number
-  pages: number
+  total?: number
+  next_cursor: string | null
+  previous_cursor: string | null
   has_next: boolean
   has_previous: boolean
 }
@@ -32,7 +32,7 @@ export default function SearchPage() {
   const [results, setResults] = useState<Product[]>([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState("")
-  const [pagination, setPagination] = useState({ page: 1, pages: 1, total: 0 })
+  const [pagination, setPagination] = useState({ nextCursor: null as string | null, total: 0 })
 
   useEffect(() => {
     if (!query) {
@@ -43,10 +43,10 @@ export default function SearchPage() {
     const fetchResults = async () => {
       try {
         setLoading(true)
-        const response = await fetch(`/api/search/?q=${encodeURIComponent(query)}&page=1`)
+        const response = await fetch(`/api/search/?q=${encodeURIComponent(query)}&with_total=1`)
         const data: SearchResponse = await response.json()
         setResults(data.results)
-        setPagination({ page: data.page, pages: data.pages, total: data.total })
+        setPagination({ nextCursor: data.next_cursor, total: data.total ?? data.results.length })
         setError("")
       } catch (err) {
         setError("Failed to fetch search results")
@@ -140,7 +140,7 @@ export default function SearchPage() {
 
             {/* Pagination info */}
             <div className="text-center text-sm text-muted-foreground">
-              Page {pagination.page} of {pagination.pages}
+              Showing {results.length} of {pagination.total}{pagination.nextCursor ? " (more available)" : ""}
             </div>
           </>
         )}
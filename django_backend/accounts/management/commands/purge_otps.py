@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from accounts import otp
+from josmee_shop.ratelimit import TokenBucket
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and used OTP codes and refilled rate-limit buckets (only needed with the "database" stores; run from cron)'
+
+    def handle(self, *args, **options):
+        deleted = otp.STORES['database'].purge()
+        buckets = TokenBucket.purge()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} OTP code(s) and {buckets} rate-limit bucket(s).'))
@@ -162,3 +162,14 @@ class SellerDocument(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.get_document_type_display()}"
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket state for ``josmee_shop.ratelimit`` when ``RATELIMIT_STORE = "database"``"""
+
+    key = models.CharField(max_length=255, unique=True)
+    # Theoretical arrival time of the next request, in epoch seconds (GCRA)
+    tat = models.FloatField()
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,175 @@
+"""
+One-time phone verification codes.
+
+Codes live in a TTL store selected by ``OTP_STORE``: ``cache`` keeps them in
+the shared cache, where they simply expire, so OTP traffic never touches the
+database; ``database`` keeps them in ``OTPVerification`` rows, which are
+deleted once used or superseded, and by the ``purge_otps`` command once
+expired. Wrong guesses are counted atomically (cache ``incr`` or a
+conditional ``UPDATE``), and code requests are rate limited per phone and per
+client IP with token buckets.
+"""
+import hmac
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+
+from josmee_shop.ratelimit import TokenBucket
+from .models import OTPVerification
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+def ttl():
+    return getattr(settings, 'OTP_TTL', 600)
+
+
+def max_attempts():
+    return getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+
+
+class CacheStore:
+    """Codes as cache entries that expire on their own; the attempt counter is a separate key"""
+
+    def _keys(self, token):
+        return f'otp:{token}', f'otp-attempts:{token}'
+
+    def issue(self, phone, code):
+        token = secrets.token_urlsafe(16)
+        code_key, attempts_key = self._keys(token)
+        cache.set_many({code_key: {'phone': phone, 'code': code}, attempts_key: 0}, ttl())
+        return token
+
+    def get(self, token):
+        """``{'phone', 'code'}`` while the code is usable, else ``None``"""
+        code_key, attempts_key = self._keys(token)
+        found = cache.get_many([code_key, attempts_key])
+        if found.get(attempts_key, 0) >= max_attempts():
+            return None
+        return found.get(code_key)
+
+    def attempts(self, token):
+        return cache.get(self._keys(token)[1], 0)
+
+    def check(self, token, code):
+        code_key, attempts_key = self._keys(token)
+        entry = cache.get(code_key)
+        if entry is None:
+            return EXPIRED, 0
+        try:
+            attempts = cache.incr(attempts_key)
+        except ValueError:
+            return EXPIRED, 0
+        if attempts > max_attempts():
+            return LOCKED, 0
+        if hmac.compare_digest(entry['code'], code):
+            cache.delete_many([code_key, attempts_key])
+            return VERIFIED, 0
+        return INVALID, max_attempts() - attempts
+
+    def discard(self, token):
+        cache.delete_many(self._keys(token))
+
+    def purge(self):
+        return 0
+
+
+class DatabaseStore:
+    """Codes as ``OTPVerification`` rows, kept to at most one per phone"""
+
+    def issue(self, phone, code):
+        # The new code supersedes any earlier one for this phone
+        OTPVerification.objects.filter(phone=phone).delete()
+        otp = OTPVerification.objects.create(
+            phone=phone, otp=code, expires_at=timezone.now() + timedelta(seconds=ttl())
+        )
+        return str(otp.pk)
+
+    def _usable(self, token):
+        if not str(token).isdigit():
+            return OTPVerification.objects.none()
+        return OTPVerification.objects.filter(pk=token, is_verified=False, expires_at__gt=timezone.now())
+
+    def get(self, token):
+        otp = self._usable(token).filter(attempts__lt=max_attempts()).first()
+        return {'phone': otp.phone, 'code': otp.otp} if otp else None
+
+    def attempts(self, token):
+        return self._usable(token).values_list('attempts', flat=True).first() or 0
+
+    def check(self, token, code):
+        usable = self._usable(token)
+        # Count the guess first, only while attempts remain, so parallel guesses cannot exceed the limit
+        if not usable.filter(attempts__lt=max_attempts()).update(attempts=F('attempts') + 1):
+            return (LOCKED, 0) if usable.exists() else (EXPIRED, 0)
+        otp = usable.first()
+        if otp is None:
+            # Expired (or used) between the counting UPDATE and this read
+            return EXPIRED, 0
+        if hmac.compare_digest(otp.otp, code):
+            otp.delete()
+            return VERIFIED, 0
+        return INVALID, max_attempts() - otp.attempts
+
+    def discard(self, token):
+        if str(token).isdigit():
+            OTPVerification.objects.filter(pk=token).delete()
+
+    def purge(self):
+        """Delete expired and used codes; returns how many"""
+        deleted, _ = OTPVerification.objects.filter(
+            Q(expires_at__lte=timezone.now()) | Q(is_verified=True)
+        ).delete()
+        return deleted
+
+
+STORES = {'cache': CacheStore(), 'database': DatabaseStore()}
+
+
+def store():
+    return STORES[getattr(settings, 'OTP_STORE', 'cache')]
+
+
+def _buckets():
+    limits = getattr(settings, 'OTP_RATE_LIMITS', {'phone': (3, 600), 'ip': (10, 3600)})
+    return {name: TokenBucket(f'otp-{name}', *limit) for name, limit in limits.items()}
+
+
+def rate_limited(phone, ip):
+    """Take a token for this code request; returns seconds to wait, or 0 when allowed"""
+    buckets = _buckets()
+    for name, identity in (('ip', ip), ('phone', phone)):
+        if name in buckets and identity:
+            allowed, retry_after = buckets[name].consume(identity)
+            if not allowed:
+                return max(1, int(retry_after))
+    return 0
+
+
+def issue(phone):
+    """Create a code for ``phone``; returns the token to keep in the session"""
+    return store().issue(phone, OTPVerification.generate_otp())
+
+
+def get(token):
+    return store().get(token)
+
+
+def check(token, code):
+    """``(status, attempts_remaining)`` for a guess; a verified code is used up"""
+    return store().check(token, code)
+
+
+def attempts_remaining(token):
+    return max(0, max_attempts() - store().attempts(token))
+
+
+def discard(token):
+    store().discard(token)
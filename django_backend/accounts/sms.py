@@ -0,0 +1,250 @@
+"""
+SMS gateway.
+
+``send_sms()`` tries the configured providers in order (``SMS_PROVIDERS``, or
+every provider with credentials) and fails over to the next one on error.
+A provider that keeps failing is skipped for ``SMS_PROVIDER_COOLDOWN``
+seconds from its last failure; its failure count and cooldown live in the
+cache, so all workers share them.
+Provider clients and HTTP sessions are created once per process and reused,
+so a send costs one request on an already open connection.
+
+Sending is slow, so callers queue it (see ``accounts.tasks.send_otp``) rather
+than calling this from a view.
+"""
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds
+HTTP_TIMEOUT = (3, 5)
+HEALTH_KEY = 'sms-provider-failures:'
+# Set for the whole cooldown once a provider reaches the failure threshold
+TRIPPED_KEY = 'sms-provider-tripped:'
+
+
+class SmsError(Exception):
+    """A provider could not deliver the message"""
+
+
+class SmsDeliveryError(SmsError):
+    """No provider could deliver the message"""
+
+
+class Provider:
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+
+    def is_configured(self):
+        return True
+
+    def client(self):
+        """The provider's client or HTTP session, created on first use"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.create_client()
+        return self._client
+
+    def create_client(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=getattr(settings, 'SMS_POOL_SIZE', 10))
+        session.mount('https://', adapter)
+        return session
+
+    def send(self, phone, message):
+        """Deliver ``message``; returns the provider's message id or raises ``SmsError``"""
+        raise NotImplementedError
+
+
+class TwilioProvider(Provider):
+    name = 'twilio'
+
+    def is_configured(self):
+        return bool(settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN and settings.TWILIO_PHONE_NUMBER)
+
+    def create_client(self):
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+        http_client = TwilioHttpClient(pool_connections=True, timeout=sum(HTTP_TIMEOUT))
+        return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+
+    def send(self, phone, message):
+        try:
+            result = self.client().messages.create(body=message, from_=settings.TWILIO_PHONE_NUMBER, to=phone)
+        except Exception as exc:
+            raise SmsError(str(exc)) from exc
+        return result.sid
+
+
+class SnsProvider(Provider):
+    name = 'sns'
+
+    def is_configured(self):
+        return bool(settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY)
+
+    def create_client(self):
+        import boto3
+        from botocore.config import Config
+        return boto3.client(
+            'sns',
+            region_name=settings.AWS_REGION,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            config=Config(
+                connect_timeout=HTTP_TIMEOUT[0],
+                read_timeout=HTTP_TIMEOUT[1],
+                max_pool_connections=getattr(settings, 'SMS_POOL_SIZE', 10),
+                retries={'max_attempts': 1},
+            ),
+        )
+
+    def send(self, phone, message):
+        try:
+            response = self.client().publish(PhoneNumber=phone, Message=message)
+        except Exception as exc:
+            raise SmsError(str(exc)) from exc
+        return response['MessageId']
+
+
+class HttpProvider(Provider):
+    url = None
+
+    def request(self, phone, message):
+        """``requests`` keyword arguments for the POST"""
+        raise NotImplementedError
+
+    def send(self, phone, message):
+        try:
+            response = self.client().post(self.url, timeout=HTTP_TIMEOUT, **self.request(phone, message))
+        except requests.RequestException as exc:
+            raise SmsError(str(exc)) from exc
+        if response.status_code != 200:
+            raise SmsError(f'{self.name} answered {response.status_code}: {response.text[:200]}')
+        return ''
+
+
+class Fast2SmsProvider(HttpProvider):
+    name = 'fast2sms'
+    url = 'https://www.fast2sms.com/dev/bulkV2'
+
+    def is_configured(self):
+        return bool(settings.FAST2SMS_API_KEY)
+
+    def request(self, phone, message):
+        return {
+            'data': {'route': 'q', 'message': message, 'language': 'english', 'flash': 0, 'numbers': phone},
+            'headers': {'authorization': settings.FAST2SMS_API_KEY},
+        }
+
+
+class Msg91Provider(HttpProvider):
+    name = 'msg91'
+    url = 'https://api.msg91.com/apiv5/flow/'
+
+    def is_configured(self):
+        return bool(settings.MSG91_AUTH_KEY)
+
+    def request(self, phone, message):
+        return {
+            'data': {'route': '4', 'sender': 'KARUP', 'mobiles': phone, 'message': message, 'authkey': settings.MSG91_AUTH_KEY},
+        }
+
+
+class ConsoleProvider(Provider):
+    """Development fallback when no provider has credentials: logs the message"""
+    name = 'console'
+
+    def send(self, phone, message):
+        logger.warning('No SMS provider configured. SMS to %s: %s', phone, message)
+        return ''
+
+
+class FakeProvider(Provider):
+    """
+    In-memory provider for tests: sent messages are appended to ``outbox``.
+
+    Set ``fail`` to make every send raise, to exercise failover.
+    """
+    name = 'fake'
+    outbox = []
+    fail = False
+
+    def send(self, phone, message):
+        if self.fail:
+            raise SmsError('fake provider set to fail')
+        self.outbox.append({'phone': phone, 'message': message})
+        return str(len(self.outbox))
+
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (TwilioProvider(), SnsProvider(), Fast2SmsProvider(), Msg91Provider(), ConsoleProvider(), FakeProvider())
+}
+AUTO_ORDER = ('twilio', 'sns', 'fast2sms', 'msg91')
+
+
+def active_providers():
+    """Providers to try, in order: ``SMS_PROVIDERS`` or those with credentials"""
+    names = getattr(settings, 'SMS_PROVIDERS', None)
+    if names:
+        return [PROVIDERS[name] for name in names]
+    configured = [PROVIDERS[name] for name in AUTO_ORDER if PROVIDERS[name].is_configured()]
+    return configured or [PROVIDERS['console']]
+
+
+def is_healthy(provider):
+    return not cache.get(TRIPPED_KEY + provider.name)
+
+
+def _record_failure(provider):
+    key = HEALTH_KEY + provider.name
+    cooldown = getattr(settings, 'SMS_PROVIDER_COOLDOWN', 60)
+    failures = 1
+    if not cache.add(key, 1, cooldown):
+        try:
+            failures = cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, cooldown)
+    if failures >= getattr(settings, 'SMS_PROVIDER_FAILURE_THRESHOLD', 3):
+        # The counter expires relative to the first failure; the cooldown starts now
+        cache.set(TRIPPED_KEY + provider.name, True, cooldown)
+
+
+def send_sms(phone, message):
+    """
+    Send ``message`` to ``phone``; returns the name of the provider that delivered it.
+
+    Healthy providers are tried first, in order; providers in cooldown are
+    only tried once every healthy one has failed. Raises ``SmsDeliveryError``
+    if none succeeds.
+    """
+    healthy, cooling_down = [], []
+    for provider in active_providers():
+        (healthy if is_healthy(provider) else cooling_down).append(provider)
+    errors = []
+    for provider in healthy + cooling_down:
+        try:
+            message_id = provider.send(phone, message)
+        except SmsError as exc:
+            logger.warning('SMS via %s failed: %s', provider.name, exc)
+            _record_failure(provider)
+            errors.append(f'{provider.name}: {exc}')
+            continue
+        cache.delete_many([HEALTH_KEY + provider.name, TRIPPED_KEY + provider.name])
+        logger.info('SMS sent via %s (%s)', provider.name, message_id)
+        return provider.name
+    raise SmsDeliveryError('; '.join(errors))
+
+
+def send_otp_sms(phone, otp):
+    return send_sms(phone, f'Your OTP is: {otp}. Valid for 10 minutes. Do not share this code.')
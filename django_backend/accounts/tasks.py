@@ -0,0 +1,13 @@
+from jobs.queue import task
+from . import otp as otp_codes
+from .sms import send_otp_sms
+
+
+@task(max_attempts=3, priority=10, retry_backoff=5)
+def send_otp(token):
+    """Deliver an OTP by SMS; retried a few times while the code is still usable"""
+    code = otp_codes.get(token)
+    if code is None:
+        return
+    # Raises SmsDeliveryError when every provider failed, which retries the job
+    send_otp_sms(code['phone'], code['code'])
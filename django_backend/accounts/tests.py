@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from josmee_shop.ratelimit import TokenBucket
+from . import otp, sms
+from .models import OTPVerification
+
+
+@override_settings(SMS_PROVIDERS=['fake', 'console'], SMS_PROVIDER_FAILURE_THRESHOLD=3, SMS_PROVIDER_COOLDOWN=60)
+class ProviderCooldownTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.fake = sms.PROVIDERS['fake']
+        self.fake.fail = True
+        self.addCleanup(setattr, self.fake, 'fail', False)
+        self.start = self.now = 1_000_000.0
+        clock = mock.patch('time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def fail_at(self, *seconds):
+        """Send at ``seconds`` after the start; the fake provider fails and the console delivers"""
+        for offset in seconds:
+            self.now = self.start + offset
+            self.assertEqual(sms.send_sms('+100', 'hi'), 'console')
+
+    def test_cooldown_runs_from_the_failure_that_tripped_it(self):
+        self.fail_at(0, 50)
+        self.assertTrue(sms.is_healthy(self.fake))
+        self.fail_at(55)
+        self.assertFalse(sms.is_healthy(self.fake))
+
+        # The failure count has expired, but the cooldown runs until 55 + 60
+        self.now = self.start + 70
+        self.assertFalse(sms.is_healthy(self.fake))
+        self.now = self.start + 116
+        self.assertTrue(sms.is_healthy(self.fake))
+
+    @override_settings(SMS_PROVIDERS=['fake'])
+    def test_success_resets_the_provider(self):
+        for _ in range(3):
+            with self.assertRaises(sms.SmsDeliveryError):
+                sms.send_sms('+100', 'hi')
+        self.assertFalse(sms.is_healthy(self.fake))
+        # A provider in cooldown is still tried when nothing else is left
+        self.fake.fail = False
+        self.assertEqual(sms.send_sms('+100', 'hi'), 'fake')
+        self.assertTrue(sms.is_healthy(self.fake))
+
+
+@override_settings(OTP_STORE='database')
+class DatabaseOtpStoreTests(TestCase):
+    def test_code_expiring_during_a_guess_is_expired(self):
+        token = otp.issue('+100')
+        # The code is used up by a parallel guess right after this guess was counted
+        update = QuerySet.update
+
+        def update_then_delete(queryset, **kwargs):
+            count = update(queryset, **kwargs)
+            OTPVerification.objects.filter(pk=token).delete()
+            return count
+
+        with mock.patch.object(QuerySet, 'update', update_then_delete):
+            self.assertEqual(otp.check(token, '000000'), (otp.EXPIRED, 0))
+
+
+@override_settings(RATELIMIT_STORE='database')
+class DatabaseTokenBucketTests(TransactionTestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = mock.patch('time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_bucket_empties_and_refills(self):
+        bucket = TokenBucket('test', 3, 60)
+        self.assertEqual([bucket.consume('a')[0] for _ in range(4)], [True, True, True, False])
+        self.assertEqual(bucket.consume('a'), (False, 20))
+        self.assertTrue(bucket.consume('b')[0])
+        # One token is back every 20 seconds
+        self.now += 20
+        self.assertEqual([bucket.consume('a')[0] for _ in range(2)], [True, False])
+        self.now += 60
+        self.assertEqual(TokenBucket.purge(), 2)
+
+    def test_parallel_requests_take_only_the_tokens_there_are(self):
+        bucket = TokenBucket('test', 5, 60)
+
+        def consume(_):
+            try:
+                return bucket.consume('a')[0]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            allowed = list(pool.map(consume, range(20)))
+        self.assertEqual(allowed.count(True), 5)
+
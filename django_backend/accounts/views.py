@@ -5,98 +5,10 @@ from django.contrib import messages
 from django.urls import reverse
 from django.http import JsonResponse
 from .forms import UserRegistrationForm, UserLoginForm, UserProfileForm, AddressForm, PhoneVerificationForm, OTPVerificationForm, SellerDocumentForm
-from .models import CustomUser, Address, OTPVerification, SellerDocument
-import requests
-import os
-
-
-def send_otp_sms(phone, otp):
-    """Send OTP via SMS using a reliable service"""
-    try:
-        # Option 1: Using Twilio (recommended for production)
-        twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID')
-        twilio_auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-        twilio_phone = os.getenv('TWILIO_PHONE_NUMBER')
-        
-        if twilio_account_sid and twilio_auth_token and twilio_phone:
-            from twilio.rest import Client
-            client = Client(twilio_account_sid, twilio_auth_token)
-            message = client.messages.create(
-                body=f'Your OTP is: {otp}. Valid for 10 minutes. Do not share this code.',
-                from_=twilio_phone,
-                to=phone
-            )
-            print(f"[v0] SMS sent successfully via Twilio. SID: {message.sid}")
-            return True
-        
-        # Option 2: Using AWS SNS
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        
-        if aws_access_key and aws_secret_key:
-            import boto3
-            sns_client = boto3.client(
-                'sns',
-                region_name=os.getenv('AWS_REGION', 'us-east-1'),
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key
-            )
-            response = sns_client.publish(
-                PhoneNumber=phone,
-                Message=f'Your OTP is: {otp}. Valid for 10 minutes. Do not share this code.'
-            )
-            print(f"[v0] SMS sent successfully via AWS SNS. MessageId: {response['MessageId']}")
-            return True
-        
-        # Option 3: Using Fast2SMS (Indian SMS service - free tier available)
-        fast2sms_key = os.getenv('FAST2SMS_API_KEY')
-        if fast2sms_key:
-            url = "https://www.fast2sms.com/dev/bulkV2"
-            payload = {
-                "route": "q",
-                "message": f"Your OTP is: {otp}. Valid for 10 minutes. Do not share this code.",
-                "language": "english",
-                "flash": 0,
-                "numbers": phone
-            }
-            headers = {
-                "authorization": fast2sms_key
-            }
-            response = requests.post(url, data=payload, headers=headers, timeout=10)
-            if response.status_code == 200:
-                print(f"[v0] SMS sent successfully via Fast2SMS")
-                return True
-            else:
-                print(f"[v0] Fast2SMS error: {response.text}")
-                return False
-        
-        # Option 4: Using MSG91 (Indian SMS service)
-        msg91_key = os.getenv('MSG91_AUTH_KEY')
-        if msg91_key:
-            url = "https://api.msg91.com/apiv5/flow/"
-            payload = {
-                "route": "4",
-                "sender": "KARUP",
-                "mobiles": phone,
-                "message": f"Your OTP is: {otp}. Valid for 10 minutes. Do not share this code.",
-                "authkey": msg91_key
-            }
-            response = requests.post(url, data=payload, timeout=10)
-            if response.status_code == 200:
-                print(f"[v0] SMS sent successfully via MSG91")
-                return True
-            else:
-                print(f"[v0] MSG91 error: {response.text}")
-                return False
-        
-        # Fallback: Log to console for development
-        print(f"[v0] WARNING: No SMS service configured. OTP for {phone}: {otp}")
-        print(f"[v0] Configure one of: TWILIO_ACCOUNT_SID, AWS_ACCESS_KEY_ID, FAST2SMS_API_KEY, or MSG91_AUTH_KEY")
-        return False
-        
-    except Exception as e:
-        print(f"[v0] Error sending SMS: {str(e)}")
-        return False
+from .models import CustomUser, Address, SellerDocument
+from . import otp as otp_codes
+from jobs.queue import enqueue
+from josmee_shop.ratelimit import client_ip
 
 
 def phone_verification_view(request):
@@ -108,23 +20,22 @@ def phone_verification_view(request):
         form = PhoneVerificationForm(request.POST)
         if form.is_valid():
             phone = form.cleaned_data.get('phone')
+            wait = otp_codes.rate_limited(phone, client_ip(request))
+            if wait:
+                messages.error(request, f'Too many OTP requests. Please try again in {wait // 60 + 1} minute(s).')
+                return render(request, 'accounts/phone_verification.html', {'form': form})
+            
             # Create OTP
-            otp = OTPVerification.create_otp(phone)
+            token = otp_codes.issue(phone)
+            # The SMS is sent by a background job so the page doesn't wait on the gateway
+            enqueue('accounts.send_otp', {'token': token})
             
-            sms_sent = send_otp_sms(phone, otp.otp)
+            # Store phone in session for next step
+            request.session['phone_for_verification'] = phone
+            request.session['otp_token'] = token
             
-            if sms_sent:
-                # Store phone in session for next step
-                request.session['phone_for_verification'] = phone
-                request.session['otp_id'] = otp.id
-                
-                messages.success(request, f'OTP sent to {phone}. Please check your SMS.')
-                return redirect('accounts:verify_otp')
-            else:
-                messages.warning(request, f'OTP created but SMS delivery failed. OTP: {otp.otp} (for testing only)')
-                request.session['phone_for_verification'] = phone
-                request.session['otp_id'] = otp.id
-                return redirect('accounts:verify_otp')
+            messages.success(request, f'OTP sent to {phone}. Please check your SMS.')
+            return redirect('accounts:verify_otp')
     else:
         form = PhoneVerificationForm()
     
@@ -137,53 +48,44 @@ def verify_otp_view(request):
         return redirect('accounts:dashboard')
     
     phone = request.session.get('phone_for_verification')
-    otp_id = request.session.get('otp_id')
+    token = request.session.get('otp_token')
     
-    if not phone or not otp_id:
+    if not phone or not token:
         messages.error(request, 'Please start the verification process again.')
         return redirect('accounts:phone_verification')
     
-    try:
-        otp_obj = OTPVerification.objects.get(id=otp_id)
-    except OTPVerification.DoesNotExist:
-        messages.error(request, 'OTP expired. Please try again.')
-        return redirect('accounts:phone_verification')
-    
+    attempts_remaining = None
     if request.method == 'POST':
         form = OTPVerificationForm(request.POST)
         if form.is_valid():
-            entered_otp = form.cleaned_data.get('otp')
+            status, attempts_remaining = otp_codes.check(token, form.cleaned_data.get('otp'))
             
-            if otp_obj.is_expired():
+            if status == otp_codes.EXPIRED:
                 messages.error(request, 'OTP has expired. Please request a new one.')
                 return redirect('accounts:phone_verification')
             
-            if otp_obj.attempts >= 5:
+            if status == otp_codes.LOCKED:
+                otp_codes.discard(token)
                 messages.error(request, 'Too many attempts. Please request a new OTP.')
                 return redirect('accounts:phone_verification')
             
-            if otp_obj.otp == entered_otp:
-                otp_obj.is_verified = True
-                otp_obj.save()
-                
+            if status == otp_codes.VERIFIED:
                 # Store verified phone in session
                 request.session['verified_phone'] = phone
                 del request.session['phone_for_verification']
-                del request.session['otp_id']
+                del request.session['otp_token']
                 
                 messages.success(request, 'Phone verified successfully!')
                 return redirect('accounts:register')
             else:
-                otp_obj.attempts += 1
-                otp_obj.save()
-                messages.error(request, f'Invalid OTP. {5 - otp_obj.attempts} attempts remaining.')
+                messages.error(request, f'Invalid OTP. {attempts_remaining} attempts remaining.')
     else:
         form = OTPVerificationForm()
     
     context = {
         'form': form,
         'phone': phone,
-        'attempts_remaining': 5 - otp_obj.attempts
+        'attempts_remaining': otp_codes.attempts_remaining(token) if attempts_remaining is None else attempts_remaining,
     }
     return render(request, 'accounts/verify_otp.html', context)
 
@@ -195,11 +97,16 @@ def resend_otp_view(request):
         if not phone:
             return JsonResponse({'error': 'Phone not found'}, status=400)
         
-        # Create new OTP
-        otp = OTPVerification.create_otp(phone)
-        send_otp_sms(phone, otp.otp)
+        wait = otp_codes.rate_limited(phone, client_ip(request))
+        if wait:
+            return JsonResponse({'error': f'Too many OTP requests. Try again in {wait} seconds.'}, status=429)
+        
+        # Create new OTP, replacing the previous one
+        otp_codes.discard(request.session.get('otp_token', ''))
+        token = otp_codes.issue(phone)
+        enqueue('accounts.send_otp', {'token': token})
         
-        request.session['otp_id'] = otp.id
+        request.session['otp_token'] = token
         return JsonResponse({'success': True, 'message': 'OTP resent successfully'})
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
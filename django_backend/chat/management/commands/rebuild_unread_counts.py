@@ -0,0 +1,42 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from chat.models import Conversation, Message
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized unread message counters on every conversation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report conversations that drifted')
+
+    def handle(self, *args, **options):
+        # Unread messages per (conversation, sender) in one grouped query
+        unread = defaultdict(dict)
+        rows = Message.objects.filter(is_read=False).values('conversation_id', 'sender_id').annotate(total=Count('id'))
+        for row in rows:
+            unread[row['conversation_id']][row['sender_id']] = row['total']
+
+        drifted = []
+        conversations = Conversation.objects.only(
+            'id', 'buyer_id', 'seller_id', 'buyer_unread_count', 'seller_unread_count'
+        )
+        for conversation in conversations.iterator():
+            by_sender = unread.get(conversation.id, {})
+            total = sum(by_sender.values())
+            buyer_unread = total - by_sender.get(conversation.buyer_id, 0)
+            seller_unread = total - by_sender.get(conversation.seller_id, 0)
+            if (conversation.buyer_unread_count, conversation.seller_unread_count) != (buyer_unread, seller_unread):
+                conversation.buyer_unread_count = buyer_unread
+                conversation.seller_unread_count = seller_unread
+                drifted.append(conversation)
+
+        if not options['dry_run']:
+            Conversation.objects.bulk_update(
+                drifted, ['buyer_unread_count', 'seller_unread_count'], batch_size=500
+            )
+            user_ids = {c.buyer_id for c in drifted} | {c.seller_id for c in drifted}
+            Conversation.forget_unread(*user_ids)
+
+        verb = 'need fixing' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} conversation(s) {verb}.'))
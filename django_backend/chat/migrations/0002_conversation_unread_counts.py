@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:19
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+
+    def unread_from(participant):
+        return Coalesce(Subquery(
+            Message.objects.filter(conversation=OuterRef('pk'), is_read=False)
+            .exclude(sender=OuterRef(participant))
+            .values('conversation')
+            .annotate(total=Count('id'))
+            .values('total')
+        ), Value(0))
+
+    Conversation.objects.update(
+        buyer_unread_count=unread_from('buyer'),
+        seller_unread_count=unread_from('seller'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='buyer_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='seller_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
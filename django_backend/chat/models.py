@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.db import models
 from accounts.models import CustomUser
 from store.models import Shop, Product
@@ -13,6 +14,10 @@ class Conversation(models.Model):
     # Status
     is_active = models.BooleanField(default=True)
     
+    # Denormalized unread counters, maintained by chat.signals and the mark-read path
+    buyer_unread_count = models.PositiveIntegerField(default=0)
+    seller_unread_count = models.PositiveIntegerField(default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -27,9 +32,43 @@ class Conversation(models.Model):
     def last_message(self):
         return self.messages.first()
     
+    def unread_field(self, user):
+        """Name of the counter holding unread messages for this participant"""
+        return 'buyer_unread_count' if user.pk == self.buyer_id else 'seller_unread_count'
+    
     def unread_count(self, user):
         """Get unread message count for a user"""
-        return self.messages.filter(is_read=False).exclude(sender=user).count()
+        return getattr(self, self.unread_field(user))
+    
+    @staticmethod
+    def unread_cache_key(user_id):
+        return f'chat:unread:{user_id}'
+    
+    @classmethod
+    def cached_total_unread(cls, user):
+        """total_unread, cached until a message is sent to or read by the user"""
+        key = cls.unread_cache_key(user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = cls.total_unread(user)
+            cache.set(key, count, 60 * 60)
+        return count
+    
+    @classmethod
+    def forget_unread(cls, *user_ids):
+        cache.delete_many([cls.unread_cache_key(user_id) for user_id in user_ids])
+    
+    @classmethod
+    def total_unread(cls, user):
+        """Unread messages across all of a user's conversations, in one query"""
+        return cls.objects.filter(
+            models.Q(buyer=user) | models.Q(seller=user)
+        ).aggregate(
+            total=models.Sum(models.Case(
+                models.When(buyer=user, then='buyer_unread_count'),
+                default='seller_unread_count',
+            ))
+        )['total'] or 0
 
 
 class Message(models.Model):
@@ -49,6 +88,11 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['conversation', '-created_at'], name='message_conv_created_idx'),
+            # Mark-as-read only touches the unread tail of a conversation
+            models.Index(fields=['conversation', 'sender'], condition=models.Q(is_read=False), name='message_conv_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.message[:50]}"
@@ -0,0 +1,35 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Conversation, Message
+
+
+def _recipient(message):
+    """(counter field, user id) of the participant who did not send the message"""
+    conversation = message.conversation
+    if message.sender_id == conversation.buyer_id:
+        return 'seller_unread_count', conversation.seller_id
+    return 'buyer_unread_count', conversation.buyer_id
+
+
+@receiver(post_save, sender=Message)
+def increment_unread_count(sender, instance, created, **kwargs):
+    """Bump the recipient's unread counter when a message is sent"""
+    if created and not instance.is_read:
+        field, recipient_id = _recipient(instance)
+        Conversation.objects.filter(pk=instance.conversation_id).update(**{field: F(field) + 1})
+        Conversation.forget_unread(recipient_id)
+
+
+@receiver(post_delete, sender=Message)
+def decrement_unread_count(sender, instance, **kwargs):
+    """Keep the counter in step when an unread message is removed"""
+    if instance.is_read:
+        return
+    try:
+        field, recipient_id = _recipient(instance)
+    except Conversation.DoesNotExist:
+        # Conversation is being deleted along with its messages
+        return
+    Conversation.objects.filter(pk=instance.conversation_id, **{f'{field}__gt': 0}).update(**{field: F(field) - 1})
+    Conversation.forget_unread(recipient_id)
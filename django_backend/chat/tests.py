@@ -0,0 +1,27 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from accounts.models import CustomUser
+from shops.models import Shop
+from .models import Conversation, Message
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are read from SQLite EXPLAIN QUERY PLAN')
+class UnreadQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        shop = Shop.objects.create(owner=cls.seller, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        cls.conversation = Conversation.objects.create(buyer=buyer, seller=cls.seller, shop=shop)
+        Message.objects.bulk_create([
+            Message(conversation=cls.conversation, sender=buyer if n % 2 else cls.seller, message=f'hi {n}', is_read=n < 30)
+            for n in range(40)
+        ])
+
+    def test_unread_lookup_uses_partial_index(self):
+        # The lookup behind marking a conversation read
+        unread = Message.objects.filter(conversation=self.conversation, is_read=False).exclude(sender=self.seller)
+        self.assertIn('USING INDEX message_conv_unread_idx', unread.order_by().explain())
@@ -3,7 +3,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
-from django.db.models import Q, Count, Max
+from django.db.models import Q, Count, Max, F, Value
+from django.db.models.functions import Greatest
 from .models import Conversation, Message
 from store.models import Shop, Product
 
@@ -17,7 +18,7 @@ def conversation_list(request):
         is_active=True
     ).select_related('buyer', 'seller', 'shop', 'product').prefetch_related('messages')
     
-    # Add unread count to each conversation
+    # Add unread count to each conversation (denormalized, no extra query)
     for conv in conversations:
         conv.unread = conv.unread_count(request.user)
     
@@ -42,10 +43,16 @@ def conversation_detail(request, conversation_id):
         return redirect('chat:conversation_list')
     
     # Mark messages as read
-    Message.objects.filter(
+    marked = Message.objects.filter(
         conversation=conversation,
         is_read=False
     ).exclude(sender=request.user).update(is_read=True, read_at=timezone.now())
+    if marked:
+        field = conversation.unread_field(request.user)
+        Conversation.objects.filter(pk=conversation.pk).update(
+            **{field: Greatest(F(field) - marked, Value(0))}
+        )
+        Conversation.forget_unread(request.user.pk)
     
     # Get messages
     chat_messages = conversation.messages.all().select_related('sender')
@@ -87,9 +94,9 @@ def send_message(request, conversation_id):
         image=image
     )
     
-    # Update conversation timestamp
+    # Update conversation timestamp (without overwriting the unread counters)
     conversation.updated_at = timezone.now()
-    conversation.save()
+    conversation.save(update_fields=['updated_at'])
     
     return JsonResponse({
         'success': True,
@@ -126,7 +133,7 @@ def start_conversation(request, shop_id):
         try:
             product = Product.objects.get(id=product_id, shop=shop)
             conversation.product = product
-            conversation.save()
+            conversation.save(update_fields=['product', 'updated_at'])
         except Product.DoesNotExist:
             pass
     
@@ -142,7 +149,7 @@ def delete_conversation(request, conversation_id):
         # Check if user is part of this conversation
         if request.user in [conversation.buyer, conversation.seller]:
             conversation.is_active = False
-            conversation.save()
+            conversation.save(update_fields=['is_active', 'updated_at'])
             messages.success(request, 'Conversation deleted.')
         else:
             messages.error(request, 'Access denied.')
@@ -153,9 +160,6 @@ def delete_conversation(request, conversation_id):
 @login_required
 def get_unread_count(request):
     """Get total unread message count for user"""
-    unread_count = Message.objects.filter(
-        Q(conversation__buyer=request.user) | Q(conversation__seller=request.user),
-        is_read=False
-    ).exclude(sender=request.user).count()
+    unread_count = Conversation.cached_total_unread(request.user)
     
     return JsonResponse({'unread_count': unread_count})
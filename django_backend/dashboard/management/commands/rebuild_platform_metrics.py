@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from dashboard.models import PlatformMetrics
+
+
+class Command(BaseCommand):
+    help = "Recompute today's platform metrics from source data, optionally backfilling daily history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Also rebuild this many days of history')
+
+    def handle(self, *args, **options):
+        written = PlatformMetrics.rebuild(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'{written} day(s) of platform metrics rebuilt.'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('users', models.IntegerField(default=0)),
+                ('buyers', models.IntegerField(default=0)),
+                ('sellers', models.IntegerField(default=0)),
+                ('shops', models.IntegerField(default=0)),
+                ('verified_shops', models.IntegerField(default=0)),
+                ('products', models.IntegerField(default=0)),
+                ('active_products', models.IntegerField(default=0)),
+                ('new_users', models.IntegerField(default=0)),
+                ('new_shops', models.IntegerField(default=0)),
+                ('new_products', models.IntegerField(default=0)),
+                ('orders', models.IntegerField(default=0)),
+                ('gmv', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Platform metrics',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
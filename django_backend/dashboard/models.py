@@ -0,0 +1,169 @@
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from josmee_shop.cache import get_or_set, invalidate_tags
+
+METRICS_TAG = 'metrics'
+
+
+class PlatformMetrics(models.Model):
+    """
+    Platform-wide counters for one day, maintained by dashboard.signals.
+
+    The totals (users, shops, products and their breakdowns) are carried
+    forward from the previous day when a day's row is first written, so the
+    newest row always holds the current totals. The ``new_*``, ``orders`` and
+    ``gmv`` fields count what happened on that day only.
+    """
+    TOTALS = ('users', 'buyers', 'sellers', 'shops', 'verified_shops', 'products', 'active_products')
+    DAILY = ('new_users', 'new_shops', 'new_products', 'orders', 'gmv')
+
+    date = models.DateField(unique=True)
+
+    users = models.IntegerField(default=0)
+    buyers = models.IntegerField(default=0)
+    sellers = models.IntegerField(default=0)
+    shops = models.IntegerField(default=0)
+    verified_shops = models.IntegerField(default=0)
+    products = models.IntegerField(default=0)
+    active_products = models.IntegerField(default=0)
+
+    new_users = models.IntegerField(default=0)
+    new_shops = models.IntegerField(default=0)
+    new_products = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    gmv = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Platform metrics'
+
+    def __str__(self):
+        return f"Metrics for {self.date}"
+
+    @staticmethod
+    def count_totals():
+        """Current totals straight from the source tables (three queries)"""
+        from accounts.models import CustomUser
+        from shops.models import Shop
+        from store.models import Product
+
+        totals = CustomUser.objects.aggregate(
+            users=Count('id'),
+            buyers=Count('id', filter=Q(role='buyer')),
+            sellers=Count('id', filter=Q(role='seller')),
+        )
+        totals.update(Shop.objects.aggregate(
+            shops=Count('id'),
+            verified_shops=Count('id', filter=Q(is_verified=True)),
+        ))
+        totals.update(Product.objects.aggregate(
+            products=Count('id'),
+            active_products=Count('id', filter=Q(is_active=True)),
+        ))
+        return totals
+
+    @classmethod
+    def count_daily(cls, since=None):
+        """``{date: {field: value}}`` for the per-day fields, from the source tables"""
+        from accounts.models import CustomUser
+        from orders.models import Order
+        from shops.models import Shop
+        from store.models import Product
+
+        sources = [
+            (CustomUser.objects.all(), 'date_joined', {'new_users': Count('id')}),
+            (Shop.objects.all(), 'created_at', {'new_shops': Count('id')}),
+            (Product.objects.all(), 'created_at', {'new_products': Count('id')}),
+            (Order.objects.all(), 'created_at', {'orders': Count('id'), 'gmv': Sum('total_amount')}),
+        ]
+        days = {}
+        for queryset, field, aggregates in sources:
+            if since is not None:
+                queryset = queryset.filter(**{f'{field}__date__gte': since})
+            rows = queryset.annotate(day=TruncDate(field)).values('day').annotate(**aggregates)
+            for row in rows:
+                day = days.setdefault(row.pop('day'), {})
+                day.update({key: value or 0 for key, value in row.items()})
+        return days
+
+    @classmethod
+    def _start_day(cls, day):
+        """
+        Create the row for ``day``; returns ``(row, built_from_source)``.
+
+        Totals are copied from the latest earlier row. Without one, the row is
+        built from the source tables, which already include the pending change.
+        """
+        previous = cls.objects.filter(date__lt=day).first()
+        if previous is not None:
+            defaults = {field: getattr(previous, field) for field in cls.TOTALS}
+        else:
+            defaults = cls.count_totals()
+            defaults.update(cls.count_daily(since=day).get(day, {}))
+        row, created = cls.objects.get_or_create(date=day, defaults=defaults)
+        return row, created and previous is None
+
+    @classmethod
+    def bump(cls, **deltas):
+        """Add ``deltas`` to today's row, starting the row if this is the first change today"""
+        updates = {field: F(field) + value for field, value in deltas.items() if value}
+        if not updates:
+            return
+        today = timezone.localdate()
+        if not cls.objects.filter(date=today).update(**updates):
+            _, from_source = cls._start_day(today)
+            if not from_source:
+                cls.objects.filter(date=today).update(**updates)
+        transaction.on_commit(lambda: invalidate_tags(METRICS_TAG))
+
+    @classmethod
+    def history(cls, days=30):
+        """The newest ``days`` daily rows, newest first; cached until a counter moves"""
+        def load():
+            rows = list(cls.objects.all()[:days])
+            if not rows:
+                rows = [cls._start_day(timezone.localdate())[0]]
+            return rows
+        return get_or_set('platform-metrics', load, days, tags=(METRICS_TAG,))
+
+    @classmethod
+    def rebuild(cls, days=None):
+        """
+        Recompute today's totals and the per-day fields from source data.
+
+        With ``days``, rows are also (re)built for each of the last ``days``
+        days. Past users/shops/products totals are derived by subtracting
+        later creations; the role, verification and activation breakdowns
+        keep today's values, since their history is not recorded anywhere.
+        Returns the number of rows written.
+        """
+        today = timezone.localdate()
+        since = today - timedelta(days=days - 1) if days else today
+        daily = cls.count_daily(since=since)
+        totals = cls.count_totals()
+
+        rows = {}
+        running = dict(totals)
+        day = today
+        while day >= since:
+            values = daily.get(day, {})
+            row = cls(date=day, **{field: running[field] for field in cls.TOTALS})
+            for field in cls.DAILY:
+                setattr(row, field, values.get(field, 0))
+            rows[day] = row
+            # Step the totals back to the end of the previous day
+            running['users'] -= values.get('new_users', 0)
+            running['shops'] -= values.get('new_shops', 0)
+            running['products'] -= values.get('new_products', 0)
+            day -= timedelta(days=1)
+
+        with transaction.atomic():
+            cls.objects.filter(date__gte=since).delete()
+            cls.objects.bulk_create(rows.values())
+        transaction.on_commit(lambda: invalidate_tags(METRICS_TAG))
+        return len(rows)
@@ -0,0 +1,70 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from accounts.models import CustomUser
+from orders.models import Order
+from shops.models import Shop
+from store.models import Product
+from .models import PlatformMetrics
+
+# Field whose breakdown is counted for each model, and the counter it feeds
+TRACKED = {
+    CustomUser: ('role', lambda role: {'buyers': 1} if role == 'buyer' else {'sellers': 1} if role == 'seller' else {}),
+    Shop: ('is_verified', lambda verified: {'verified_shops': 1} if verified else {}),
+    Product: ('is_active', lambda active: {'active_products': 1} if active else {}),
+}
+TOTAL_FIELDS = {CustomUser: 'users', Shop: 'shops', Product: 'products'}
+NEW_FIELDS = {CustomUser: 'new_users', Shop: 'new_shops', Product: 'new_products'}
+
+
+def _state(instance):
+    """The tracked field as loaded, without triggering a query for deferred fields"""
+    field, _ = TRACKED[type(instance)]
+    return instance.__dict__.get(field)
+
+
+def _negate(deltas):
+    return {key: -value for key, value in deltas.items()}
+
+
+def _merge(*parts):
+    merged = {}
+    for part in parts:
+        for key, value in part.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def remember_state(sender, instance, **kwargs):
+    instance._metrics_state = _state(instance)
+
+
+def count_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    _, breakdown = TRACKED[sender]
+    current = _state(instance)
+    if created:
+        PlatformMetrics.bump(**_merge({TOTAL_FIELDS[sender]: 1, NEW_FIELDS[sender]: 1}, breakdown(current)))
+    else:
+        previous = getattr(instance, '_metrics_state', None)
+        if previous is not None and current is not None and previous != current:
+            PlatformMetrics.bump(**_merge(_negate(breakdown(previous)), breakdown(current)))
+    instance._metrics_state = current
+
+
+def count_deleted(sender, instance, **kwargs):
+    _, breakdown = TRACKED[sender]
+    PlatformMetrics.bump(**_merge({TOTAL_FIELDS[sender]: -1}, _negate(breakdown(_state(instance)))))
+
+
+for model in TRACKED:
+    uid = f'metrics-{model._meta.label}'
+    post_init.connect(remember_state, sender=model, dispatch_uid=f'{uid}-init')
+    post_save.connect(count_saved, sender=model, dispatch_uid=f'{uid}-save')
+    post_delete.connect(count_deleted, sender=model, dispatch_uid=f'{uid}-delete')
+
+
+@receiver(post_save, sender=Order)
+def count_order(sender, instance, created, **kwargs):
+    if created:
+        PlatformMetrics.bump(orders=1, gmv=instance.total_amount or 0)
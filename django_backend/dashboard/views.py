@@ -55,30 +55,39 @@ def admin_dashboard_view(request):
     from accounts.models import CustomUser
     from shops.models import Shop
     from store.models import Product
-    from payments.models import Payment
+    from josmee_shop.cache import get_or_set
+    from .models import METRICS_TAG, PlatformMetrics
     
-    # Get statistics
-    total_users = CustomUser.objects.count()
-    total_buyers = CustomUser.objects.filter(role='buyer').count()
-    total_sellers = CustomUser.objects.filter(role='seller').count()
-    total_shops = Shop.objects.count()
-    verified_shops = Shop.objects.filter(is_verified=True).count()
-    total_products = Product.objects.count()
-    active_products = Product.objects.filter(is_active=True).count()
+    # Counters and trend history from the maintained snapshot (cached)
+    history = PlatformMetrics.history(30)
+    current = history[0]
     
-    # Get recent activity
-    recent_users = CustomUser.objects.order_by('-date_joined')[:10]
-    recent_shops = Shop.objects.order_by('-created_at')[:10]
-    recent_products = Product.objects.order_by('-created_at')[:10]
+    # Get recent activity; new users/shops/products all move the metrics tag
+    recent_users = get_or_set(
+        'admin-recent-users',
+        lambda: list(CustomUser.objects.order_by('-date_joined')[:10]),
+        tags=(METRICS_TAG,),
+    )
+    recent_shops = get_or_set(
+        'admin-recent-shops',
+        lambda: list(Shop.objects.order_by('-created_at')[:10]),
+        tags=(METRICS_TAG, 'shop'),
+    )
+    recent_products = get_or_set(
+        'admin-recent-products',
+        lambda: list(Product.objects.select_related('shop').order_by('-created_at')[:10]),
+        tags=(METRICS_TAG, 'product', 'shop'),
+    )
     
     context = {
-        'total_users': total_users,
-        'total_buyers': total_buyers,
-        'total_sellers': total_sellers,
-        'total_shops': total_shops,
-        'verified_shops': verified_shops,
-        'total_products': total_products,
-        'active_products': active_products,
+        'total_users': current.users,
+        'total_buyers': current.buyers,
+        'total_sellers': current.sellers,
+        'total_shops': current.shops,
+        'verified_shops': current.verified_shops,
+        'total_products': current.products,
+        'active_products': current.active_products,
+        'metrics_history': history,
         'recent_users': recent_users,
         'recent_shops': recent_shops,
         'recent_products': recent_products,
@@ -8,3 +8,63 @@ timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
 preload_app = True
 worker_class = "gthread"
 loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+# Background jobs (jobs.queue) need a `manage.py run_jobs` worker. By default
+# the gunicorn master runs one next to the web workers, on the same database
+# and cache, and restarts it if it exits. Set JOBS_WORKER=external when a
+# separate worker is deployed, or JOBS_WORKER=none to run jobs inline.
+JOBS_WORKER = os.getenv("JOBS_WORKER", "embedded")
+JOBS_WORKER_CONCURRENCY = os.getenv("JOBS_WORKER_CONCURRENCY", "2")
+JOBS_WORKER_RESTART_DELAY = 5
+
+_jobs_worker = {"process": None, "stopping": False}
+
+
+def _run_jobs_worker(server):
+    import subprocess
+    import sys
+    import time
+
+    while not _jobs_worker["stopping"]:
+        process = subprocess.Popen(
+            [sys.executable, "manage.py", "run_jobs", "--concurrency", JOBS_WORKER_CONCURRENCY],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        _jobs_worker["process"] = process
+        code = process.wait()
+        if not _jobs_worker["stopping"]:
+            server.log.error("Job worker exited with %s; restarting in %ss", code, JOBS_WORKER_RESTART_DELAY)
+            time.sleep(JOBS_WORKER_RESTART_DELAY)
+
+
+def on_starting(server):
+    from django.conf import settings
+
+    backend = settings.CACHES["default"]["BACKEND"]
+    if not settings.DEBUG and backend.endswith("LocMemCache") and (workers > 1 or JOBS_WORKER == "embedded"):
+        # Each process would keep its own cache and never see the others' invalidations
+        raise RuntimeError(
+            "The locmem cache is per process; set DJANGO_CACHE_BACKEND=file or redis "
+            "to run several workers"
+        )
+
+
+def when_ready(server):
+    if JOBS_WORKER != "embedded":
+        return
+    import threading
+
+    threading.Thread(target=_run_jobs_worker, args=(server,), name="jobs-worker", daemon=True).start()
+    server.log.info("Started embedded job worker (concurrency %s)", JOBS_WORKER_CONCURRENCY)
+
+
+def on_exit(server):
+    _jobs_worker["stopping"] = True
+    process = _jobs_worker["process"]
+    if process is not None and process.poll() is None:
+        # run_jobs finishes the jobs in flight on SIGTERM
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except Exception:
+            process.kill()
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'idempotency_key']
+    readonly_fields = ['locked_at', 'locked_by', 'last_error', 'created_at', 'finished_at']
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='running').update(
+            status='queued', run_at=timezone.now(), attempts=0, finished_at=None
+        )
+        self.message_user(request, f'{count} job(s) queued.')
+    retry_now.short_description = 'Queue selected jobs to run now'
@@ -0,0 +1,73 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim, requeue_stale, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Jobs run in parallel by this worker')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600, help='Seconds before a running job of a dead worker is requeued')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is ready instead of polling')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        stale_after = timedelta(seconds=options['stale_after'])
+        stopping = threading.Event()
+        in_flight = set()
+        lock = threading.Lock()
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the running jobs finish...')
+            stopping.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        def execute(job_id):
+            close_old_connections()
+            try:
+                run_job(job_id)
+            finally:
+                close_old_connections()
+                with lock:
+                    in_flight.discard(job_id)
+
+        self.stdout.write(f'Worker {worker_name} started with concurrency {concurrency}')
+        processed = 0
+        last_stale_check = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stopping.is_set():
+                if time.monotonic() - last_stale_check > 60:
+                    requeue_stale(stale_after)
+                    last_stale_check = time.monotonic()
+
+                with lock:
+                    free = concurrency - len(in_flight)
+                job_ids = claim(worker_name, free)
+                for job_id in job_ids:
+                    with lock:
+                        in_flight.add(job_id)
+                    pool.submit(execute, job_id)
+                processed += len(job_ids)
+
+                if not job_ids:
+                    with lock:
+                        idle = not in_flight
+                    if options['burst'] and idle:
+                        break
+                    time.sleep(options['poll_interval'] if free else 0.05)
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_name} stopped after {processed} job(s).'))
@@ -0,0 +1,187 @@
+"""
+Database-backed job queue.
+
+Tasks are plain functions registered with ``@task`` in an app's ``tasks.py``
+and queued with ``enqueue()``, which writes a ``Job`` row in the caller's
+transaction, so a job only becomes visible once the work that produced it has
+committed. ``run_jobs`` workers claim ready jobs with a conditional UPDATE
+(no broker, no row locks held while the task runs), retry failures with
+exponential backoff and respect each task's concurrency limit.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = timedelta(hours=1)
+
+_registry = {}
+
+
+class TaskSpec:
+    def __init__(self, name, func, max_attempts, priority, concurrency, retry_backoff):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.priority = priority
+        self.concurrency = concurrency
+        self.retry_backoff = retry_backoff
+
+    def backoff(self, attempts):
+        """Delay before retry number ``attempts``: exponential with 10% jitter, capped at an hour"""
+        delay = timedelta(seconds=self.retry_backoff * 2 ** max(attempts - 1, 0))
+        delay = min(delay, MAX_BACKOFF)
+        return delay + delay * random.uniform(0, 0.1)
+
+
+def task(name=None, *, max_attempts=5, priority=0, concurrency=None, retry_backoff=30):
+    """
+    Register a function as a background task.
+
+    The function is called with the job payload as keyword arguments, inside
+    a transaction; raising makes the job retry. ``concurrency`` caps how many
+    jobs of this task run at once across all workers (see ``claim``).
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__.split(".")[0]}.{func.__name__}'
+        _registry[task_name] = TaskSpec(task_name, func, max_attempts, priority, concurrency, retry_backoff)
+        func.task_name = task_name
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f'Unknown task {name!r}')
+
+
+def enqueue(task_name, payload=None, *, priority=None, idempotency_key=None, delay=None, max_attempts=None):
+    """
+    Queue ``task_name`` (a registered name or an ``@task`` function) with a JSON payload.
+
+    With ``idempotency_key`` at most one job is ever created for that key;
+    the existing job is returned instead.
+    """
+    spec = get_task(getattr(task_name, 'task_name', task_name))
+    if idempotency_key:
+        existing = Job.objects.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing
+    fields = {
+        'task': spec.name,
+        'payload': payload or {},
+        'priority': spec.priority if priority is None else priority,
+        'max_attempts': max_attempts or spec.max_attempts,
+        'run_at': timezone.now() + (delay or timedelta(0)),
+        'idempotency_key': idempotency_key,
+    }
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(**fields)
+    except IntegrityError:
+        # Lost a race with another enqueue of the same key
+        return Job.objects.get(idempotency_key=idempotency_key)
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def _running(task_name):
+    """Number of running jobs of ``task_name``, as a subquery"""
+    counts = Job.objects.filter(status='running', task=task_name).order_by().values('task').annotate(total=Count('id'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+def claim(worker_name, limit):
+    """
+    Claim up to ``limit`` ready jobs for ``worker_name``; returns their ids.
+
+    A task's concurrency limit is checked again by the claiming UPDATE, which
+    only matches while fewer than ``concurrency`` jobs of the task are
+    running. Writers are serialized on SQLite, so the limit is exact there;
+    on a database with concurrent writers two claims can still both see the
+    last free slot, so treat it as best-effort.
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    running = dict(
+        Job.objects.filter(status='running').values('task').annotate(total=Count('id')).values_list('task', 'total')
+    )
+    full = {name for name, spec in _registry.items() if spec.concurrency and running.get(name, 0) >= spec.concurrency}
+    candidates = (
+        Job.objects.filter(status='queued', run_at__lte=now)
+        .exclude(task__in=full)
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('id', 'task')[:limit * 4]
+    )
+    claimed = []
+    for job_id, task_name in candidates:
+        if len(claimed) >= limit:
+            break
+        spec = _registry.get(task_name)
+        if spec and spec.concurrency and running.get(task_name, 0) >= spec.concurrency:
+            continue
+        # Only one worker can move a given row out of "queued"
+        ready = Job.objects.filter(pk=job_id, status='queued')
+        if spec and spec.concurrency:
+            ready = ready.filter(LessThan(_running(task_name), spec.concurrency))
+        if ready.update(
+            status='running', locked_at=now, locked_by=worker_name, attempts=F('attempts') + 1
+        ):
+            running[task_name] = running.get(task_name, 0) + 1
+            claimed.append(job_id)
+    return claimed
+
+
+def run_job(job_id):
+    """Run one claimed (or, inline, queued) job and record the outcome"""
+    job = Job.objects.get(pk=job_id)
+    if job.status == 'queued':
+        # Inline execution skips claim()
+        Job.objects.filter(pk=job.pk).update(status='running', locked_at=timezone.now(), attempts=F('attempts') + 1)
+        job.attempts += 1
+    try:
+        spec = get_task(job.task)
+        with transaction.atomic():
+            spec.func(**job.payload)
+    except Exception:
+        _record_failure(job, traceback.format_exc())
+    else:
+        Job.objects.filter(pk=job.pk).update(status='succeeded', finished_at=timezone.now(), last_error='')
+
+
+def _record_failure(job, error):
+    spec = _registry.get(job.task)
+    if spec is None or job.attempts >= job.max_attempts:
+        logger.error('Job %s (%s) failed permanently: %s', job.pk, job.task, error)
+        Job.objects.filter(pk=job.pk).update(status='failed', finished_at=timezone.now(), last_error=error)
+        return
+    retry_at = timezone.now() + spec.backoff(job.attempts)
+    logger.warning('Job %s (%s) failed, retrying at %s', job.pk, job.task, retry_at)
+    Job.objects.filter(pk=job.pk).update(
+        status='queued', run_at=retry_at, locked_at=None, locked_by='', last_error=error
+    )
+
+
+def requeue_stale(stale_after):
+    """Release jobs whose worker died mid-run; gives up on those out of attempts"""
+    cutoff = timezone.now() - stale_after
+    stale = Job.objects.filter(status='running', locked_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), last_error='Worker stopped while running the job'
+    )
+    return stale.update(status='queued', locked_at=None, locked_by='', run_at=timezone.now())
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim, enqueue, requeue_stale, run_job, task
+
+
+@task('jobs.test_noop', priority=1)
+def noop():
+    pass
+
+
+@task('jobs.test_limited', concurrency=2)
+def limited():
+    pass
+
+
+@task('jobs.test_flaky', max_attempts=2, retry_backoff=10)
+def flaky():
+    raise RuntimeError('boom')
+
+
+class ClaimTests(TestCase):
+    def test_claims_ready_jobs_by_priority(self):
+        later = enqueue('jobs.test_noop', delay=timedelta(minutes=5))
+        low = enqueue('jobs.test_noop', priority=0)
+        high = enqueue('jobs.test_noop', priority=5)
+
+        self.assertEqual(claim('w1', 5), [high.pk, low.pk])
+        self.assertEqual(claim('w2', 5), [])
+        job = Job.objects.get(pk=high.pk)
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('running', 'w1', 1))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, 'queued')
+
+    def test_concurrency_limit_counts_running_jobs(self):
+        jobs = [enqueue('jobs.test_limited') for _ in range(4)]
+        self.assertEqual(len(claim('w1', 1)), 1)
+
+        self.assertEqual(claim('w2', 5), [jobs[1].pk])
+        self.assertEqual(Job.objects.filter(status='running').count(), 2)
+
+        run_job(jobs[0].pk)
+        self.assertEqual(claim('w3', 5), [jobs[2].pk])
+
+
+class RetryTests(TestCase):
+    def test_failures_back_off_then_fail(self):
+        job = enqueue('jobs.test_flaky')
+        claim('w1', 1)
+        before = timezone.now()
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        # retry_backoff plus up to 10% jitter
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=11))
+        self.assertEqual(claim('w1', 1), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        claim('w1', 1)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+
+class RequeueStaleTests(TestCase):
+    def test_stale_jobs_are_requeued_or_failed(self):
+        stale, exhausted, fresh = (enqueue('jobs.test_noop', max_attempts=2) for _ in range(3))
+        claim('w1', 3)
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=stale.pk).update(locked_at=long_ago)
+        Job.objects.filter(pk=exhausted.pk).update(locked_at=long_ago, attempts=2)
+
+        self.assertEqual(requeue_stale(timedelta(minutes=10)), 1)
+
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, 'queued')
+        self.assertEqual(Job.objects.get(pk=exhausted.pk).status, 'failed')
+        self.assertEqual(Job.objects.get(pk=fresh.pk).status, 'running')
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    def test_parallel_workers_respect_concurrency(self):
+        for _ in range(10):
+            enqueue('jobs.test_limited')
+
+        def work(n):
+            try:
+                return claim(f'w{n}', 5)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            claimed = [job_id for ids in pool.map(work, range(8)) for job_id in ids]
+
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(Job.objects.filter(status='running').count(), 2)
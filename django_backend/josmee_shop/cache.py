@@ -0,0 +1,164 @@
+"""
+Versioned cache keys with tag-based invalidation.
+
+Every cached value is stored under a key that embeds the current version of
+each tag it depends on (e.g. ``product``, ``category``, ``event:12``).
+Invalidating a tag bumps its version, so every key built from the old version
+is simply never read again and ages out of the cache on its own. Tags are
+bumped from model signals (see ``invalidate_instance``), which keeps cached
+pages and fragments correct without tracking individual keys.
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+TAG_PREFIX = 'tag:'
+
+
+def model_tag(model_or_instance, pk=None):
+    """Tag for a model (``product``) or a single row (``product:12``)"""
+    tag = model_or_instance._meta.model_name
+    return f'{tag}:{pk}' if pk is not None else tag
+
+
+def _new_version():
+    return str(time.time_ns())
+
+
+def tag_versions(tags):
+    """Current version of each tag, creating missing ones, in one round trip"""
+    keys = {tag: TAG_PREFIX + tag for tag in tags}
+    found = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for tag, key in keys.items():
+        if key in found:
+            versions[tag] = found[key]
+        else:
+            versions[tag] = missing[key] = _new_version()
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def _build_key(name, parts, versions):
+    raw = ':'.join([str(part) for part in parts] + [f'{tag}={versions[tag]}' for tag in sorted(versions)])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{name}:{digest}'
+
+
+def make_key(name, *parts, tags=()):
+    """Build a cache key for ``name``/``parts`` that changes when any tag is invalidated"""
+    return _build_key(name, parts, tag_versions(sorted(set(tags))))
+
+
+def get_or_set(name, func, *parts, tags=(), timeout=DEFAULT_TIMEOUT):
+    """Return the cached value for ``name``/``parts`` or compute, store and return ``func()``"""
+    key = make_key(name, *parts, tags=tags)
+    value = cache.get(key)
+    if value is None:
+        value = func()
+        cache.set(key, value, timeout)
+    return value
+
+
+def get_or_set_many(name, func, parts, tags=(), timeout=DEFAULT_TIMEOUT):
+    """
+    ``get_or_set`` for many values at once: ``{part: value}`` for every item of ``parts``.
+
+    ``func(missing)`` computes ``{part: value}`` for the parts not in the
+    cache, so misses are loaded together rather than one at a time.
+    """
+    versions = tag_versions(sorted(set(tags)))
+    keys = {part: _build_key(name, (part,), versions) for part in parts}
+    found = cache.get_many(keys.values())
+    values = {part: found[key] for part, key in keys.items() if found.get(key) is not None}
+    missing = [part for part in keys if part not in values]
+    if missing:
+        loaded = func(missing)
+        cache.set_many({keys[part]: value for part, value in loaded.items()}, timeout)
+        values.update(loaded)
+    return values
+
+
+def invalidate_tags(*tags):
+    """Bump the version of every tag so keys built from them are no longer read"""
+    if tags:
+        version = _new_version()
+        cache.set_many({TAG_PREFIX + tag: version for tag in tags}, None)
+
+
+def invalidate_instance(sender, instance, **kwargs):
+    """Signal receiver: invalidate the model tag and the row tag of ``instance``"""
+    invalidate_tags(model_tag(sender), model_tag(sender, instance.pk))
+
+
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = '__csrf_token__'
+
+
+def _serves_from_cache(request):
+    """Only anonymous GETs without a cart or pending flash messages share pages"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    if request.COOKIES.get('messages') or request.session.get('_messages'):
+        return False
+    return not request.COOKIES.get(getattr(settings, 'CART_COOKIE_NAME', 'cart'))
+
+
+def add_cache_tags(request, *tags):
+    """
+    Make the page being cached for ``request`` also depend on ``tags``,
+    typically the row tags of what it shows (``product:12``). No-op when the
+    response is not being cached.
+    """
+    page_tags = getattr(request, '_page_cache_tags', None)
+    if page_tags is not None:
+        page_tags.update(tag_versions([tag for tag in tags if tag not in page_tags]))
+
+
+def _row_tags_current(row_tags):
+    return not row_tags or tag_versions(list(row_tags)) == row_tags
+
+
+def cache_anonymous_page(*tags, timeout=DEFAULT_TIMEOUT):
+    """
+    Cache a view's full response for anonymous visitors, keyed on the URL.
+
+    The entry is dropped when any of ``tags`` is invalidated, or any tag the
+    view added with ``add_cache_tags``. CSRF tokens in cached forms are
+    swapped for the current visitor's token on every hit.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _serves_from_cache(request):
+                return view_func(request, *args, **kwargs)
+
+            key = make_key('page', request.get_full_path(), tags=tags)
+            cached = cache.get(key)
+            if cached is not None and _row_tags_current(cached.get('row_tags')):
+                content = cached['content'].replace(CSRF_PLACEHOLDER, get_token(request))
+                return HttpResponse(content, content_type=cached['content_type'])
+
+            request._page_cache_tags = {}
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                content = response.content.decode(response.charset)
+                cache.set(key, {
+                    'content': CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', content),
+                    'content_type': response['Content-Type'],
+                    'row_tags': request._page_cache_tags,
+                }, timeout)
+            return response
+        return wrapper
+    return decorator
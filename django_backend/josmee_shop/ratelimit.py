@@ -0,0 +1,107 @@
+"""
+Token-bucket rate limiting.
+
+A bucket holds ``capacity`` tokens and refills at ``capacity / period`` tokens
+per second; each request takes one. The state is the "theoretical arrival
+time" of the next request (GCRA), kept where ``RATELIMIT_STORE`` says:
+
+``cache``
+    One cache entry, read and written under a short ``cache.add`` lock. Only
+    safe on a cache whose ``add`` is atomic across processes (redis).
+``database``
+    One ``accounts.RateLimitBucket`` row, taken with a conditional ``UPDATE``
+    so concurrent workers cannot both take the last token.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+LOCK_TIMEOUT = 2
+LOCK_RETRIES = 20
+
+
+class TokenBucket:
+    def __init__(self, name, capacity, period):
+        self.name = name
+        self.capacity = capacity
+        self.interval = period / capacity
+        self.period = period
+
+    def _key(self, identity):
+        return f'ratelimit:{self.name}:{identity}'
+
+    def consume(self, identity):
+        """Take a token for ``identity``; returns ``(allowed, retry_after_seconds)``"""
+        if getattr(settings, 'RATELIMIT_STORE', 'database') == 'cache':
+            return self._consume_cache(self._key(identity))
+        return self._consume_database(self._key(identity))
+
+    def _consume_cache(self, key):
+        # If the bucket's lock stays busy (a burst of concurrent requests from
+        # the same identity) the request is refused rather than let through
+        lock = f'{key}:lock'
+        for _ in range(LOCK_RETRIES):
+            if cache.add(lock, 1, LOCK_TIMEOUT):
+                break
+            time.sleep(0.01)
+        else:
+            return False, self.interval
+        try:
+            now = time.time()
+            tat = max(cache.get(key, now), now)
+            # Allowed while the backlog fits in the bucket
+            allowed_at = tat - self.period + self.interval
+            if allowed_at > now:
+                return False, allowed_at - now
+            cache.set(key, tat + self.interval, int(self.period) + 1)
+            return True, 0
+        finally:
+            cache.delete(lock)
+
+    def _consume_database(self, key):
+        from accounts.models import RateLimitBucket
+
+        now = time.time()
+        # The same GCRA test as above, evaluated by the UPDATE itself
+        taken = RateLimitBucket.objects.filter(key=key, tat__lte=now + self.period - self.interval).update(
+            tat=Greatest(F('tat'), Value(now)) + self.interval
+        )
+        if taken:
+            return True, 0
+        tat = RateLimitBucket.objects.filter(key=key).values_list('tat', flat=True).first()
+        if tat is not None:
+            return False, max(0, tat - self.period + self.interval - now)
+        try:
+            with transaction.atomic():
+                RateLimitBucket.objects.create(key=key, tat=now + self.interval)
+        except IntegrityError:
+            # Another request created the bucket first; take a token from it
+            return self._consume_database(key)
+        return True, 0
+
+    def reset(self, identity):
+        from accounts.models import RateLimitBucket
+
+        cache.delete(self._key(identity))
+        RateLimitBucket.objects.filter(key=self._key(identity)).delete()
+
+    @staticmethod
+    def purge():
+        """Delete database buckets that have fully refilled; returns how many"""
+        from accounts.models import RateLimitBucket
+
+        deleted, _ = RateLimitBucket.objects.filter(tat__lte=time.time()).delete()
+        return deleted
+
+
+def client_ip(request):
+    """The client's address; the proxy's ``X-Forwarded-For`` is only trusted when configured"""
+    if getattr(settings, 'RATELIMIT_TRUST_FORWARDED_FOR', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
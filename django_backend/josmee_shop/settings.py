@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     "promotions",
     "chat",
     "refunds",
+    "jobs",
 ]
 
 MIDDLEWARE = [
@@ -34,6 +35,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "store.middleware.CartMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -54,6 +56,7 @@ TEMPLATES = [
                 "django.contrib.messages.context_processors.messages",
                 "wishlist.context_processors.wishlist_count",
                 "chat.context_processors.unread_messages_count",
+                "store.context_processors.cart_count",
             
             ],
         },
@@ -67,9 +70,48 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Take the write lock when a transaction starts so concurrent checkouts
+        # queue up instead of failing with "database is locked"
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+        # A file rather than the in-memory default, so tests can use several
+        # connections (threads) the way concurrent requests do
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Cache: locmem for development (per process), file or redis when several
+# workers must share invalidations. Select with DJANGO_CACHE_BACKEND; without
+# DEBUG the default is the file cache, which every process on the host shares.
+CACHE_BACKEND = os.getenv("DJANGO_CACHE_BACKEND", "locmem" if DEBUG else "file")
+if CACHE_BACKEND == "redis":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1"),
+    }
+elif CACHE_BACKEND == "file":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", "/var/tmp/josmee_cache"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+else:
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "josmee",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+
+CACHES = {
+    "default": {
+        **_default_cache,
+        "KEY_PREFIX": "josmee",
+        "TIMEOUT": int(os.getenv("DJANGO_CACHE_TIMEOUT", "300")),
+    }
+}
+
+# Longest a process keeps its copy of the category tree (see store.category_tree)
+CATEGORY_TREE_TTL = 60
+
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 AUTHENTICATION_BACKENDS = [
@@ -107,6 +149,10 @@ SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
+# Anonymous carts live in this signed cookie; signed-in carts in store.CartLine
+CART_COOKIE_NAME = 'cart'
+CART_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
+
 CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS
 CSRF_COOKIE_HTTPONLY = True
 CSRF_COOKIE_SAMESITE = 'Lax'
@@ -127,5 +173,30 @@ FAST2SMS_API_KEY = os.getenv('FAST2SMS_API_KEY', '')
 
 # 4. MSG91 (https://msg91.com) - Recommended for India
 MSG91_AUTH_KEY = os.getenv('MSG91_AUTH_KEY', '')
+
+# Providers tried in order, with failover (see accounts.sms), e.g. "msg91,twilio".
+# Empty means every provider configured above, in the order listed.
+SMS_PROVIDERS = [name for name in os.getenv('SMS_PROVIDERS', '').split(',') if name]
+# A provider failing this many times in a row is skipped for SMS_PROVIDER_COOLDOWN seconds
+SMS_PROVIDER_FAILURE_THRESHOLD = 3
+SMS_PROVIDER_COOLDOWN = 60
+
+# Phone verification codes (see accounts.otp). "cache" needs a cache shared by
+# web and job workers with atomic counters, so only redis defaults to it
+OTP_STORE = os.getenv("OTP_STORE", "cache" if CACHE_BACKEND == "redis" else "database")
+OTP_TTL = 600
+OTP_MAX_ATTEMPTS = 5
+# Token buckets for code requests: (requests, per seconds)
+OTP_RATE_LIMITS = {"phone": (3, 600), "ip": (10, 3600)}
+# Where token buckets live (see josmee_shop.ratelimit); "cache" needs an atomic add
+RATELIMIT_STORE = os.getenv("RATELIMIT_STORE", "cache" if CACHE_BACKEND == "redis" else "database")
+# Only behind a proxy that sets X-Forwarded-For
+RATELIMIT_TRUST_FORWARDED_FOR = os.getenv("RATELIMIT_TRUST_FORWARDED_FOR", "0") == "1"
+
+# Background jobs (see jobs.queue). Under gunicorn a `run_jobs` worker is started
+# next to the web workers (gunicorn.conf.py, JOBS_WORKER); set JOBS_RUN_INLINE=1
+# to run jobs right after the enqueuing transaction commits instead (the default
+# with JOBS_WORKER=none, when no worker runs at all)
+JOBS_RUN_INLINE = os.getenv("JOBS_RUN_INLINE", "1" if os.getenv("JOBS_WORKER") == "none" else "0") == "1"
 # Production-ready static files handling
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
@@ -64,6 +64,9 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_number}"
@@ -100,6 +103,11 @@ class OrderItem(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', '-created_at'], name='orderitem_shop_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.product_name} x {self.quantity}"
     
@@ -0,0 +1,173 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Now
+from .models import Order, OrderItem
+from payments.models import Earning
+from payments.wallet import save_earnings
+from promotions.coupons import redeem
+from promotions.models import CouponUsage
+from sellers.models import SalesRollup, SellerStats
+from store.inventory import InsufficientStock, release_stock, reserve_stock
+
+SHIPPING_COST = Decimal('10.00')
+TAX_RATE = Decimal('0.08')
+PLATFORM_FEE_PERCENT = Decimal('0.10')
+
+
+def calculate_totals(subtotal, discount=Decimal('0')):
+    """Shipping, tax and grand total for a cart subtotal"""
+    tax = subtotal * TAX_RATE
+    return {
+        'subtotal': subtotal,
+        'shipping_cost': SHIPPING_COST,
+        'tax': tax,
+        'discount': discount,
+        'total': subtotal + SHIPPING_COST + tax - discount,
+    }
+
+
+def build_order_items(cart_items):
+    """
+    Snapshot hydrated cart lines into unsaved OrderItems.
+
+    Returns ``(order_items, subtotal)``; line subtotals and the seller/platform
+    split are computed here once, so ``OrderItem.save`` never has to run.
+    """
+    order_items = []
+    subtotal = Decimal('0')
+    for item in cart_items:
+        product = item['product']
+        line_total = item['line_total']
+        platform_fee = line_total * PLATFORM_FEE_PERCENT
+        subtotal += line_total
+        order_items.append(OrderItem(
+            product=product,
+            shop=product.shop,
+            product_name=product.name,
+            product_price=item['price'],
+            quantity=item['qty'],
+            subtotal=line_total,
+            seller_amount=line_total - platform_fee,
+            platform_fee=platform_fee,
+        ))
+    return order_items, subtotal
+
+
+def place_order(user, address, cart_items, payment_method, coupon_code=None):
+    """
+    Create an order from hydrated cart lines in one transaction.
+
+    Stock is reserved with a single conditional UPDATE, items are written with
+    one ``bulk_create``, seller order counters and the coupon counter are
+    bumped with ``F()``, so the number of queries does not depend on the size of the cart. Raises
+    ``store.inventory.InsufficientStock`` if any line cannot be fulfilled and
+    ``promotions.coupons.CouponError`` if the coupon can no longer be redeemed.
+    A cart with no orderable lines raises ``InsufficientStock`` with no shortages.
+    """
+    order_items, subtotal = build_order_items(cart_items)
+    if not order_items:
+        raise InsufficientStock([])
+
+    with transaction.atomic():
+        # Reserve stock first so an oversold cart fails before anything is written
+        reserve_stock({item.product_id: item.quantity for item in order_items})
+
+        # The discount is recomputed from the current cart, never taken from the session
+        coupon, discount = redeem(coupon_code, user, cart_items) if coupon_code else (None, Decimal('0'))
+        totals = calculate_totals(subtotal, discount)
+
+        order = Order.objects.create(
+            user=user,
+            shipping_address=address,
+            shipping_full_name=address.full_name,
+            shipping_phone=address.phone,
+            shipping_street=address.street_address,
+            shipping_city=address.city,
+            shipping_state=address.state,
+            shipping_country=address.country,
+            shipping_postal_code=address.postal_code,
+            subtotal=totals['subtotal'],
+            shipping_cost=totals['shipping_cost'],
+            tax=totals['tax'],
+            discount=totals['discount'],
+            total_amount=totals['total'],
+            payment_method=payment_method,
+            status='processing' if payment_method == 'cod' else 'pending',
+        )
+
+        for item in order_items:
+            item.order = order
+            # Counted right here; the OrderItem signals must not count them again
+            item._stats_recorded = True
+        OrderItem.objects.bulk_create(order_items)
+        # bulk_create skips post_save, so count the order for each seller here
+        SellerStats.record_order({item.shop_id for item in order_items})
+        # Reporting buckets are hot rows shared by every order of a shop; touch them after commit
+        transaction.on_commit(lambda: SalesRollup.record_items(order_items))
+
+        if coupon:
+            CouponUsage.objects.create(
+                coupon=coupon,
+                user=user,
+                order_number=order.order_number,
+                discount_amount=discount
+            )
+
+    return order
+
+
+CANCELLABLE_STATUSES = ('pending', 'processing')
+
+
+def cancel_order(order):
+    """
+    Cancel ``order`` and return its items to stock; returns whether it was cancelled.
+
+    The status change is a conditional UPDATE, so of several concurrent
+    cancellations exactly one succeeds and stock is released only once.
+    """
+    with transaction.atomic():
+        cancelled = Order.objects.filter(pk=order.pk, status__in=CANCELLABLE_STATUSES).update(
+            status='cancelled', updated_at=Now()
+        )
+        if cancelled != 1:
+            return False
+        returned = defaultdict(int)
+        for product_id, quantity in order.items.filter(product__isnull=False).values_list('product_id', 'quantity'):
+            returned[product_id] += quantity
+        release_stock(returned)
+    order.status = 'cancelled'
+    return True
+
+
+def distribute_earnings(order):
+    """
+    Pay every seller their share of a paid order in one batch.
+
+    Earnings are written with one ``bulk_create`` and credited with one wallet
+    update per seller. Each earning carries the idempotency key
+    ``order-item:<id>``; if the order was already distributed the unique key
+    rejects the batch and nothing is written. Returns the new earnings.
+    """
+    items = order.items.filter(shop__isnull=False).select_related('shop')
+    earnings = [
+        Earning(
+            seller_id=item.shop.owner_id,
+            order_id=str(order.id),
+            order_item_id=str(item.id),
+            amount=item.seller_amount,
+            platform_fee=item.platform_fee,
+            idempotency_key=f'order-item:{item.id}',
+        )
+        for item in items
+    ]
+    if not earnings:
+        return []
+
+    try:
+        save_earnings(earnings)
+    except IntegrityError:
+        # Already distributed (duplicate idempotency key)
+        return []
+    return earnings
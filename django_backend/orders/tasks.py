@@ -0,0 +1,11 @@
+from jobs.queue import task
+from .models import Order
+from .services import distribute_earnings
+
+
+@task(max_attempts=8, priority=5)
+def distribute_order_earnings(order_id):
+    """Record and credit seller earnings for a paid order"""
+    order = Order.objects.get(pk=order_id)
+    if order.payment_status == 'paid':
+        distribute_earnings(order)
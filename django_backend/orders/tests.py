@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Address, CustomUser
+from sellers.models import SellerStats
+from shops.models import Shop
+from store.models import Product
+from .models import Order, OrderItem
+from .services import cancel_order, place_order
+from store.inventory import InsufficientStock
+
+
+def cart_for(*lines):
+    """Hydrated cart lines for ``(product, qty)`` pairs"""
+    products = Product.objects.select_related('shop', 'effective_price').in_bulk([product.pk for product, _ in lines])
+    items = []
+    for product, qty in lines:
+        product = products[product.pk]
+        items.append({'product': product, 'qty': qty, 'price': product.current_price, 'line_total': product.current_price * qty})
+    return items
+
+
+class CancelOrderConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        self.product = Product.objects.create(shop=shop, name='Mug', price=10, stock=100)
+        self.buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.address = Address.objects.create(
+            user=self.buyer, full_name='Buyer', phone='1', street_address='1 Road',
+            city='City', state='State', country='Country', postal_code='1',
+        )
+
+    def run_in_threads(self, *calls):
+        def run(call):
+            try:
+                return call()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            return list(pool.map(run, calls))
+
+    def test_parallel_cancellations_release_stock_once(self):
+        order = place_order(self.buyer, self.address, cart_for((self.product, 5)), 'cod')
+
+        results = self.run_in_threads(*[lambda: cancel_order(Order.objects.get(pk=order.pk))] * 8)
+
+        self.assertEqual(results.count(True), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 100)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'cancelled')
+
+    def test_cancellations_racing_reservations_keep_stock_exact(self):
+        orders = [place_order(self.buyer, self.address, cart_for((self.product, 3)), 'cod') for _ in range(4)]
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 88)
+
+        def cancel(order):
+            return lambda: cancel_order(Order.objects.get(pk=order.pk))
+
+        def reserve():
+            return place_order(self.buyer, self.address, cart_for((self.product, 2)), 'cod')
+
+        calls = [cancel(order) for order in orders for _ in range(3)] + [reserve] * 6
+        results = self.run_in_threads(*calls)
+
+        self.assertEqual(results[:12].count(True), 4)
+        self.product.refresh_from_db()
+        # Every cancelled order returned its 3 units exactly once; the new orders took 2 each
+        self.assertEqual(self.product.stock, 100 - 6 * 2)
+        self.assertEqual(Order.objects.filter(status='cancelled').count(), 4)
+
+    def test_parallel_orders_never_oversell(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=25)
+
+        def order_one():
+            try:
+                return place_order(self.buyer, self.address, cart_for((self.product, 1)), 'cod')
+            except InsufficientStock as e:
+                return e
+
+        results = self.run_in_threads(*[order_one] * 50)
+
+        self.assertEqual(sum(isinstance(result, Order) for result in results), 25)
+        self.assertEqual(sum(isinstance(result, InsufficientStock) for result in results), 25)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(Order.objects.count(), 25)
+
+
+class PlaceOrderQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = []
+        for n in range(2):
+            owner = CustomUser.objects.create_user(f'seller{n}', f'seller{n}@example.com', 'pw', role='seller')
+            shop = Shop.objects.create(owner=owner, name=f'Shop {n}', slug=f'shop-{n}', email='shop@example.com', phone='1', address='x')
+            cls.products += [Product.objects.create(shop=shop, name=f'Item {n}-{i}', price=5, stock=100) for i in range(10)]
+        cls.buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        cls.address = Address.objects.create(
+            user=cls.buyer, full_name='Buyer', phone='1', street_address='1 Road',
+            city='City', state='State', country='Country', postal_code='1',
+        )
+
+    def place(self, products):
+        # Includes the work deferred to on_commit (seller rollups, cache invalidation)
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_order(self.buyer, self.address, cart_for(*[(product, 1) for product in products]), 'cod')
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        # Create every reporting bucket first, so both orders take the same path
+        self.place(self.products)
+        small = [self.products[0], self.products[10]]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.place(small)
+        with self.assertNumQueries(len(queries)):
+            order = self.place(self.products)
+        self.assertEqual(order.items.count(), 20)
+
+    def test_selling_out_does_not_add_queries_per_shop(self):
+        self.place(self.products)
+        # Every line sells out its product: in one shop, then in both
+        Product.objects.update(stock=1)
+        small = [self.products[0]]
+        large = self.products[1:10] + self.products[10:]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.place(small)
+        with self.assertNumQueries(len(queries)):
+            self.place(large)
+        self.assertEqual(list(SellerStats.objects.values_list('out_of_stock', flat=True)), [10, 10])
+
+
+class EmptyCartOrderTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        self.product = Product.objects.create(shop=shop, name='Mug', price=10, stock=5)
+        self.buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.address = Address.objects.create(
+            user=self.buyer, full_name='Buyer', phone='1', street_address='1 Road',
+            city='City', state='State', country='Country', postal_code='1',
+        )
+
+    def test_place_order_rejects_empty_lines(self):
+        with self.assertRaises(InsufficientStock):
+            place_order(self.buyer, self.address, [], 'cod')
+        self.assertFalse(Order.objects.exists())
+
+    def test_cart_of_inactive_products_cannot_check_out(self):
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('store:cart_add', args=[self.product.pk]))
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+
+        response = self.client.post(reverse('orders:create_order'), {'payment_method': 'cod', 'address_id': self.address.pk})
+
+        self.assertRedirects(response, reverse('store:product_list'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are read from SQLite EXPLAIN QUERY PLAN')
+class OrderQueryPlanTests(TestCase):
+    def test_buyer_order_list_uses_user_index(self):
+        buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        plan = Order.objects.filter(user=buyer).explain()
+        self.assertIn('USING INDEX order_user_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_seller_order_list_uses_shop_index(self):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        plan = OrderItem.objects.filter(shop=shop).order_by('-created_at')[:10].explain()
+        self.assertIn('USING INDEX orderitem_shop_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
@@ -4,70 +4,55 @@ from django.contrib import messages
 from django.conf import settings
 from django.http import JsonResponse
 from decimal import Decimal
-from .models import Order, OrderItem
+from .models import Order
 from accounts.models import Address
-from store.models import Product
-from promotions.models import Coupon, CouponUsage
+from store.cart import get_cart
+from store.inventory import InsufficientStock
+from promotions.coupons import CouponError, available_codes, rank, validate
+from . import services
+from .services import calculate_totals, place_order
 import json
 
 
 @login_required
 def checkout(request):
     """Checkout page"""
-    cart = request.session.get('cart', {})
+    cart = get_cart(request)
     
     if not cart:
         messages.warning(request, 'Your cart is empty.')
         return redirect('store:product_list')
     
-    # Calculate cart totals
-    cart_items = []
-    subtotal = Decimal('0')
-    
-    for product_id, item_data in cart.items():
-        try:
-            product = Product.objects.get(id=product_id, is_active=True)
-            if isinstance(item_data, dict):
-                quantity = item_data.get('qty', 1)
-            else:
-                quantity = item_data  # item_data is already an int
-            
-            item_total = product.price * quantity
-            
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'total': item_total
-            })
-            subtotal += item_total
-        except Product.DoesNotExist:
-            continue
-    
-    # Calculate totals
-    shipping_cost = Decimal('10.00')
-    tax = subtotal * Decimal('0.08')
-    
     discount = Decimal('0')
     applied_coupon = request.session.get('applied_coupon')
     if applied_coupon:
-        discount = Decimal(str(applied_coupon.get('discount', '0')))
+        # The cart may have changed since the coupon was applied
+        try:
+            coupon, discount = validate(applied_coupon['code'], request.user, cart.items)
+        except CouponError as e:
+            messages.warning(request, f"Coupon {applied_coupon['code']} was removed: {e}")
+            del request.session['applied_coupon']
+            applied_coupon = None
+        else:
+            applied_coupon = {'code': coupon.code, 'discount': str(discount)}
     
-    total = subtotal + shipping_cost + tax - discount
+    # Best coupon on offer for this cart, when none is applied
+    suggested = None if applied_coupon else next(iter(rank(available_codes(), request.user, cart.items)), None)
+    
+    # Calculate totals
+    totals = calculate_totals(cart.subtotal, discount)
     
     # Get user addresses
     addresses = Address.objects.filter(user=request.user)
     default_address = addresses.filter(is_default=True).first()
     
     context = {
-        'cart_items': cart_items,
-        'subtotal': subtotal,
-        'shipping_cost': shipping_cost,
-        'tax': tax,
-        'discount': discount,
-        'total': total,
+        'cart_items': cart.items,
+        **totals,
         'addresses': addresses,
         'default_address': default_address,
         'applied_coupon': applied_coupon,
+        'suggested_coupon': suggested,
         'stripe_publishable_key': getattr(settings, 'STRIPE_PUBLISHABLE_KEY', ''),
     }
     
@@ -80,7 +65,7 @@ def create_order(request):
     if request.method != 'POST':
         return redirect('orders:checkout')
     
-    cart = request.session.get('cart', {})
+    cart = get_cart(request)
     if not cart:
         messages.error(request, 'Your cart is empty.')
         return redirect('store:product_list')
@@ -96,112 +81,41 @@ def create_order(request):
     # Get address
     address = get_object_or_404(Address, id=address_id, user=request.user)
     
-    # Calculate totals
-    subtotal = Decimal('0')
-    cart_items = []
-    
-    for product_id, item_data in cart.items():
-        try:
-            product = Product.objects.get(id=product_id, is_active=True)
-            if isinstance(item_data, dict):
-                quantity = item_data.get('qty', 1)
-            else:
-                quantity = item_data  # item_data is already an int
-            
-            item_total = product.price * quantity
-            
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'total': item_total
-            })
-            subtotal += item_total
-        except Product.DoesNotExist:
-            continue
-    
-    shipping_cost = Decimal('10.00')
-    tax = subtotal * Decimal('0.08')
-    
-    discount = Decimal('0')
     applied_coupon = request.session.get('applied_coupon')
-    coupon_code = None
-    
-    if applied_coupon:
-        discount = Decimal(str(applied_coupon.get('discount', '0')))
-        coupon_code = applied_coupon.get('code')
-    
-    total = subtotal + shipping_cost + tax - discount
-    
-    # Create order
-    order = Order.objects.create(
-        user=request.user,
-        shipping_address=address,
-        shipping_full_name=address.full_name,
-        shipping_phone=address.phone,
-        shipping_street=address.street_address,
-        shipping_city=address.city,
-        shipping_state=address.state,
-        shipping_country=address.country,
-        shipping_postal_code=address.postal_code,
-        subtotal=subtotal,
-        shipping_cost=shipping_cost,
-        tax=tax,
-        discount=discount,
-        total_amount=total,
-        payment_method=payment_method,
-    )
-    
-    # Create order items
-    platform_fee_percent = Decimal('0.10')
-    
-    for item in cart_items:
-        product = item['product']
-        quantity = item['quantity']
-        item_subtotal = item['total']
-        
-        platform_fee = item_subtotal * platform_fee_percent
-        seller_amount = item_subtotal - platform_fee
-        
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            shop=product.shop,
-            product_name=product.name,
-            product_price=product.price,
-            quantity=quantity,
-            subtotal=item_subtotal,
-            seller_amount=seller_amount,
-            platform_fee=platform_fee
+    coupon_code = applied_coupon.get('code') if applied_coupon else None
+    
+    try:
+        order = place_order(
+            request.user,
+            address,
+            cart.items,
+            payment_method,
+            coupon_code=coupon_code,
         )
-        
-        # Update product stock
-        product.stock -= quantity
-        product.save()
-    
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-            CouponUsage.objects.create(
-                coupon=coupon,
-                user=request.user,
-                order_number=order.order_number,
-                discount_amount=discount
+    except CouponError as e:
+        messages.error(request, f'Coupon {coupon_code} could not be applied: {e}')
+        del request.session['applied_coupon']
+        return redirect('orders:checkout')
+    except InsufficientStock as e:
+        names = {item['product'].id: item['product'].name for item in cart.items}
+        for shortage in e.shortages:
+            messages.error(
+                request,
+                f"Only {shortage['available']} of {names.get(shortage['product_id'], 'this product')} "
+                f"left in stock (you requested {shortage['requested']})."
             )
-            coupon.times_used += 1
-            coupon.save()
-            
-            # Clear coupon from session
-            del request.session['applied_coupon']
-        except Coupon.DoesNotExist:
-            pass
+        if not e.shortages:
+            messages.error(request, 'Some items in your cart are no longer available.')
+        return redirect('store:cart')
+    
+    if applied_coupon:
+        # Clear coupon from session
+        del request.session['applied_coupon']
     
     # Handle payment method
     if payment_method == 'cod':
-        order.status = 'processing'
-        order.save()
-        
         # Clear cart
-        request.session['cart'] = {}
+        cart.clear()
         messages.success(request, f'Order {order.order_number} placed successfully! Pay on delivery.')
         return redirect('orders:order_detail', order_number=order.order_number)
     
@@ -276,16 +190,7 @@ def cancel_order(request, order_number):
     if request.method == 'POST':
         order = get_object_or_404(Order, order_number=order_number, user=request.user)
         
-        if order.status in ['pending', 'processing']:
-            order.status = 'cancelled'
-            order.save()
-            
-            # Restore product stock
-            for item in order.items.all():
-                if item.product:
-                    item.product.stock += item.quantity
-                    item.product.save()
-            
+        if services.cancel_order(order):
             messages.success(request, f'Order {order_number} has been cancelled.')
         else:
             messages.error(request, 'This order cannot be cancelled.')
@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.contrib import messages
+from django.db import transaction
 from django.utils import timezone
-from .models import Payment, SellerWallet, Earning, PayoutRequest
+from .models import Payment, SellerWallet, Earning, PayoutRequest, WalletEntry, StripeEvent
+from .wallet import InsufficientBalance, debit_payout
+from .webhooks import replay
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -14,7 +18,8 @@ class PaymentAdmin(admin.ModelAdmin):
 class SellerWalletAdmin(admin.ModelAdmin):
     list_display = ("seller", "balance", "total_earned", "total_withdrawn", "updated_at")
     search_fields = ("seller__username", "seller__email")
-    readonly_fields = ("seller", "updated_at")
+    # Balances only move through the ledger (payments.wallet)
+    readonly_fields = ("seller", "balance", "total_earned", "total_withdrawn", "updated_at")
 
 @admin.register(Earning)
 class EarningAdmin(admin.ModelAdmin):
@@ -37,15 +42,22 @@ class PayoutRequestAdmin(admin.ModelAdmin):
         """Mark selected payouts as paid"""
         count = 0
         for payout in queryset.filter(status__in=["approved", "pending"]):
-            payout.status = "paid"
-            payout.processed_at = timezone.now()
-            payout.save()
-            
-            # Adjust wallet
-            wallet, _ = SellerWallet.objects.get_or_create(seller=payout.seller)
-            wallet.balance = max(wallet.balance - payout.amount, 0)
-            wallet.total_withdrawn = wallet.total_withdrawn + payout.amount
-            wallet.save()
+            try:
+                with transaction.atomic():
+                    # Claim the payout first so a concurrent action cannot pay it twice
+                    claimed = PayoutRequest.objects.filter(
+                        pk=payout.pk, status__in=["approved", "pending"]
+                    ).update(status="paid", processed_at=timezone.now())
+                    if not claimed:
+                        continue
+                    debit_payout(payout)
+            except InsufficientBalance:
+                self.message_user(
+                    request,
+                    f"Payout {payout.pk} for {payout.seller} exceeds the wallet balance",
+                    level=messages.ERROR,
+                )
+                continue
             count += 1
         
         self.message_user(request, f"{count} payout(s) marked as paid")
@@ -62,3 +74,39 @@ class PayoutRequestAdmin(admin.ModelAdmin):
         count = queryset.filter(status="pending").update(status="rejected")
         self.message_user(request, f"{count} payout(s) rejected")
     reject.short_description = "Reject selected payouts"
+
+@admin.register(WalletEntry)
+class WalletEntryAdmin(admin.ModelAdmin):
+    list_display = ("seller", "kind", "amount", "description", "created_at")
+    list_filter = ("kind", "created_at")
+    search_fields = ("seller__username", "description")
+    readonly_fields = ("seller", "kind", "amount", "earning", "payout", "description", "created_at")
+    ordering = ['-id']
+
+    def has_change_permission(self, request, obj=None):
+        # The ledger is append-only
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "object_id", "status", "attempts", "created", "received_at")
+    list_filter = ("status", "type")
+    search_fields = ("event_id", "object_id")
+    readonly_fields = (
+        "event_id", "type", "object_id", "created", "payload", "status",
+        "attempts", "last_error", "received_at", "processed_at",
+    )
+    actions = ["replay_events"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def replay_events(self, request, queryset):
+        """Process selected events again"""
+        count = replay(queryset)
+        self.message_user(request, f"{count} event(s) queued for processing")
+    replay_events.short_description = "Replay selected events"
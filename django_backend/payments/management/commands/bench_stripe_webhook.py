@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+import json
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.urls import reverse
+from jobs.models import Job
+from jobs.queue import run_job
+from payments.models import StripeEvent
+
+BENCH_SECRET = 'whsec_bench'
+EVENT_TYPES = ['checkout.session.completed', 'checkout.session.expired', 'payment_intent.created']
+
+
+def sign(payload, secret=BENCH_SECRET):
+    """A ``Stripe-Signature`` header for ``payload``, as Stripe computes it"""
+    timestamp = int(time.time())
+    digest = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Post synthetic signed Stripe events to the webhook through the test client and '
+        'report ack latency and processing throughput (uses the configured database)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=5000, help='Distinct events to send')
+        parser.add_argument('--sessions', type=int, default=500, help='Checkout sessions the events are spread over')
+        parser.add_argument('--duplicates', type=float, default=0.1, help='Share of events delivered a second time')
+        parser.add_argument('--skip-processing', action='store_true', help='Only measure ingestion')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic events and jobs afterwards')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        sessions = [f'cs_bench_{run_id}_{n}' for n in range(max(1, options['sessions']))]
+        deliveries = []
+        for n in range(options['events']):
+            event = {
+                'id': f'evt_bench_{run_id}_{n}',
+                'type': random.choice(EVENT_TYPES),
+                'created': int(time.time()) + n,
+                'data': {'object': {'id': random.choice(sessions), 'metadata': {}}},
+            }
+            payload = json.dumps(event)
+            deliveries.append(payload)
+            if random.random() < options['duplicates']:
+                deliveries.append(payload)
+        random.shuffle(deliveries)
+
+        first_job = Job.objects.aggregate(last=Max('id'))['last'] or 0
+        client = Client()
+        url = reverse('stripe_webhook')
+        latencies = []
+        with override_settings(STRIPE_WEBHOOK_SECRET=BENCH_SECRET, JOBS_RUN_INLINE=False):
+            started = time.perf_counter()
+            for payload in deliveries:
+                sent = time.perf_counter()
+                response = client.post(url, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=sign(payload))
+                latencies.append(time.perf_counter() - sent)
+                if response.status_code != 200:
+                    self.stderr.write(f'Webhook answered {response.status_code}')
+                    return
+            elapsed = time.perf_counter() - started
+
+        stored = StripeEvent.objects.filter(event_id__startswith=f'evt_bench_{run_id}_').count()
+        self.stdout.write(
+            f'Ingested {len(deliveries)} deliveries ({stored} unique events) in {elapsed:.2f}s: '
+            f'{len(deliveries) / elapsed:.0f}/s, ack p50 {percentile(latencies, 0.5) * 1000:.1f}ms '
+            f'p95 {percentile(latencies, 0.95) * 1000:.1f}ms p99 {percentile(latencies, 0.99) * 1000:.1f}ms'
+        )
+
+        if not options['skip_processing']:
+            # Run only this benchmark's jobs, in queue order, in this process
+            job_ids = list(
+                Job.objects.filter(id__gt=first_job, status='queued', payload__object_id__in=sessions)
+                .order_by('id').values_list('id', flat=True)
+            )
+            started = time.perf_counter()
+            for job_id in job_ids:
+                run_job(job_id)
+            elapsed = time.perf_counter() - started
+            events = StripeEvent.objects.filter(event_id__startswith=f'evt_bench_{run_id}_')
+            processed = events.filter(status='processed').count()
+            self.stdout.write(
+                f'Ran {len(job_ids)} jobs processing {processed} events in {elapsed:.2f}s: '
+                f'{processed / elapsed:.0f} events/s ({events.filter(status="pending").count()} still pending)'
+            )
+
+        if not options['keep']:
+            StripeEvent.objects.filter(event_id__startswith=f'evt_bench_{run_id}_').delete()
+            Job.objects.filter(id__gt=first_job, payload__object_id__in=sessions).delete()
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from payments.models import SellerWallet
+from payments.wallet import ledger_totals, matches, take_snapshot
+
+NO_ENTRIES = {'balance': 0, 'total_earned': 0, 'total_withdrawn': 0, 'entry_id': 0}
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify every SellerWallet against its ledger and move the verified snapshot forward '
+        '(run periodically; only entries since the last snapshot are summed unless --full)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Replay the whole ledger instead of starting from snapshots')
+        parser.add_argument('--fix', action='store_true', help='Reset drifted wallets to the ledger totals')
+
+    def handle(self, *args, **options):
+        drifted = []
+        wallet_ids = list(SellerWallet.objects.order_by('pk').values_list('pk', flat=True))
+        for wallet_id in wallet_ids:
+            # Writers hold this lock while their ledger entries are uncommitted, so
+            # the totals and the snapshot's last entry id cannot miss one of them
+            with transaction.atomic():
+                wallet = SellerWallet.objects.select_for_update().get(pk=wallet_id)
+                totals = ledger_totals([wallet.seller_id], since_snapshot=not options['full']).get(
+                    wallet.seller_id, NO_ENTRIES
+                )
+                if matches(wallet, totals):
+                    if totals['entry_id']:
+                        take_snapshot(wallet.seller_id, totals)
+                    continue
+                drifted.append(wallet.seller_id)
+                self.stdout.write(self.style.WARNING(
+                    f'Seller {wallet.seller_id}: wallet balance={wallet.balance} earned={wallet.total_earned} '
+                    f'withdrawn={wallet.total_withdrawn}, ledger balance={totals["balance"]} '
+                    f'earned={totals["total_earned"]} withdrawn={totals["total_withdrawn"]}'
+                ))
+                if options['fix']:
+                    wallet.balance = totals['balance']
+                    wallet.total_earned = totals['total_earned']
+                    wallet.total_withdrawn = totals['total_withdrawn']
+                    wallet.save(update_fields=['balance', 'total_earned', 'total_withdrawn', 'updated_at'])
+                    if totals['entry_id']:
+                        take_snapshot(wallet.seller_id, totals)
+
+        verb = 'fixed' if options['fix'] else 'drifted'
+        self.stdout.write(self.style.SUCCESS(f'{len(wallet_ids)} wallet(s) checked, {len(drifted)} {verb}.'))
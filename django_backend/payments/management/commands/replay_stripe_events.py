@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from payments.models import StripeEvent
+from payments.webhooks import drain, replay
+
+
+class Command(BaseCommand):
+    help = 'Re-run stored Stripe webhook events (by id, Stripe object, status or age)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='Stripe event ids (evt_...)')
+        parser.add_argument('--object', dest='object_ids', action='append', default=[], help='Replay every event of this Stripe object, e.g. a checkout session id')
+        parser.add_argument('--failed', action='store_true', help='Replay events that were set aside after failing')
+        parser.add_argument('--type', help='Only events of this type')
+        parser.add_argument('--hours', type=int, help='Only events received in the last N hours')
+        parser.add_argument('--now', action='store_true', help='Process in this process instead of queueing jobs')
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('event_ids', 'object_ids', 'failed', 'type', 'hours')):
+            raise CommandError('Select events with ids, --object, --failed, --type or --hours')
+        events = StripeEvent.objects.all()
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        if options['object_ids']:
+            events = events.filter(object_id__in=options['object_ids'])
+        if options['failed']:
+            events = events.filter(status='failed')
+        if options['type']:
+            events = events.filter(type=options['type'])
+        if options['hours']:
+            events = events.filter(received_at__gte=timezone.now() - timedelta(hours=options['hours']))
+
+        object_ids = set(events.values_list('object_id', flat=True))
+        count = replay(events)
+        if options['now']:
+            processed = sum(drain(object_id) for object_id in object_ids)
+            self.stdout.write(self.style.SUCCESS(f'Replayed {count} event(s); {processed} processed now.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Queued {count} event(s) on {len(object_ids)} object(s).'))
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def open_ledgers(apps, schema_editor):
+    """
+    Seed the ledger from existing earnings and paid payouts, plus one
+    adjustment per wallet so the ledger balance equals the current balance.
+    """
+    SellerWallet = apps.get_model('payments', 'SellerWallet')
+    Earning = apps.get_model('payments', 'Earning')
+    PayoutRequest = apps.get_model('payments', 'PayoutRequest')
+    WalletEntry = apps.get_model('payments', 'WalletEntry')
+
+    earned = defaultdict(Decimal)
+    withdrawn = defaultdict(Decimal)
+    entries = []
+    for earning in Earning.objects.order_by('created_at', 'id').iterator():
+        earned[earning.seller_id] += earning.amount
+        entries.append(WalletEntry(
+            seller_id=earning.seller_id, kind='earning', amount=earning.amount, earning_id=earning.id,
+            description=f"Order {earning.order_id}", created_at=earning.created_at,
+        ))
+    for payout in PayoutRequest.objects.filter(status='paid').order_by('created_at', 'id').iterator():
+        withdrawn[payout.seller_id] += payout.amount
+        entries.append(WalletEntry(
+            seller_id=payout.seller_id, kind='payout', amount=-payout.amount, payout_id=payout.id,
+            description=f"Payout {payout.id}", created_at=payout.processed_at or payout.created_at,
+        ))
+    WalletEntry.objects.bulk_create(entries, batch_size=500)
+
+    for wallet in SellerWallet.objects.iterator():
+        ledger_balance = earned[wallet.seller_id] - withdrawn[wallet.seller_id]
+        if wallet.balance != ledger_balance:
+            WalletEntry.objects.create(
+                seller_id=wallet.seller_id, kind='adjustment', amount=wallet.balance - ledger_balance,
+                description='Opening balance',
+            )
+        SellerWallet.objects.filter(pk=wallet.pk).update(
+            total_earned=earned[wallet.seller_id], total_withdrawn=withdrawn[wallet.seller_id],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.BigIntegerField(default=0)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_earned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_withdrawn', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='wallet_snapshot', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Wallet Snapshots',
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('earning', 'Earning'), ('payout', 'Payout'), ('adjustment', 'Adjustment')], max_length=16)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('earning', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='wallet_entry', to='payments.earning')),
+                ('payout', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='wallet_entry', to='payments.payoutrequest')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wallet_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Wallet Entries',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['seller', 'id'], name='walletentry_seller_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+
+def key_existing_earnings(apps, schema_editor):
+    """Give earnings that were distributed from an order item the key new ones get"""
+    Earning = apps.get_model('payments', 'Earning')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    earnings = list(Earning.objects.filter(idempotency_key__isnull=True).only('id', 'order_id', 'order_item_id'))
+    item_ids = {int(e.order_item_id) for e in earnings if e.order_item_id.isdigit()}
+    item_orders = dict(OrderItem.objects.filter(id__in=item_ids).values_list('id', 'order_id'))
+
+    seen = set()
+    keyed = []
+    for earning in earnings:
+        if not earning.order_item_id.isdigit():
+            continue
+        item_id = int(earning.order_item_id)
+        if str(item_orders.get(item_id)) != earning.order_id or item_id in seen:
+            continue
+        seen.add(item_id)
+        earning.idempotency_key = f'order-item:{item_id}'
+        keyed.append(earning)
+    Earning.objects.bulk_update(keyed, ['idempotency_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_hot_query_indexes'),
+        ('payments', '0003_wallet_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='earning',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True),
+        ),
+        migrations.RunPython(key_existing_earnings, migrations.RunPython.noop),
+    ]
@@ -30,6 +30,12 @@ class Payment(models.Model):
 
 
 class SellerWallet(models.Model):
+    """
+    Running totals of a seller's WalletEntry ledger, for O(1) balance reads.
+
+    Only payments.wallet changes these fields, always with ``F()`` updates in
+    the same transaction that appends the ledger entry.
+    """
     seller = models.OneToOneField(User, on_delete=models.CASCADE, related_name="wallet")
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -49,11 +55,16 @@ class Earning(models.Model):
     order_item_id = models.CharField(max_length=64)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     platform_fee = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Identifies the sale this earning pays out, so it can only be recorded once
+    idempotency_key = models.CharField(max_length=128, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Earnings'
+        indexes = [
+            models.Index(fields=['seller', '-created_at'], name='earning_seller_created_idx'),
+        ]
 
     def __str__(self):
         return f"Earning seller={self.seller_id} order={self.order_id} amount={self.amount}"
@@ -78,6 +89,93 @@ class PayoutRequest(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Payout Requests'
+        indexes = [
+            models.Index(fields=['seller', '-created_at'], name='payout_seller_created_idx'),
+        ]
 
     def __str__(self):
         return f"PayoutRequest({self.seller_id}, {self.amount}, {self.status})"
+
+
+class WalletEntry(models.Model):
+    """Append-only wallet ledger line; ``amount`` is signed (credits positive)"""
+    KIND_CHOICES = [
+        ("earning", "Earning"),
+        ("payout", "Payout"),
+        ("adjustment", "Adjustment"),
+    ]
+
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name="wallet_entries")
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # One ledger line per earning / payout, so nothing can be applied twice
+    earning = models.OneToOneField(Earning, on_delete=models.SET_NULL, null=True, blank=True, related_name="wallet_entry")
+    payout = models.OneToOneField(PayoutRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name="wallet_entry")
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name_plural = 'Wallet Entries'
+        indexes = [
+            models.Index(fields=['seller', 'id'], name='walletentry_seller_idx'),
+        ]
+
+    def __str__(self):
+        return f"WalletEntry({self.seller_id}, {self.kind}, {self.amount})"
+
+
+class WalletSnapshot(models.Model):
+    """Wallet totals verified against the ledger up to ``entry_id`` by reconcile_wallets"""
+    seller = models.OneToOneField(User, on_delete=models.CASCADE, related_name="wallet_snapshot")
+    entry_id = models.BigIntegerField(default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_withdrawn = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'Wallet Snapshots'
+
+    def __str__(self):
+        return f"WalletSnapshot({self.seller_id}, entry={self.entry_id}, balance={self.balance})"
+
+
+class StripeEvent(models.Model):
+    """
+    A Stripe webhook event as received, stored before any processing.
+
+    The unique ``event_id`` makes redelivered events no-ops. Events about the
+    same Stripe object (e.g. one checkout session) are processed one at a
+    time in ``created`` order by payments.webhooks.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("processed", "Processed"),
+        ("ignored", "Ignored"),
+        ("failed", "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    # Id of the Stripe object the event is about (the checkout session id for checkout events)
+    object_id = models.CharField(max_length=255)
+    created = models.DateTimeField(help_text="When Stripe created the event")
+    payload = models.JSONField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name_plural = 'Stripe Events'
+        indexes = [
+            models.Index(fields=['object_id', 'created', 'id'], condition=models.Q(status='pending'), name='stripeevent_pending_idx'),
+            models.Index(fields=['status', 'received_at'], name='stripeevent_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"StripeEvent({self.event_id}, {self.type}, {self.status})"
@@ -0,0 +1,8 @@
+from jobs.queue import task
+from . import webhooks
+
+
+@task(max_attempts=10, priority=5)
+def process_stripe_events(object_id):
+    """Run the webhook handlers for one Stripe object's pending events, in order"""
+    webhooks.drain(object_id)
@@ -0,0 +1,186 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from jobs.models import Job
+from .models import Earning, Payment, PayoutRequest, SellerWallet, StripeEvent, WalletEntry, WalletSnapshot
+from .wallet import adjust, credit_earnings
+from sellers.models import SellerStats
+from shops.models import Shop
+from .webhooks import HANDLERS, drain, ingest
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def signature(payload, secret=WEBHOOK_SECRET):
+    """A ``Stripe-Signature`` header for ``payload``, as Stripe computes it"""
+    timestamp = int(time.time())
+    digest = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def completed_event(event_id, session_id, seller, buyer):
+    cart = [{'id': 1, 'seller_id': seller.pk, 'price': '20.00', 'quantity': 2}]
+    return {
+        'id': event_id,
+        'type': 'checkout.session.completed',
+        'created': int(time.time()),
+        'data': {'object': {'id': session_id, 'metadata': {'cart_json': json.dumps(cart), 'user_id': str(buyer.pk)}}},
+    }
+
+
+class ReconcileWalletsTests(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+
+    def earn(self, *amounts):
+        earnings = [
+            Earning.objects.create(seller=self.seller, order_id='1', order_item_id=str(n), amount=Decimal(amount))
+            for n, amount in enumerate(amounts)
+        ]
+        credit_earnings(earnings)
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_wallets', *args, stdout=out)
+        return out.getvalue()
+
+    def test_snapshot_covers_every_entry(self):
+        self.earn('10.00', '2.50')
+        adjust(self.seller.pk, Decimal('-1.00'), 'correction')
+
+        self.assertIn('0 drifted', self.reconcile())
+        snapshot = WalletSnapshot.objects.get(seller=self.seller)
+        self.assertEqual(snapshot.entry_id, WalletEntry.objects.latest('id').id)
+        self.assertEqual(snapshot.balance, Decimal('11.50'))
+
+        # Later entries are summed on top of the snapshot
+        adjust(self.seller.pk, Decimal('3.00'), 'bonus')
+        self.assertIn('0 drifted', self.reconcile())
+        self.assertEqual(WalletSnapshot.objects.get(seller=self.seller).balance, Decimal('14.50'))
+
+    def test_fix_resets_drifted_wallet_to_ledger(self):
+        self.earn('10.00')
+        SellerWallet.objects.filter(seller=self.seller).update(balance=Decimal('99.00'))
+
+        self.assertIn('1 drifted', self.reconcile())
+        self.assertIn('1 fixed', self.reconcile('--fix'))
+        self.assertEqual(SellerWallet.objects.get(seller=self.seller).balance, Decimal('10.00'))
+        self.assertIn('0 drifted', self.reconcile())
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, JOBS_RUN_INLINE=True)
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        Shop.objects.create(owner=self.seller, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        self.buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        Payment.objects.create(order_id='pending', stripe_session_id='cs_1', amount=Decimal('40.00'))
+
+    def deliver(self, event):
+        payload = json.dumps(event)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('stripe_webhook'), payload,
+                content_type='application/json', HTTP_STRIPE_SIGNATURE=signature(payload),
+            )
+
+    def test_redelivered_event_is_ingested_and_credited_once(self):
+        event = completed_event('evt_1', 'cs_1', self.seller, self.buyer)
+        for _ in range(3):
+            self.assertEqual(self.deliver(event).status_code, 200)
+
+        self.assertEqual(StripeEvent.objects.filter(event_id='evt_1').count(), 1)
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_1').status, 'processed')
+        self.assertEqual(Job.objects.filter(task='payments.process_stripe_events').count(), 1)
+        self.assertEqual(Payment.objects.get(stripe_session_id='cs_1').status, 'paid')
+        self.assertEqual(Earning.objects.filter(seller=self.seller).count(), 1)
+        # 2 x 20.00 less the 10% platform fee, credited once
+        self.assertEqual(SellerWallet.objects.get(seller=self.seller).balance, Decimal('36.00'))
+        self.assertEqual(SellerStats.objects.get(shop__owner=self.seller).total_earnings, Decimal('36.00'))
+
+    def test_bad_signature_is_rejected(self):
+        payload = json.dumps(completed_event('evt_2', 'cs_1', self.seller, self.buyer))
+        response = self.client.post(
+            reverse('stripe_webhook'), payload,
+            content_type='application/json', HTTP_STRIPE_SIGNATURE=signature(payload, 'whsec_other'),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+
+class ConcurrentIngestTests(TransactionTestCase):
+    def test_parallel_deliveries_store_one_event(self):
+        seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        event = completed_event('evt_3', 'cs_3', seller, buyer)
+
+        def deliver(_):
+            try:
+                return ingest(event) is not None
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            stored = list(pool.map(deliver, range(8)))
+
+        self.assertEqual(stored.count(True), 1)
+        self.assertEqual(StripeEvent.objects.filter(event_id='evt_3').count(), 1)
+        self.assertEqual(Job.objects.filter(task='payments.process_stripe_events').count(), 1)
+
+
+class ConcurrentDrainTests(TransactionTestCase):
+    def test_parallel_drains_run_each_event_once(self):
+        handled = []
+        lock = threading.Lock()
+
+        def handler(obj):
+            with lock:
+                handled.append(obj['n'])
+            time.sleep(0.02)
+
+        for n in range(3):
+            StripeEvent.objects.create(
+                event_id=f'evt_{n}', type='test.event', object_id='cs_1', created=timezone.now(),
+                payload={'data': {'object': {'id': 'cs_1', 'n': n}}},
+            )
+
+        def run(_):
+            try:
+                return drain('cs_1')
+            finally:
+                connection.close()
+
+        with mock.patch.dict(HANDLERS, {'test.event': handler}), ThreadPoolExecutor(max_workers=6) as pool:
+            processed = list(pool.map(run, range(6)))
+
+        self.assertEqual(handled, [0, 1, 2])
+        self.assertEqual(sum(processed), 3)
+        self.assertEqual(set(StripeEvent.objects.values_list('status', 'attempts')), {('processed', 1)})
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are read from SQLite EXPLAIN QUERY PLAN')
+class SellerPaymentsQueryPlanTests(TestCase):
+    def assertPlanUses(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_seller_lists_use_seller_indexes(self):
+        seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        self.assertPlanUses(Earning.objects.filter(seller=seller).order_by('-created_at')[:10], 'earning_seller_created_idx')
+        self.assertPlanUses(PayoutRequest.objects.filter(seller=seller).order_by('-created_at'), 'payout_seller_created_idx')
+
@@ -13,6 +13,8 @@ from django.contrib import messages
 from django.utils import timezone
 
 from .models import Payment, SellerWallet, Earning, PayoutRequest
+from .webhooks import ingest
+from store.cart import get_cart
 
 # We expect store app to provide access to cart, order, and order items.
 try:
@@ -24,18 +26,18 @@ except Exception:
 
 def _get_cart_items_from_session(request) -> List[Dict[str, Any]]:
     """
-    Return a list of items from session cart with keys:
+    Return a list of items from the cart with keys:
     id, name, price, quantity, seller_id
     """
-    cart = request.session.get("cart", {})
     items = []
-    for pid, item in cart.items():
+    for item in get_cart(request).items:
+        product = item["product"]
         items.append({
-            "id": str(pid),
-            "name": item.get("name", f"Product {pid}"),
-            "price": Decimal(str(item.get("price", "0"))),
-            "quantity": int(item.get("qty", 1)),
-            "seller_id": item.get("seller_id"),
+            "id": str(product.pk),
+            "name": product.name,
+            "price": item["price"],
+            "quantity": item["qty"],
+            "seller_id": product.shop.owner_id,
         })
     return items
 
@@ -101,7 +103,7 @@ def create_checkout_session(request):
 
 def checkout_success(request):
     """Handle successful checkout"""
-    request.session["cart"] = {}
+    get_cart(request).clear()
     return render(request, "payments/checkout_success.html")
 
 def checkout_cancel(request):
@@ -121,49 +123,9 @@ def stripe_webhook(request):
     except Exception as e:
         return HttpResponse(status=400)
 
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        session_id = session["id"]
-        try:
-            payment = Payment.objects.get(stripe_session_id=session_id)
-        except Payment.DoesNotExist:
-            return HttpResponse(status=200)
-
-        cart_items = json.loads(session.get("metadata", {}).get("cart_json", "[]"))
-        user_id = session.get("metadata", {}).get("user_id")
-
-        order_id = payment.order_id
-        if Order is not None and order_id == "pending":
-            order = Order.objects.create(user_id=user_id, total_amount=payment.amount, status="paid")
-            order_id = str(order.pk)
-
-        payment.status = "paid"
-        payment.order_id = order_id
-        payment.save()
-
-        # Distribute earnings per item
-        fee_percent = Decimal(str(getattr(settings, "PLATFORM_FEE_PERCENT", 10))) / Decimal("100")
-        for it in cart_items:
-            seller_id = it.get("seller_id")
-            price = Decimal(str(it.get("price", "0")))
-            qty = Decimal(str(it.get("quantity", 1)))
-            gross = (price * qty).quantize(Decimal("0.01"))
-            platform_fee = (gross * fee_percent).quantize(Decimal("0.01"))
-            seller_amount = (gross - platform_fee).quantize(Decimal("0.01"))
-
-            if seller_id:
-                Earning.objects.create(
-                    seller_id=seller_id,
-                    order_id=order_id,
-                    order_item_id=str(it.get("id")),
-                    amount=seller_amount,
-                    platform_fee=platform_fee,
-                )
-                wallet, _ = SellerWallet.objects.get_or_create(seller_id=seller_id)
-                wallet.balance = (wallet.balance + seller_amount).quantize(Decimal("0.01"))
-                wallet.total_earned = (wallet.total_earned + seller_amount).quantize(Decimal("0.01"))
-                wallet.save()
-
+    # Store the raw event and ack right away; payments.webhooks processes it in a
+    # background job. Redelivered events are recognised by their id and dropped.
+    ingest(json.loads(payload))
     return HttpResponse(status=200)
 
 @login_required
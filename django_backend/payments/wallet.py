@@ -0,0 +1,190 @@
+"""
+Seller wallet ledger.
+
+Every balance change is an append-only ``WalletEntry`` written in the same
+transaction as an ``F()`` update of the seller's ``SellerWallet`` totals, so
+concurrent credits and payouts never overwrite each other and the wallet can
+always be re-derived from the ledger (see ``reconcile_wallets``).
+
+Writers update the wallet row before adding its entries, so they hold the
+wallet's row lock while their entries are uncommitted. A snapshot taken under
+that lock therefore never skips an entry that commits later with a lower id.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from sellers.models import SalesRollup, SellerStats
+from .models import Earning, SellerWallet, WalletEntry, WalletSnapshot
+
+ZERO = Decimal('0.00')
+
+
+class InsufficientBalance(Exception):
+    """Raised when a debit would take a wallet below zero"""
+
+
+def _ensure_wallets(seller_ids):
+    SellerWallet.objects.bulk_create(
+        [SellerWallet(seller_id=seller_id) for seller_id in seller_ids],
+        ignore_conflicts=True,
+    )
+
+
+def _apply(seller_id, amount, earned=ZERO, withdrawn=ZERO):
+    return SellerWallet.objects.filter(seller_id=seller_id).update(
+        balance=F('balance') + amount,
+        total_earned=F('total_earned') + earned,
+        total_withdrawn=F('total_withdrawn') + withdrawn,
+    )
+
+
+def credit_earnings(earnings):
+    """
+    Credit saved ``Earning`` rows to their sellers' wallets.
+
+    Writes one ledger entry per earning with a single ``bulk_create`` and one
+    aggregated wallet update per seller. Crediting the same earning twice
+    violates the ledger's unique constraint and rolls the whole batch back.
+    """
+    earnings = [earning for earning in earnings if earning.amount]
+    if not earnings:
+        return
+    per_seller = defaultdict(Decimal)
+    for earning in earnings:
+        per_seller[earning.seller_id] += earning.amount
+
+    with transaction.atomic():
+        _ensure_wallets(per_seller)
+        # Lock wallets in a fixed order so overlapping batches cannot deadlock
+        for seller_id in sorted(per_seller):
+            _apply(seller_id, per_seller[seller_id], earned=per_seller[seller_id])
+        WalletEntry.objects.bulk_create([
+            WalletEntry(
+                seller_id=earning.seller_id,
+                kind='earning',
+                amount=earning.amount,
+                earning=earning,
+                description=f"Order {earning.order_id}",
+            )
+            for earning in earnings
+        ])
+
+
+def save_earnings(earnings):
+    """
+    Write new ``Earning`` rows with one ``bulk_create`` and credit them.
+
+    ``bulk_create`` skips post_save, so seller stats are fed once per seller
+    and the sales rollups after commit. A reused idempotency key raises
+    ``IntegrityError`` and nothing is written.
+    """
+    with transaction.atomic():
+        Earning.objects.bulk_create(earnings)
+        credit_earnings(earnings)
+        per_seller = defaultdict(Decimal)
+        for earning in earnings:
+            per_seller[earning.seller_id] += earning.amount
+        for seller_id, amount in per_seller.items():
+            SellerStats.record_earning(seller_id, amount, earnings[0].created_at)
+        transaction.on_commit(lambda: SalesRollup.record_earnings(earnings))
+
+
+def debit_payout(payout):
+    """
+    Take a paid-out ``PayoutRequest`` off the seller's balance.
+
+    The conditional ``UPDATE ... WHERE balance >= amount`` makes overdrawing
+    impossible even with concurrent payouts; ``InsufficientBalance`` is raised
+    instead and nothing is written.
+    """
+    with transaction.atomic():
+        updated = SellerWallet.objects.filter(
+            seller_id=payout.seller_id, balance__gte=payout.amount
+        ).update(
+            balance=F('balance') - payout.amount,
+            total_withdrawn=F('total_withdrawn') + payout.amount,
+        )
+        if not updated:
+            raise InsufficientBalance(f"Wallet of seller {payout.seller_id} cannot cover {payout.amount}")
+        WalletEntry.objects.create(
+            seller_id=payout.seller_id,
+            kind='payout',
+            amount=-payout.amount,
+            payout=payout,
+            description=f"Payout {payout.pk}",
+        )
+
+
+def adjust(seller_id, amount, description):
+    """Manual correction of a seller's balance, recorded in the ledger"""
+    with transaction.atomic():
+        _ensure_wallets([seller_id])
+        _apply(seller_id, amount)
+        WalletEntry.objects.create(seller_id=seller_id, kind='adjustment', amount=amount, description=description)
+
+
+def ledger_totals(seller_ids=None, since_snapshot=False):
+    """
+    ``{seller_id: {'balance', 'total_earned', 'total_withdrawn', 'entry_id'}}`` summed from the ledger.
+
+    With ``since_snapshot`` only entries after each seller's ``WalletSnapshot``
+    are summed and the snapshot totals are added on top.
+    """
+    entries = WalletEntry.objects.all()
+    if seller_ids is not None:
+        entries = entries.filter(seller_id__in=seller_ids)
+    snapshots = {}
+    if since_snapshot:
+        snapshot_entry = WalletSnapshot.objects.filter(seller_id=OuterRef('seller_id')).values('entry_id')[:1]
+        entries = entries.annotate(
+            since=Coalesce(Subquery(snapshot_entry), Value(0), output_field=models.BigIntegerField())
+        ).filter(id__gt=F('since'))
+        snapshot_rows = WalletSnapshot.objects.all()
+        if seller_ids is not None:
+            snapshot_rows = snapshot_rows.filter(seller_id__in=seller_ids)
+        snapshots = {snapshot.seller_id: snapshot for snapshot in snapshot_rows}
+
+    totals = {}
+    for seller_id, snapshot in snapshots.items():
+        totals[seller_id] = {
+            'balance': snapshot.balance,
+            'total_earned': snapshot.total_earned,
+            'total_withdrawn': snapshot.total_withdrawn,
+            'entry_id': snapshot.entry_id,
+        }
+    rows = entries.values('seller_id').annotate(
+        balance=Sum('amount'),
+        earned=Coalesce(Sum('amount', filter=Q(kind='earning')), Value(ZERO)),
+        withdrawn=Coalesce(Sum('amount', filter=Q(kind='payout')), Value(ZERO)),
+        last_id=Max('id'),
+    )
+    for row in rows:
+        seller_totals = totals.setdefault(row['seller_id'], {
+            'balance': ZERO, 'total_earned': ZERO, 'total_withdrawn': ZERO, 'entry_id': 0,
+        })
+        seller_totals['balance'] += row['balance']
+        seller_totals['total_earned'] += row['earned']
+        seller_totals['total_withdrawn'] -= row['withdrawn']
+        seller_totals['entry_id'] = row['last_id']
+    return totals
+
+
+def matches(wallet, totals):
+    return all(getattr(wallet, field) == totals[field] for field in ('balance', 'total_earned', 'total_withdrawn'))
+
+
+def take_snapshot(seller_id, totals):
+    """Record verified ``totals``; only call while holding the seller's wallet row lock"""
+    WalletSnapshot.objects.update_or_create(
+        seller_id=seller_id,
+        defaults={
+            'entry_id': totals['entry_id'],
+            'balance': totals['balance'],
+            'total_earned': totals['total_earned'],
+            'total_withdrawn': totals['total_withdrawn'],
+            'taken_at': timezone.now(),
+        },
+    )
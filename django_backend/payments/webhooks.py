@@ -0,0 +1,193 @@
+"""
+Stripe webhook ingestion.
+
+``ingest()`` only stores the raw event (the unique event id turns redelivered
+events into no-ops) and queues a job, so the webhook can ack Stripe at once.
+``drain()`` then runs the handlers for one Stripe object's pending events,
+oldest first, so e.g. a session's ``expired`` can never overtake its
+``completed``.
+"""
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from .models import Payment, Earning, StripeEvent
+from .wallet import save_earnings
+
+logger = logging.getLogger(__name__)
+
+# Failed handler runs before an event is set aside as "failed" (see replay_stripe_events)
+MAX_EVENT_ATTEMPTS = 5
+
+
+def handle_checkout_completed(session):
+    """Create the order and seller earnings for a paid checkout session"""
+    from orders.models import Order
+
+    session_id = session["id"]
+    try:
+        payment = Payment.objects.select_for_update().get(stripe_session_id=session_id)
+    except Payment.DoesNotExist:
+        return
+
+    metadata = session.get("metadata") or {}
+    cart_items = json.loads(metadata.get("cart_json", "[]"))
+    user_id = metadata.get("user_id")
+
+    order_id = payment.order_id
+    if order_id == "pending":
+        order = Order.objects.create(
+            user_id=user_id,
+            subtotal=payment.amount,
+            total_amount=payment.amount,
+            payment_method="stripe",
+            payment_status="paid",
+            payment_id=session_id,
+            paid_at=timezone.now(),
+            status="processing",
+        )
+        order_id = str(order.pk)
+
+    payment.status = "paid"
+    payment.order_id = order_id
+    payment.save()
+
+    # Distribute earnings per item
+    fee_percent = Decimal(str(getattr(settings, "PLATFORM_FEE_PERCENT", 10))) / Decimal("100")
+    earnings = []
+    for index, it in enumerate(cart_items):
+        seller_id = it.get("seller_id")
+        price = Decimal(str(it.get("price", "0")))
+        qty = Decimal(str(it.get("quantity", 1)))
+        gross = (price * qty).quantize(Decimal("0.01"))
+        platform_fee = (gross * fee_percent).quantize(Decimal("0.01"))
+        seller_amount = (gross - platform_fee).quantize(Decimal("0.01"))
+
+        if seller_id:
+            earnings.append(Earning(
+                seller_id=seller_id,
+                order_id=order_id,
+                order_item_id=str(it.get("id")),
+                amount=seller_amount,
+                platform_fee=platform_fee,
+                idempotency_key=f"stripe:{session_id}:{index}",
+            ))
+    if not earnings:
+        return
+    try:
+        # One insert, one ledger batch and one wallet update per seller
+        save_earnings(earnings)
+    except IntegrityError:
+        # Replayed event: these earnings were already recorded
+        pass
+
+
+def handle_checkout_failed(session):
+    """Mark the payment of an expired or failed checkout session, unless it was paid"""
+    Payment.objects.filter(stripe_session_id=session["id"], status="created").update(status="failed")
+
+
+HANDLERS = {
+    "checkout.session.completed": handle_checkout_completed,
+    "checkout.session.async_payment_succeeded": handle_checkout_completed,
+    "checkout.session.expired": handle_checkout_failed,
+    "checkout.session.async_payment_failed": handle_checkout_failed,
+}
+
+
+def ingest(event):
+    """
+    Store a verified webhook event (the decoded JSON body) and queue its processing.
+
+    Returns the ``StripeEvent``, or ``None`` if this event id was already received.
+    """
+    obj = event["data"]["object"]
+    handled = event["type"] in HANDLERS
+    try:
+        with transaction.atomic():
+            stripe_event = StripeEvent.objects.create(
+                event_id=event["id"],
+                type=event["type"],
+                object_id=obj.get("id") or event["id"],
+                created=datetime.fromtimestamp(event.get("created") or timezone.now().timestamp(), tz=dt_timezone.utc),
+                payload=event,
+                status="pending" if handled else "ignored",
+            )
+            if handled:
+                schedule(stripe_event.object_id)
+    except IntegrityError:
+        return None
+    return stripe_event
+
+
+def schedule(object_id, delay=None):
+    enqueue("payments.process_stripe_events", {"object_id": object_id}, delay=delay)
+
+
+def drain(object_id):
+    """
+    Process the pending events of one Stripe object in ``created`` order.
+
+    Each event is claimed, handled and marked done in one transaction: the
+    claiming UPDATE moves it from pending to processing, so a second drain
+    waits on the row and then no longer matches it, and a worker that dies
+    mid-handler rolls the event back to pending. If another worker got the
+    oldest pending event first, this call leaves the rest to it. A failing
+    event stops the drain (later events must not overtake it) and is retried
+    with a new job, until it has failed ``MAX_EVENT_ATTEMPTS`` times and is
+    set aside. Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            event = (
+                StripeEvent.objects.select_for_update()
+                .filter(object_id=object_id, status="pending")
+                .order_by("created", "id")
+                .only("id", "type", "payload", "attempts")
+                .first()
+            )
+            if event is None:
+                return processed
+            claimed = StripeEvent.objects.filter(pk=event.pk, status="pending").update(
+                status="processing", attempts=F("attempts") + 1
+            )
+            if not claimed:
+                return processed
+            try:
+                with transaction.atomic():
+                    HANDLERS[event.type](event.payload["data"]["object"])
+            except Exception as exc:
+                attempts = event.attempts + 1
+                status = "failed" if attempts >= MAX_EVENT_ATTEMPTS else "pending"
+                logger.warning("Stripe event %s failed (attempt %s): %s", event.pk, attempts, exc)
+                StripeEvent.objects.filter(pk=event.pk).update(status=status, last_error=repr(exc))
+                if status == "pending":
+                    schedule(object_id, delay=timedelta(seconds=30 * 2 ** (attempts - 1)))
+                    return processed
+                continue
+            StripeEvent.objects.filter(pk=event.pk).update(status="processed", processed_at=timezone.now(), last_error="")
+        processed += 1
+
+
+def replay(events):
+    """
+    Put ``events`` (a StripeEvent queryset) back to pending and queue their objects.
+
+    Handlers are idempotent, so replaying already processed events is safe.
+    Returns the number of events queued.
+    """
+    events = events.filter(type__in=list(HANDLERS))
+    with transaction.atomic():
+        object_ids = set(events.values_list("object_id", flat=True))
+        count = events.update(status="pending", attempts=0, last_error="", processed_at=None)
+        for object_id in object_ids:
+            schedule(object_id)
+    return count
@@ -4,8 +4,8 @@ from .models import Event, Coupon, CouponUsage
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['name', 'event_type', 'discount_percentage', 'start_date', 'end_date', 'is_active', 'is_ongoing']
-    list_filter = ['event_type', 'is_active', 'start_date']
+    list_display = ['name', 'event_type', 'discount_percentage', 'start_date', 'end_date', 'is_active', 'status']
+    list_filter = ['event_type', 'is_active', 'status', 'start_date']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     filter_horizontal = ['products', 'categories']
@@ -27,10 +27,6 @@ class EventAdmin(admin.ModelAdmin):
             'fields': ('is_active', 'is_featured')
         }),
     )
-    
-    def is_ongoing(self, obj):
-        return obj.is_ongoing
-    is_ongoing.boolean = True
 
 
 @admin.register(Coupon)
@@ -0,0 +1,197 @@
+"""
+Coupon validation, evaluation and redemption.
+
+Coupon definitions, together with the ids of the products and categories
+they are limited to, are cached by code (dropped whenever a coupon or its
+scope changes, via the ``coupon`` cache tag), so applying a code costs no
+coupon query; the only read per check is the user's ``CouponUserCount`` rows.
+A scoped coupon only discounts the cart lines it covers: products listed on
+it and products anywhere under its categories, resolved against the
+in-process category tree. Evaluating any number of coupons is one pass over
+the cart per coupon with no query per line.
+
+Redemption is enforced in the database, not from what was read earlier: the
+global and per-user counters are each bumped with a conditional ``F()``
+update that only matches while the limit has not been reached, so concurrent
+checkouts can never redeem a coupon more often than allowed.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from josmee_shop.cache import get_or_set, get_or_set_many, invalidate_tags, model_tag
+from store.category_tree import get_tree
+from .models import Coupon, CouponUserCount
+
+
+class CouponError(Exception):
+    """The coupon cannot be applied or redeemed; the message is shown to the customer"""
+
+
+class Evaluation:
+    """A coupon checked against one cart: the lines it covers and what it takes off them"""
+
+    def __init__(self, coupon, lines):
+        self.coupon = coupon
+        self.lines = lines
+        self.eligible_subtotal = sum((item['line_total'] for item in lines), Decimal('0'))
+        self.error = None
+        self.discount = coupon.calculate_discount(self.eligible_subtotal)
+
+    def reject(self, error):
+        self.error = error
+        self.discount = Decimal('0')
+
+    @property
+    def applies(self):
+        return self.error is None and self.discount > 0
+
+    def __repr__(self):
+        return f'<Evaluation {self.coupon.code} {self.error or self.discount}>'
+
+
+def normalize(code):
+    return (code or '').strip().upper()
+
+
+def _load_coupons(codes):
+    """Coupons by code with their scope ids attached; unknown codes map to False"""
+    coupons = {coupon.pk: coupon for coupon in Coupon.objects.filter(code__in=codes)}
+    product_ids = defaultdict(set)
+    category_ids = defaultdict(set)
+    if coupons:
+        for coupon_id, product_id in Coupon.products.through.objects.filter(
+            coupon_id__in=coupons
+        ).values_list('coupon_id', 'product_id'):
+            product_ids[coupon_id].add(product_id)
+        for coupon_id, category_id in Coupon.categories.through.objects.filter(
+            coupon_id__in=coupons
+        ).values_list('coupon_id', 'category_id'):
+            category_ids[coupon_id].add(category_id)
+    found = {code: False for code in codes}
+    for coupon in coupons.values():
+        coupon.product_ids = frozenset(product_ids[coupon.pk])
+        coupon.category_ids = frozenset(category_ids[coupon.pk])
+        found[coupon.code] = coupon
+    return found
+
+
+def get_coupons(codes):
+    """``{code: coupon}`` for the known ``codes``, from the cache; misses are loaded together"""
+    codes = {normalize(code) for code in codes} - {''}
+    # Unknown codes are cached as False, so guessing codes does not hit the database
+    found = get_or_set_many('coupon-definition', _load_coupons, sorted(codes), tags=[model_tag(Coupon)])
+    return {code: coupon for code, coupon in found.items() if coupon}
+
+
+def get_coupon(code):
+    """The coupon with ``code`` from the cache, or ``None``"""
+    return get_coupons([code]).get(normalize(code))
+
+
+def available_codes():
+    """Codes of active coupons that have not ended, as candidates to rank for a cart"""
+    return get_or_set(
+        'coupon-codes',
+        lambda: list(Coupon.objects.filter(is_active=True, valid_until__gte=timezone.now()).values_list('code', flat=True)),
+        tags=[model_tag(Coupon)],
+    )
+
+
+def eligible_lines(coupon, cart_items, tree=None):
+    """The hydrated cart lines ``coupon`` covers; an unscoped coupon covers them all"""
+    if not coupon.product_ids and not coupon.category_ids:
+        return list(cart_items)
+    tree = tree or get_tree()
+    category_ids = set()
+    for category_id in coupon.category_ids:
+        category_ids.update(tree.descendant_ids(category_id))
+    return [
+        item for item in cart_items
+        if item['product'].id in coupon.product_ids or item['product'].category_id in category_ids
+    ]
+
+
+def evaluate(coupons, user, cart_items):
+    """
+    An ``Evaluation`` per coupon (as returned by ``get_coupons``) for ``user``'s cart.
+
+    The user's counters for all coupons are read in one query; the minimum
+    purchase applies to the lines the coupon covers.
+    """
+    coupons = list(coupons)
+    counts = dict(
+        CouponUserCount.objects.filter(user=user, coupon__in=coupons).values_list('coupon_id', 'times_used')
+    )
+    tree = get_tree()
+    evaluations = []
+    for coupon in coupons:
+        evaluation = Evaluation(coupon, eligible_lines(coupon, cart_items, tree))
+        if not evaluation.lines:
+            evaluation.reject('This coupon does not apply to any item in your cart')
+        else:
+            can_use, message = coupon.can_use(user, evaluation.eligible_subtotal, times_used=counts.get(coupon.pk, 0))
+            if not can_use:
+                evaluation.reject(message)
+        evaluations.append(evaluation)
+    return evaluations
+
+
+def rank(codes, user, cart_items):
+    """Evaluations of the ``codes`` that apply to the cart, biggest discount first"""
+    evaluations = evaluate(get_coupons(codes).values(), user, cart_items)
+    return sorted(
+        (evaluation for evaluation in evaluations if evaluation.applies),
+        key=lambda evaluation: evaluation.discount, reverse=True,
+    )
+
+
+def validate(code, user, cart_items):
+    """
+    Check ``code`` for ``user`` against hydrated cart lines.
+
+    Returns ``(coupon, discount)`` or raises ``CouponError``. The global usage
+    limit is checked against the cached counter here and enforced exactly by
+    ``redeem()``.
+    """
+    coupon = get_coupon(code)
+    if coupon is None:
+        raise CouponError('Invalid coupon code')
+    evaluation, = evaluate([coupon], user, cart_items)
+    if evaluation.error:
+        raise CouponError(evaluation.error)
+    return coupon, evaluation.discount
+
+
+def redeem(code, user, cart_items):
+    """
+    Validate and use up one redemption of ``code`` for ``user``.
+
+    Must run inside the transaction that places the order, so the counters
+    roll back with it. Returns ``(coupon, discount)`` or raises ``CouponError``.
+    """
+    coupon, discount = validate(code, user, cart_items)
+    now = timezone.now()
+    with transaction.atomic():
+        taken = Coupon.objects.filter(
+            Q(usage_limit__isnull=True) | Q(times_used__lt=F('usage_limit')),
+            pk=coupon.pk, is_active=True, valid_from__lte=now, valid_until__gte=now,
+        ).update(times_used=F('times_used') + 1)
+        if not taken:
+            raise CouponError('This coupon is no longer available')
+
+        counter, _ = CouponUserCount.objects.get_or_create(coupon=coupon, user=user)
+        taken = CouponUserCount.objects.filter(
+            pk=counter.pk, times_used__lt=coupon.usage_limit_per_user
+        ).update(times_used=F('times_used') + 1)
+        if not taken:
+            # Leaving the block with an exception also undoes the global increment
+            raise CouponError('You have already used this coupon')
+
+    if coupon.usage_limit and Coupon.objects.filter(pk=coupon.pk, times_used__gte=coupon.usage_limit).exists():
+        # Used up: stop serving the cached definition, which still looks available
+        transaction.on_commit(lambda: invalidate_tags(model_tag(Coupon)))
+    return coupon, discount
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from promotions.scheduler import advance_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Start and end events whose time has come and schedule the next transition '
+        '(normally done by the job queue; safe to run from cron as a fallback)'
+    )
+
+    def handle(self, *args, **options):
+        started, ended = advance_events()
+        self.stdout.write(self.style.SUCCESS(f'{started} event(s) started, {ended} ended.'))
@@ -0,0 +1,95 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from accounts.models import CustomUser
+from promotions.coupons import CouponError, redeem
+from promotions.models import Coupon, CouponUserCount
+
+
+class Command(BaseCommand):
+    help = (
+        'Redeem one synthetic coupon from many threads at once and check that neither its usage '
+        'limit nor the per-user limit is exceeded (uses the configured database)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=400, help='Redemptions to attempt in total')
+        parser.add_argument('--users', type=int, default=40)
+        parser.add_argument('--usage-limit', type=int, default=50)
+        parser.add_argument('--per-user', type=int, default=2)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic coupon and users afterwards')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code=f'BENCH{run_id}'.upper(),
+            discount_type='percentage',
+            discount_value=10,
+            usage_limit=options['usage_limit'],
+            usage_limit_per_user=options['per_user'],
+            valid_from=now - timedelta(minutes=1),
+            valid_until=now + timedelta(hours=1),
+        )
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench_{run_id}_{n}', email=f'bench_{run_id}_{n}@example.com')
+            for n in range(options['users'])
+        ])
+        users = list(CustomUser.objects.filter(username__startswith=f'bench_{run_id}_'))
+
+        # The coupon is not scoped, so the line needs no product
+        cart = [{'product': None, 'qty': 1, 'price': Decimal('100'), 'line_total': Decimal('100')}]
+
+        def attempt(n):
+            try:
+                with transaction.atomic():
+                    redeem(coupon.code, users[n % len(users)], cart)
+                return 'redeemed'
+            except CouponError:
+                return 'refused'
+            except Exception as exc:
+                return type(exc).__name__
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                outcomes = list(pool.map(attempt, range(options['attempts'])))
+            elapsed = time.perf_counter() - started
+
+            results = {outcome: outcomes.count(outcome) for outcome in set(outcomes)}
+            coupon.refresh_from_db()
+            counts = CouponUserCount.objects.filter(coupon=coupon).aggregate(total=Sum('times_used'), most=Max('times_used'))
+            self.stdout.write(
+                f'{options["attempts"]} attempts from {options["threads"]} threads in {elapsed:.2f}s: '
+                + ', '.join(f'{count} {outcome}' for outcome, count in sorted(results.items()))
+            )
+            self.stdout.write(
+                f'times_used={coupon.times_used} (limit {coupon.usage_limit}), '
+                f'per-user total={counts["total"] or 0}, most by one user={counts["most"] or 0} '
+                f'(limit {coupon.usage_limit_per_user})'
+            )
+
+            problems = []
+            if coupon.times_used > coupon.usage_limit:
+                problems.append('usage limit exceeded')
+            if (counts['most'] or 0) > coupon.usage_limit_per_user:
+                problems.append('per-user limit exceeded')
+            if coupon.times_used != results.get('redeemed', 0) or coupon.times_used != (counts['total'] or 0):
+                problems.append('counters disagree with successful redemptions')
+            if problems:
+                raise CommandError('; '.join(problems))
+            self.stdout.write(self.style.SUCCESS('Limits held'))
+        finally:
+            if not options['keep']:
+                coupon.delete()
+                CustomUser.objects.filter(username__startswith=f'bench_{run_id}_').delete()
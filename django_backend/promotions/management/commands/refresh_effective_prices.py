@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from promotions.pricing import refresh_effective_prices
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed event prices of every product'
+
+    def handle(self, *args, **options):
+        changed = refresh_effective_prices()
+        self.stdout.write(self.style.SUCCESS(f'{changed} effective price(s) written or removed.'))
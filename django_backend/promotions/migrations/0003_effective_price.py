@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0002_hot_query_indexes'),
+        ('store', '0004_category_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePrice',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='effective_price', serialize=False, to='store.product')),
+                ('discount_percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valid_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_prices', to='promotions.event')),
+            ],
+        ),
+    ]
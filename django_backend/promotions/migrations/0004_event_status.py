@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_statuses(apps, schema_editor):
+    Event = apps.get_model('promotions', 'Event')
+    now = timezone.now()
+    Event.objects.filter(start_date__lte=now, end_date__gte=now).update(status='live')
+    Event.objects.filter(end_date__lt=now).update(status='ended')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0003_effective_price'),
+        ('store', '0004_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='status',
+            field=models.CharField(choices=[('upcoming', 'Upcoming'), ('live', 'Live'), ('ended', 'Ended')], default='upcoming', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'start_date'], name='event_status_start_idx'),
+        ),
+        migrations.RunPython(set_statuses, migrations.RunPython.noop),
+    ]
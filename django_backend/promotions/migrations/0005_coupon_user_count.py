@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_usages(apps, schema_editor):
+    CouponUsage = apps.get_model('promotions', 'CouponUsage')
+    CouponUserCount = apps.get_model('promotions', 'CouponUserCount')
+    counts = CouponUsage.objects.values('coupon_id', 'user_id').annotate(total=Count('id'))
+    CouponUserCount.objects.bulk_create(
+        [CouponUserCount(coupon_id=row['coupon_id'], user_id=row['user_id'], times_used=row['total']) for row in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0004_event_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CouponUserCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('times_used', models.PositiveIntegerField(default=0)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_counts', to='promotions.coupon')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('coupon', 'user'), name='unique_coupon_user_count')],
+            },
+        ),
+        migrations.RunPython(count_usages, migrations.RunPython.noop),
+    ]
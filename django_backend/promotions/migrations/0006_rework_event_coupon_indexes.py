@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0005_coupon_user_count'),
+        ('store', '0006_shop_listing_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='coupon',
+            name='coupon_active_valid_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_active_dates_idx',
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['valid_until', 'valid_from'], name='coupon_active_valid_idx'),
+        ),
+    ]
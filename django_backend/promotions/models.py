@@ -15,6 +15,12 @@ class Event(models.Model):
         ('special', 'Special Event'),
     ]
     
+    STATUS_CHOICES = [
+        ('upcoming', 'Upcoming'),
+        ('live', 'Live'),
+        ('ended', 'Ended'),
+    ]
+    
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField(blank=True)
@@ -41,28 +47,47 @@ class Event(models.Model):
     # Status
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
+    # Moved along at start_date/end_date by promotions.scheduler
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='upcoming', editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['status', 'start_date'], name='event_status_start_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    def status_at(self, moment):
+        if moment < self.start_date:
+            return 'upcoming'
+        if moment <= self.end_date:
+            return 'live'
+        return 'ended'
+    
+    def save(self, *args, **kwargs):
+        # Dates may have been edited; the scheduler takes it from here
+        self.status = self.status_at(timezone.now())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'status'}
+        super().save(*args, **kwargs)
+    
     @property
     def is_ongoing(self):
-        now = timezone.now()
-        return self.is_active and self.start_date <= now <= self.end_date
+        return self.is_active and self.status == 'live'
     
     @property
     def is_upcoming(self):
-        return self.is_active and self.start_date > timezone.now()
+        return self.is_active and self.status == 'upcoming'
     
     @property
     def is_expired(self):
-        return self.end_date < timezone.now()
+        return self.status == 'ended'
     
     def get_discounted_price(self, original_price):
         """Calculate discounted price"""
@@ -70,6 +95,25 @@ class Event(models.Model):
         return original_price - discount_amount
 
 
+class EffectivePrice(models.Model):
+    """
+    A product's price under the best ongoing event, precomputed by promotions.pricing.
+
+    Only discounted products have a row; listings read it with a single join
+    (``select_related('effective_price')``, see ``Product.current_price``).
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='effective_price')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='effective_prices')
+    discount_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    # End of the event; the row is ignored after this even before the next refresh
+    valid_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.price} ({self.event_id})"
+
+
 class Coupon(models.Model):
     """Discount coupons"""
     DISCOUNT_TYPE_CHOICES = [
@@ -109,6 +153,10 @@ class Coupon(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # valid_until first: the code list only bounds it, the coupons page bounds both
+            models.Index(fields=['valid_until', 'valid_from'], condition=models.Q(is_active=True), name='coupon_active_valid_idx'),
+        ]
     
     def __str__(self):
         return self.code
@@ -124,8 +172,8 @@ class Coupon(models.Model):
             return False
         return True
     
-    def can_use(self, user, cart_total):
-        """Check if user can use this coupon"""
+    def can_use(self, user, cart_total, times_used=None):
+        """Check if user can use this coupon; ``times_used`` is the user's count, when already known"""
         if not self.is_valid:
             return False, "Coupon is not valid"
         
@@ -133,12 +181,17 @@ class Coupon(models.Model):
             return False, f"Minimum purchase amount is ${self.min_purchase_amount}"
         
         # Check user usage
-        user_usage = CouponUsage.objects.filter(coupon=self, user=user).count()
-        if user_usage >= self.usage_limit_per_user:
+        if times_used is None:
+            times_used = self.times_used_by(user)
+        if times_used >= self.usage_limit_per_user:
             return False, "You have already used this coupon"
         
         return True, "Coupon is valid"
     
+    def times_used_by(self, user):
+        """How often ``user`` has redeemed this coupon, from their usage counter"""
+        return CouponUserCount.objects.filter(coupon=self, user=user).values_list('times_used', flat=True).first() or 0
+    
     def calculate_discount(self, cart_total):
         """Calculate discount amount"""
         if self.discount_type == 'percentage':
@@ -169,3 +222,23 @@ class CouponUsage(models.Model):
     
     def __str__(self):
         return f"{self.user.username} used {self.coupon.code}"
+
+
+class CouponUserCount(models.Model):
+    """
+    How often a user has redeemed a coupon.
+
+    Kept alongside ``CouponUsage`` so the per-user limit is a single row read
+    and can be enforced with a conditional ``F()`` update on redemption.
+    """
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='user_counts')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='coupon_counts')
+    times_used = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'user'], name='unique_coupon_user_count'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} used {self.coupon} {self.times_used}x"
@@ -0,0 +1,116 @@
+"""
+Effective prices.
+
+Every product covered by an ongoing event (directly or through one of its
+categories or their subcategories) gets an ``EffectivePrice`` row holding the
+price under the best discount. Rows are rebuilt when events or their scope
+change, when a discounted product's price changes and whenever
+promotions.scheduler starts or ends an event, so reading a price never means
+evaluating events.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from josmee_shop.cache import invalidate_tags
+from store.category_tree import get_tree
+from store.models import Product
+from .models import EffectivePrice, Event
+
+CENT = Decimal('0.01')
+
+
+def discounted(price, percentage):
+    return (price * (1 - percentage / Decimal('100'))).quantize(CENT)
+
+
+def event_products(event):
+    """Active products an event covers, as one query"""
+    tree = get_tree()
+    category_ids = set()
+    for category_id in event.categories.values_list('id', flat=True):
+        category_ids.update(tree.descendant_ids(category_id))
+    return Product.objects.filter(Q(events=event) | Q(category_id__in=category_ids), is_active=True).distinct()
+
+
+def best_events(product_ids=None):
+    """``{product_id: event}`` for the highest discount among live events on each product"""
+    events = {event.pk: event for event in Event.objects.filter(is_active=True, status='live')}
+    if not events:
+        return {}
+    direct = defaultdict(set)
+    for event_id, product_id in Event.products.through.objects.filter(event_id__in=events).values_list('event_id', 'product_id'):
+        direct[event_id].add(product_id)
+    by_category = defaultdict(set)
+    tree = get_tree()
+    for event_id, category_id in Event.categories.through.objects.filter(event_id__in=events).values_list('event_id', 'category_id'):
+        by_category[event_id].update(tree.descendant_ids(category_id))
+
+    category_products = defaultdict(list)
+    all_categories = set().union(*by_category.values()) if by_category else set()
+    if all_categories:
+        products = Product.objects.filter(category_id__in=all_categories)
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+        for product_id, category_id in products.values_list('id', 'category_id'):
+            category_products[category_id].append(product_id)
+
+    best = {}
+    # Highest discount first; on a tie the event ending first wins
+    for event in sorted(events.values(), key=lambda event: (-event.discount_percentage, event.end_date, event.pk)):
+        covered = set(direct[event.pk])
+        for category_id in by_category[event.pk]:
+            covered.update(category_products[category_id])
+        if product_ids is not None:
+            covered &= set(product_ids)
+        for product_id in covered:
+            best.setdefault(product_id, event)
+    return best
+
+
+def refresh_effective_prices(product_ids=None):
+    """
+    Rebuild ``EffectivePrice`` rows, for ``product_ids`` or the whole catalog.
+
+    Returns the number of rows written or removed. Cached pages that show
+    prices are invalidated when anything changed.
+    """
+    best = best_events(product_ids)
+    prices = Product.objects.filter(id__in=best, is_active=True).values_list('id', 'price')
+    rows = [
+        EffectivePrice(
+            product_id=product_id,
+            event=best[product_id],
+            discount_percentage=best[product_id].discount_percentage,
+            price=discounted(price, best[product_id].discount_percentage),
+            valid_until=best[product_id].end_date,
+        )
+        for product_id, price in prices
+    ]
+
+    existing = EffectivePrice.objects.all()
+    if product_ids is not None:
+        existing = existing.filter(product_id__in=product_ids)
+    current = {
+        product_id: (event_id, price, valid_until)
+        for product_id, event_id, price, valid_until in existing.values_list('product_id', 'event_id', 'price', 'valid_until')
+    }
+    wanted = {row.product_id: (row.event_id, row.price, row.valid_until) for row in rows}
+    changed = [row for row in rows if current.get(row.product_id) != wanted[row.product_id]]
+    stale = set(current) - set(wanted)
+
+    with transaction.atomic():
+        if stale:
+            EffectivePrice.objects.filter(product_id__in=stale).delete()
+        if changed:
+            EffectivePrice.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=['event', 'discount_percentage', 'price', 'valid_until', 'updated_at'],
+            )
+    if stale or changed:
+        transaction.on_commit(lambda: invalidate_tags('product'))
+    return len(stale) + len(changed)
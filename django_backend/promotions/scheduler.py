@@ -0,0 +1,94 @@
+"""
+Event lifecycle scheduler.
+
+Events move upcoming -> live -> ended through conditional UPDATEs run at
+their boundaries: each run of ``advance_events`` queues the next run (a
+delayed job) for the earliest upcoming start or live end. Whenever an event
+changes state, effective prices are rebuilt and the cached event listing is
+invalidated and warmed again, so pages never scan event dates themselves. The
+cached listing also expires at the next boundary on its own, so a process
+that misses the invalidation still never serves it past a transition.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from josmee_shop.cache import invalidate_tags, make_key
+from .models import Event
+from .pricing import refresh_effective_prices
+
+EVENT_TAG = 'event'
+
+
+def event_snapshot():
+    """``{'live': [...], 'upcoming': [...]}`` active events, cached until an event changes or the next boundary"""
+    key = make_key('event-snapshot', tags=(EVENT_TAG,))
+    snapshot = cache.get(key)
+    if snapshot is None:
+        now = timezone.now()
+        events = list(Event.objects.filter(is_active=True, status__in=['live', 'upcoming']))
+        snapshot = {'live': [], 'upcoming': []}
+        boundaries = []
+        for event in events:
+            # Classified by date, so a boundary the scheduler has not reached yet still counts
+            status = event.status_at(now)
+            if status == 'upcoming':
+                boundaries.append(event.start_date)
+            elif status == 'live':
+                boundaries.append(event.end_date + timedelta(seconds=1))
+            else:
+                continue
+            snapshot[status].append(event)
+        timeout = DEFAULT_TIMEOUT
+        if boundaries:
+            timeout = max(int((min(boundaries) - now).total_seconds()) + 1, 1)
+        cache.set(key, snapshot, timeout)
+    return snapshot
+
+
+def rewarm_listing():
+    invalidate_tags(EVENT_TAG)
+    event_snapshot()
+
+
+def next_transition():
+    """When the next event starts or ends, or ``None``"""
+    boundaries = Event.objects.aggregate(
+        start=Min('start_date', filter=Q(status='upcoming')),
+        end=Min('end_date', filter=Q(status='live')),
+    )
+    if boundaries['end'] is not None:
+        # end_date is the last live moment
+        boundaries['end'] += timedelta(seconds=1)
+    candidates = [moment for moment in boundaries.values() if moment is not None]
+    return min(candidates) if candidates else None
+
+
+def schedule_next():
+    """Queue ``advance_events`` for the next boundary (once per boundary)"""
+    moment = next_transition()
+    if moment is None:
+        return None
+    return enqueue(
+        'promotions.advance_events',
+        delay=max(moment - timezone.now(), timedelta(0)),
+        idempotency_key=f'event-transition:{moment.isoformat()}',
+    )
+
+
+def advance_events(now=None):
+    """Move events whose boundary has passed; returns ``(started, ended)``"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ended = Event.objects.filter(status__in=['upcoming', 'live'], end_date__lt=now).update(status='ended')
+        started = Event.objects.filter(status='upcoming', start_date__lte=now).update(status='live')
+    if started or ended:
+        refresh_effective_prices()
+        transaction.on_commit(rewarm_listing)
+    schedule_next()
+    return started, ended
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from josmee_shop.cache import invalidate_instance, invalidate_tags, model_tag
+from store.models import Category, Product
+from .models import Event, Coupon
+from .pricing import refresh_effective_prices
+from .scheduler import schedule_next
+
+for model in (Event, Coupon):
+    post_save.connect(invalidate_instance, sender=model, dispatch_uid=f'cache-save-{model._meta.label}')
+    post_delete.connect(invalidate_instance, sender=model, dispatch_uid=f'cache-delete-{model._meta.label}')
+
+
+@receiver(m2m_changed, sender=Event.products.through)
+@receiver(m2m_changed, sender=Event.categories.through)
+@receiver(m2m_changed, sender=Coupon.products.through)
+@receiver(m2m_changed, sender=Coupon.categories.through)
+def invalidate_scope(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Changing which products/categories an event or coupon covers invalidates it"""
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # Edited from the product/category side: instance is the product or category
+        owner_model = Event if sender in (Event.products.through, Event.categories.through) else Coupon
+        tags = [model_tag(owner_model)] + [model_tag(owner_model, pk) for pk in pk_set or ()]
+    else:
+        tags = [model_tag(instance), model_tag(instance, instance.pk)]
+    invalidate_tags(*tags)
+
+
+def refresh_prices_on_commit(product_ids=None):
+    transaction.on_commit(lambda: refresh_effective_prices(product_ids))
+
+
+@receiver(post_save, sender=Event)
+def reprice_event(sender, instance, **kwargs):
+    """Reprice now and make sure the scheduler wakes up at the event's boundaries"""
+    refresh_prices_on_commit()
+    transaction.on_commit(schedule_next)
+
+
+@receiver(post_delete, sender=Event)
+def reprice_deleted_event(sender, instance, **kwargs):
+    refresh_prices_on_commit()
+
+
+@receiver(m2m_changed, sender=Event.products.through)
+@receiver(m2m_changed, sender=Event.categories.through)
+def reprice_event_scope(sender, action, **kwargs):
+    if action.startswith('post_'):
+        refresh_prices_on_commit()
+
+
+@receiver(post_save, sender=Product)
+def reprice_product(sender, instance, created, update_fields=None, **kwargs):
+    """A product's price, category or visibility changes its effective price"""
+    if update_fields is not None and not {'price', 'category', 'is_active'} & set(update_fields):
+        return
+    refresh_prices_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reprice_category(sender, instance, created, **kwargs):
+    # A moved category may enter or leave a discounted subtree
+    if not created:
+        refresh_prices_on_commit()
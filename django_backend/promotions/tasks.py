@@ -0,0 +1,8 @@
+from jobs.queue import task
+from . import scheduler
+
+
+@task(priority=5, max_attempts=10)
+def advance_events():
+    """Start and end events whose boundary has passed, then schedule the next run"""
+    scheduler.advance_events()
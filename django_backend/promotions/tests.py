@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from shops.models import Shop
+from store.models import Category, Product
+from .coupons import CouponError, rank, redeem, validate
+from .models import Coupon, CouponUserCount, Event
+
+# Unscoped coupons never look at the product
+CART = [{'product': None, 'qty': 1, 'price': Decimal('100'), 'line_total': Decimal('100')}]
+
+
+def make_coupon(code, **fields):
+    now = timezone.now()
+    return Coupon.objects.create(
+        code=code, discount_type='percentage', discount_value=10,
+        valid_from=now - timedelta(minutes=1), valid_until=now + timedelta(hours=1), **fields,
+    )
+
+
+class ConcurrentRedemptionTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def redeem_in_threads(self, code, users, attempts):
+        def attempt(n):
+            try:
+                with transaction.atomic():
+                    redeem(code, users[n % len(users)], CART)
+                return True
+            except CouponError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            return list(pool.map(attempt, range(attempts)))
+
+    def test_usage_limit_is_never_exceeded(self):
+        coupon = make_coupon('LIMITED', usage_limit=5, usage_limit_per_user=10)
+        users = [CustomUser.objects.create_user(f'u{n}', f'u{n}@example.com', 'pw') for n in range(4)]
+
+        results = self.redeem_in_threads(coupon.code, users, 40)
+
+        coupon.refresh_from_db()
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(coupon.times_used, 5)
+        self.assertEqual(CouponUserCount.objects.filter(coupon=coupon).aggregate(total=Sum('times_used'))['total'], 5)
+
+    def test_per_user_limit_is_never_exceeded(self):
+        coupon = make_coupon('PERUSER', usage_limit=None, usage_limit_per_user=2)
+        users = [CustomUser.objects.create_user(f'u{n}', f'u{n}@example.com', 'pw') for n in range(3)]
+
+        results = self.redeem_in_threads(coupon.code, users, 30)
+
+        coupon.refresh_from_db()
+        counts = CouponUserCount.objects.filter(coupon=coupon).aggregate(total=Sum('times_used'), most=Max('times_used'))
+        self.assertEqual(results.count(True), 6)
+        self.assertEqual(counts['most'], 2)
+        # A refused per-user redemption also gives back the global use it took
+        self.assertEqual(coupon.times_used, counts['total'])
+
+
+class ValidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+
+    def test_used_up_coupon_is_refused_after_redemption(self):
+        make_coupon('ONCE', usage_limit=1)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            coupon, discount = redeem('once', self.user, CART)
+        self.assertEqual(discount, Decimal('10'))
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'pw')
+        with self.assertRaises(CouponError):
+            validate('ONCE', other, CART)
+
+    def test_unknown_code(self):
+        with self.assertRaises(CouponError):
+            validate('NOPE', self.user, CART)
+
+
+def line(product, qty=1):
+    return {'product': product, 'qty': qty, 'price': product.price, 'line_total': product.price * qty}
+
+
+class ScopedCouponTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        self.home = Category.objects.create(name='Home', slug='home')
+        kitchen = Category.objects.create(name='Kitchen', slug='kitchen', parent=self.home)
+        cups = Category.objects.create(name='Cups', slug='cups', parent=kitchen)
+        books = Category.objects.create(name='Books', slug='books')
+        self.mug = Product.objects.create(shop=shop, category=cups, name='Mug', slug='mug', price=10, stock=50)
+        self.pan = Product.objects.create(shop=shop, category=kitchen, name='Pan', slug='pan', price=30, stock=50)
+        self.book = Product.objects.create(shop=shop, category=books, name='Book', slug='book', price=100, stock=50)
+
+    def test_product_scope_discounts_only_its_products(self):
+        make_coupon('MUGS').products.add(self.mug)
+
+        coupon, discount = validate('MUGS', self.user, [line(self.mug, 2), line(self.pan), line(self.book)])
+        self.assertEqual(discount, Decimal('2'))
+        with self.assertRaisesMessage(CouponError, 'does not apply'):
+            validate('MUGS', self.user, [line(self.pan), line(self.book)])
+
+    def test_category_scope_reaches_descendant_categories(self):
+        make_coupon('HOME').categories.add(self.home)
+
+        # The mug is two levels below Home, the pan one; the book is elsewhere
+        coupon, discount = validate('HOME', self.user, [line(self.mug), line(self.pan), line(self.book)])
+        self.assertEqual(discount, Decimal('4'))
+
+    def test_minimum_purchase_counts_only_eligible_lines(self):
+        make_coupon('MUGS50', min_purchase_amount=50).products.add(self.mug)
+
+        with self.assertRaisesMessage(CouponError, 'Minimum purchase'):
+            validate('MUGS50', self.user, [line(self.mug, 2), line(self.book)])
+        coupon, discount = validate('MUGS50', self.user, [line(self.mug, 5), line(self.book)])
+        self.assertEqual(discount, Decimal('5'))
+
+    def test_rank_query_count_does_not_depend_on_cart_size(self):
+        make_coupon('ALL')
+        make_coupon('MUGS').products.add(self.mug)
+        make_coupon('HOME').categories.add(self.home)
+        codes = ['ALL', 'MUGS', 'HOME']
+        small = [line(self.mug)]
+        large = [line(product, qty) for qty in range(1, 11) for product in (self.mug, self.pan, self.book)]
+        # Load the coupon definitions and the category tree first
+        rank(codes, self.user, small)
+
+        with CaptureQueriesContext(connection) as queries:
+            rank(codes, self.user, small)
+        with self.assertNumQueries(len(queries)):
+            ranked = rank(codes, self.user, large)
+        self.assertEqual([evaluation.coupon.code for evaluation in ranked], ['ALL', 'HOME', 'MUGS'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are read from SQLite EXPLAIN QUERY PLAN')
+class PromotionQueryPlanTests(TestCase):
+    def test_coupon_queries_use_the_validity_index(self):
+        now = timezone.now()
+        # The coupons page
+        page = Coupon.objects.filter(is_active=True, valid_from__lte=now, valid_until__gte=now).explain()
+        self.assertIn('USING INDEX coupon_active_valid_idx (valid_until>?)', page)
+        # available_codes()
+        codes = Coupon.objects.filter(is_active=True, valid_until__gte=now).values_list('code', flat=True).explain()
+        self.assertIn('USING INDEX coupon_active_valid_idx (valid_until>?)', codes)
+
+    def test_live_events_use_the_status_index(self):
+        plan = Event.objects.filter(is_active=True, status='live').explain()
+        self.assertIn('USING INDEX event_status_start_idx (status=?)', plan)
+
@@ -3,27 +3,23 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
-from .models import Event, Coupon, CouponUsage
-from store.models import Product
-from decimal import Decimal
+from .coupons import CouponError, normalize, validate
+from .models import Event, Coupon
+from .pricing import event_products
+from .scheduler import event_snapshot
+from josmee_shop.cache import cache_anonymous_page
+from store.cart import get_cart
 
 
+@cache_anonymous_page('event')
 def event_list(request):
     """List all active events"""
-    now = timezone.now()
-    ongoing_events = Event.objects.filter(
-        is_active=True,
-        start_date__lte=now,
-        end_date__gte=now
-    )
-    upcoming_events = Event.objects.filter(
-        is_active=True,
-        start_date__gt=now
-    )
+    # Precomputed by promotions.scheduler; no date-range queries per hit
+    snapshot = event_snapshot()
     
     context = {
-        'ongoing_events': ongoing_events,
-        'upcoming_events': upcoming_events,
+        'ongoing_events': snapshot['live'],
+        'upcoming_events': snapshot['upcoming'],
     }
     return render(request, 'promotions/event_list.html', context)
 
@@ -32,21 +28,13 @@ def event_detail(request, slug):
     """Event detail page with discounted products"""
     event = get_object_or_404(Event, slug=slug, is_active=True)
     
-    # Get products in this event
-    products = event.products.filter(is_active=True)
-    
-    # Also get products from categories in this event
-    category_products = Product.objects.filter(
-        category__in=event.categories.all(),
-        is_active=True
-    ).exclude(id__in=products.values_list('id', flat=True))
-    
-    all_products = list(products) + list(category_products)
+    # Products in this event, directly or through its categories and their subcategories
+    all_products = list(event_products(event).select_related('effective_price'))
     
-    # Calculate discounted prices
+    # Prices come from the precomputed effective price (the best ongoing discount)
     for product in all_products:
         product.original_price = product.price
-        product.discounted_price = event.get_discounted_price(product.price)
+        product.discounted_price = product.current_price
         product.savings = product.original_price - product.discounted_price
     
     context = {
@@ -60,33 +48,19 @@ def event_detail(request, slug):
 def apply_coupon(request):
     """Apply coupon code to cart"""
     if request.method == 'POST':
-        coupon_code = request.POST.get('coupon_code', '').strip().upper()
+        coupon_code = normalize(request.POST.get('coupon_code', ''))
         
         if not coupon_code:
             return JsonResponse({'success': False, 'message': 'Please enter a coupon code'})
         
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-        except Coupon.DoesNotExist:
-            return JsonResponse({'success': False, 'message': 'Invalid coupon code'})
-        
-        # Calculate cart total
-        cart = request.session.get('cart', {})
-        cart_total = Decimal('0')
-        
-        for product_id, item_data in cart.items():
-            price = Decimal(str(item_data.get('price', '0')))
-            qty = int(item_data.get('qty', 1))
-            cart_total += price * qty
+        # Cart lines at current product prices, not prices kept in the session
+        cart = get_cart(request)
+        cart_total = cart.subtotal
         
-        # Check if coupon can be used
-        can_use, message = coupon.can_use(request.user, cart_total)
-        
-        if not can_use:
-            return JsonResponse({'success': False, 'message': message})
-        
-        # Calculate discount
-        discount = coupon.calculate_discount(cart_total)
+        try:
+            coupon, discount = validate(coupon_code, request.user, cart.items)
+        except CouponError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
         
         # Store coupon in session
         request.session['applied_coupon'] = {
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from jobs.queue import enqueue
 from .models import RefundRequest, Refund, StoreCredit, StoreCreditTransaction
 
 
@@ -31,9 +32,15 @@ class RefundRequestAdmin(admin.ModelAdmin):
     actions = ['approve_requests', 'reject_requests']
     
     def approve_requests(self, request, queryset):
-        for refund_request in queryset.filter(status='pending'):
-            refund_request.approve(request.user, 'Approved by admin')
-        self.message_user(request, f'{queryset.count()} refund requests approved.')
+        queued = 0
+        for refund_request_id in queryset.filter(status='pending').values_list('id', flat=True):
+            enqueue(
+                'refunds.approve_refund_request',
+                {'refund_request_id': refund_request_id, 'admin_user_id': request.user.id, 'notes': 'Approved by admin'},
+                idempotency_key=f'refund-approve:{refund_request_id}',
+            )
+            queued += 1
+        self.message_user(request, f'{queued} refund requests queued for approval.')
     approve_requests.short_description = 'Approve selected refund requests'
     
     def reject_requests(self, request, queryset):
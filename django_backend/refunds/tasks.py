@@ -0,0 +1,14 @@
+from django.contrib.auth import get_user_model
+
+from jobs.queue import task
+from .models import RefundRequest
+
+
+@task(max_attempts=5)
+def approve_refund_request(refund_request_id, admin_user_id, notes=''):
+    """Approve a refund request and open its refund, unless it was already handled"""
+    refund_request = RefundRequest.objects.select_for_update().filter(pk=refund_request_id).first()
+    if refund_request is None or refund_request.status != 'pending':
+        return
+    admin_user = get_user_model().objects.get(pk=admin_user_id)
+    refund_request.approve(admin_user, notes)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from sellers.models import SalesRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily/weekly/monthly sales rollups from order items and earnings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shops', help='Only rebuild this shop id (repeatable)')
+
+    def handle(self, *args, **options):
+        written = SalesRollup.rebuild(options['shops'])
+        self.stdout.write(self.style.SUCCESS(f'{written} sales rollup row(s) written.'))
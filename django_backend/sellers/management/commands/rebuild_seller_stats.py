@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from sellers.models import SellerStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute every SellerStats row from products, order items and earnings (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shops', help='Only rebuild this shop id (repeatable)')
+
+    def handle(self, *args, **options):
+        written = SellerStats.rebuild(options['shops'])
+        self.stdout.write(self.style.SUCCESS(f'{written} seller stats row(s) rebuilt.'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0001_seller_stats'),
+        ('shops', '0001_initial'),
+        ('store', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('seller_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='store.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='shops.shop')),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('product__isnull', True)), fields=('shop', 'period', 'period_start'), name='salesrollup_shop_bucket_uniq'), models.UniqueConstraint(condition=models.Q(('product__isnull', False)), fields=('shop', 'product', 'period', 'period_start'), name='salesrollup_product_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,418 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest, Trunc
+from django.utils import timezone
+from shops.models import Shop
+
+
+def current_month():
+    """First day of the current month in the site time zone"""
+    return timezone.localdate().replace(day=1)
+
+
+def month_of(moment):
+    return timezone.localdate(moment).replace(day=1)
+
+
+def month_start_datetime(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def bucket_start(period, day):
+    """First day of the ``period`` bucket containing ``day`` (weeks start on Monday)"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+class SellerStats(models.Model):
+    """
+    Per-shop dashboard counters, maintained incrementally by sellers.signals.
+
+    ``month_earnings`` only covers ``month_start``; once the calendar month
+    rolls over it reads as zero until the next earning (or the nightly
+    ``rebuild_seller_stats``) starts the new month.
+    """
+    shop = models.OneToOneField(Shop, on_delete=models.CASCADE, related_name='stats')
+
+    total_products = models.PositiveIntegerField(default=0)
+    active_products = models.PositiveIntegerField(default=0)
+    out_of_stock = models.PositiveIntegerField(default=0)
+
+    total_orders = models.PositiveIntegerField(default=0)
+
+    total_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    month_start = models.DateField(null=True, blank=True)
+    month_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Seller stats'
+
+    def __str__(self):
+        return f"Stats for {self.shop_id}"
+
+    @property
+    def current_month_earnings(self):
+        return self.month_earnings if self.month_start == current_month() else Decimal('0')
+
+    @classmethod
+    def for_shop(cls, shop):
+        """The stats row for ``shop``, built from source data the first time"""
+        stats = cls.objects.filter(shop=shop).first()
+        if stats is None:
+            cls.rebuild([shop.pk])
+            stats = cls.objects.get(shop=shop)
+        return stats
+
+    @classmethod
+    def rebuild(cls, shop_ids=None):
+        """Recompute every counter from Product, OrderItem and Earning; returns rows written"""
+        from store.models import Product
+        from orders.models import OrderItem
+        from payments.models import Earning
+
+        shops = Shop.objects.all()
+        products = Product.objects.all()
+        items = OrderItem.objects.filter(shop__isnull=False)
+        earnings = Earning.objects.filter(seller__shop__isnull=False)
+        if shop_ids is not None:
+            shops = shops.filter(pk__in=shop_ids)
+            products = products.filter(shop_id__in=shop_ids)
+            items = items.filter(shop_id__in=shop_ids)
+            earnings = earnings.filter(seller__shop__in=shop_ids)
+
+        month = current_month()
+        product_counts = {row['shop_id']: row for row in products.values('shop_id').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            out=Count('id', filter=Q(stock=0)),
+        )}
+        order_counts = dict(items.values('shop_id').annotate(
+            orders=Count('order_id', distinct=True)
+        ).values_list('shop_id', 'orders'))
+        earning_sums = {row['seller__shop']: row for row in earnings.values('seller__shop').annotate(
+            total=Sum('amount'),
+            month=Sum('amount', filter=Q(created_at__gte=month_start_datetime(month))),
+        )}
+
+        rows = []
+        for shop_id in shops.values_list('id', flat=True):
+            counts = product_counts.get(shop_id, {})
+            sums = earning_sums.get(shop_id, {})
+            rows.append(cls(
+                shop_id=shop_id,
+                total_products=counts.get('total', 0),
+                active_products=counts.get('active', 0),
+                out_of_stock=counts.get('out', 0),
+                total_orders=order_counts.get(shop_id, 0),
+                total_earnings=sums.get('total') or 0,
+                month_start=month,
+                month_earnings=sums.get('month') or 0,
+            ))
+        cls.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['shop'],
+            update_fields=[
+                'total_products', 'active_products', 'out_of_stock', 'total_orders',
+                'total_earnings', 'month_start', 'month_earnings', 'updated_at',
+            ],
+        )
+        return len(rows)
+
+    @staticmethod
+    def product_counts(is_active, stock):
+        """What one product adds to ``(total_products, active_products, out_of_stock)``"""
+        return (1, int(bool(is_active)), int(stock == 0))
+
+    @classmethod
+    def record_products(cls, deltas):
+        """
+        Move product counters by ``{shop_id: (total, active, out)}``.
+
+        Every shop is updated by one ``UPDATE`` with a ``Case`` per counter,
+        however many shops the change touches.
+        """
+        deltas = {shop_id: changes for shop_id, changes in deltas.items() if shop_id and any(changes)}
+        if not deltas:
+            return
+        updates = {}
+        for index, field in enumerate(('total_products', 'active_products', 'out_of_stock')):
+            whens = [
+                When(shop_id=shop_id, then=Greatest(F(field) + changes[index], Value(0)))
+                for shop_id, changes in deltas.items() if changes[index]
+            ]
+            if whens:
+                updates[field] = Case(*whens, default=F(field), output_field=cls._meta.get_field(field))
+        if cls.objects.filter(shop_id__in=deltas).update(**updates) != len(deltas):
+            # No row yet: build it from source, which already includes the change
+            existing = set(cls.objects.filter(shop_id__in=deltas).values_list('shop_id', flat=True))
+            cls.rebuild(set(deltas) - existing)
+
+    @classmethod
+    def refresh_products(cls, *shop_ids):
+        """Recount the product counters of the given shops (one grouped query); for repairs"""
+        from store.models import Product
+
+        shop_ids = {shop_id for shop_id in shop_ids if shop_id}
+        if not shop_ids:
+            return
+        counts = {row['shop_id']: row for row in Product.objects.filter(shop_id__in=shop_ids).values('shop_id').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            out=Count('id', filter=Q(stock=0)),
+        )}
+        missing = set(shop_ids)
+        for shop_id in shop_ids:
+            row = counts.get(shop_id, {})
+            if cls.objects.filter(shop_id=shop_id).update(
+                total_products=row.get('total', 0),
+                active_products=row.get('active', 0),
+                out_of_stock=row.get('out', 0),
+            ):
+                missing.discard(shop_id)
+        if missing:
+            cls.rebuild(missing)
+
+    @classmethod
+    def refresh_orders(cls, *shop_ids):
+        """Recount distinct orders for the given shops, e.g. after order items were deleted"""
+        from orders.models import OrderItem
+
+        for shop_id in {shop_id for shop_id in shop_ids if shop_id}:
+            total = OrderItem.objects.filter(shop_id=shop_id).aggregate(
+                total=Count('order_id', distinct=True)
+            )['total']
+            cls.objects.filter(shop_id=shop_id).update(total_orders=total)
+
+    @classmethod
+    def record_order(cls, shop_ids):
+        """Count one new order for every shop that has items in it"""
+        shop_ids = {shop_id for shop_id in shop_ids if shop_id}
+        if not shop_ids:
+            return
+        existing = set(cls.objects.filter(shop_id__in=shop_ids).values_list('shop_id', flat=True))
+        if existing:
+            cls.objects.filter(shop_id__in=existing).update(total_orders=F('total_orders') + 1)
+        if shop_ids - existing:
+            # First order for these shops: build their rows from source, which already includes it
+            cls.rebuild(shop_ids - existing)
+
+    @classmethod
+    def record_earning(cls, seller_id, amount, created_at, reverse=False):
+        """Add (or with ``reverse`` remove) one earning to its seller's shop totals"""
+        amount = -amount if reverse else amount
+        updates = {'total_earnings': F('total_earnings') + amount}
+        month = current_month()
+        if month_of(created_at) == month:
+            # Roll the monthly total over when this is the first earning of a new month
+            updates['month_earnings'] = Case(
+                When(month_start=month, then=F('month_earnings') + amount),
+                default=Value(max(amount, Decimal('0'))),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            )
+            updates['month_start'] = Value(month)
+        if not cls.objects.filter(shop__owner_id=seller_id).update(**updates):
+            shop_ids = list(Shop.objects.filter(owner_id=seller_id).values_list('id', flat=True))
+            if shop_ids:
+                cls.rebuild(shop_ids)
+
+
+class SalesRollup(models.Model):
+    """
+    Sales and earnings per shop (``product`` empty) or per product, bucketed
+    by day, week and month.
+
+    Rows are bumped with ``F()`` as order items and earnings are written (see
+    sellers.signals and orders.services.place_order), a whole batch at a time,
+    so reporting reads a few rows per bucket and never scans OrderItem. ``backfill_sales_rollups``
+    rebuilds them from source data.
+    """
+    PERIOD_CHOICES = (
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    )
+    PERIODS = ('day', 'week', 'month')
+
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='sales_rollups')
+    product = models.ForeignKey('store.Product', on_delete=models.CASCADE, null=True, blank=True, related_name='sales_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+
+    # Order counts are only tracked on shop-wide rows
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    seller_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Credited Earning rows; shop-wide only, as earnings are not tied to products
+    earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['period_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['shop', 'period', 'period_start'],
+                condition=Q(product__isnull=True),
+                name='salesrollup_shop_bucket_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['shop', 'product', 'period', 'period_start'],
+                condition=Q(product__isnull=False),
+                name='salesrollup_product_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        scope = f"product {self.product_id}" if self.product_id else "all products"
+        return f"{self.shop_id} {scope} {self.period} {self.period_start}"
+
+    @classmethod
+    def _apply(cls, deltas):
+        """
+        Add ``{(shop_id, product_id, period, start): {field: delta}}`` to the matching rows.
+
+        However many buckets are touched, this is one query to find the
+        existing rows, one ``bulk_update`` adding the deltas with ``F()`` and
+        one ``bulk_create`` for the new buckets.
+        """
+        deltas = {
+            key: {field: delta for field, delta in values.items() if delta}
+            for key, values in deltas.items()
+        }
+        deltas = {key: values for key, values in deltas.items() if values}
+        if not deltas:
+            return
+        try:
+            with transaction.atomic():
+                cls._write(deltas)
+        except IntegrityError:
+            # Another writer created one of the new buckets first; they all exist now
+            with transaction.atomic():
+                cls._write(deltas)
+
+    @classmethod
+    def _write(cls, deltas):
+        shop_ids, product_ids, starts = set(), set(), set()
+        for shop_id, product_id, period, start in deltas:
+            shop_ids.add(shop_id)
+            product_ids.add(product_id)
+            starts.add(start)
+        rows = cls.objects.filter(shop_id__in=shop_ids, period_start__in=starts)
+        products = {product_id for product_id in product_ids if product_id is not None}
+        rows = rows.filter(Q(product__isnull=True) | Q(product_id__in=products))
+        existing = {
+            (shop_id, product_id, period, start): pk
+            for pk, shop_id, product_id, period, start in rows.values_list(
+                'pk', 'shop_id', 'product_id', 'period', 'period_start'
+            )
+        }
+
+        updated, created = [], []
+        for key, values in deltas.items():
+            shop_id, product_id, period, start = key
+            if key in existing:
+                updated.append((cls(pk=existing[key]), values))
+            else:
+                created.append(cls(shop_id=shop_id, product_id=product_id, period=period, period_start=start, **values))
+        if updated:
+            fields = sorted({field for _, values in updated for field in values})
+            for row, values in updated:
+                # bulk_update writes every field on every row; those without a delta keep their value
+                for field in fields:
+                    setattr(row, field, F(field) + values[field] if field in values else F(field))
+            cls.objects.bulk_update([row for row, _ in updated], fields)
+        if created:
+            cls.objects.bulk_create(created)
+
+    @classmethod
+    def record_items(cls, order_items, count_orders=True, reverse=False):
+        """Add saved OrderItems to their buckets; ``count_orders`` counts each (order, shop) once"""
+        sign = -1 if reverse else 1
+        deltas = defaultdict(lambda: defaultdict(int))
+        orders = set()
+        for item in order_items:
+            if not item.shop_id:
+                continue
+            day = timezone.localdate(item.created_at)
+            for period in cls.PERIODS:
+                start = bucket_start(period, day)
+                for product_id in {None, item.product_id}:
+                    bucket = deltas[(item.shop_id, product_id, period, start)]
+                    bucket['units'] += sign * item.quantity
+                    bucket['revenue'] += sign * item.subtotal
+                    bucket['seller_amount'] += sign * item.seller_amount
+                if count_orders and (item.shop_id, item.order_id, period) not in orders:
+                    orders.add((item.shop_id, item.order_id, period))
+                    deltas[(item.shop_id, None, period, start)]['orders'] += sign
+        cls._apply(deltas)
+
+    @classmethod
+    def record_earnings(cls, earnings, reverse=False):
+        """Add Earning rows to their sellers' shop-wide buckets"""
+        sign = -1 if reverse else 1
+        shops = dict(Shop.objects.filter(
+            owner_id__in={earning.seller_id for earning in earnings}
+        ).values_list('owner_id', 'id'))
+        deltas = defaultdict(lambda: defaultdict(int))
+        for earning in earnings:
+            shop_id = shops.get(earning.seller_id)
+            if shop_id is None:
+                continue
+            day = timezone.localdate(earning.created_at)
+            for period in cls.PERIODS:
+                deltas[(shop_id, None, period, bucket_start(period, day))]['earnings'] += sign * earning.amount
+        cls._apply(deltas)
+
+    @classmethod
+    def rebuild(cls, shop_ids=None):
+        """Recompute every bucket from OrderItem and Earning; returns rows written"""
+        from orders.models import OrderItem
+        from payments.models import Earning
+
+        items = OrderItem.objects.filter(shop__isnull=False)
+        earnings = Earning.objects.filter(seller__shop__isnull=False)
+        existing = cls.objects.all()
+        if shop_ids is not None:
+            items = items.filter(shop_id__in=shop_ids)
+            earnings = earnings.filter(seller__shop__in=shop_ids)
+            existing = existing.filter(shop_id__in=shop_ids)
+
+        rows = {}
+
+        def row(shop_id, product_id, period, start):
+            key = (shop_id, product_id, period, start)
+            if key not in rows:
+                rows[key] = cls(shop_id=shop_id, product_id=product_id, period=period, period_start=start)
+            return rows[key]
+
+        for period in cls.PERIODS:
+            bucket = Trunc('created_at', period, output_field=models.DateField())
+            totals = dict(units=Sum('quantity'), revenue=Sum('subtotal'), seller_amount=Sum('seller_amount'))
+            for values in items.annotate(bucket=bucket).values('shop_id', 'bucket').annotate(
+                orders=Count('order_id', distinct=True), **totals
+            ):
+                target = row(values['shop_id'], None, period, values['bucket'])
+                for field in ('orders', 'units', 'revenue', 'seller_amount'):
+                    setattr(target, field, values[field] or 0)
+            for values in items.filter(product__isnull=False).annotate(bucket=bucket).values(
+                'shop_id', 'product_id', 'bucket'
+            ).annotate(**totals):
+                target = row(values['shop_id'], values['product_id'], period, values['bucket'])
+                for field in ('units', 'revenue', 'seller_amount'):
+                    setattr(target, field, values[field] or 0)
+            for values in earnings.annotate(bucket=bucket).values('seller__shop', 'bucket').annotate(total=Sum('amount')):
+                row(values['seller__shop'], None, period, values['bucket']).earnings = values['total'] or 0
+
+        with transaction.atomic():
+            existing.delete()
+            cls.objects.bulk_create(rows.values(), batch_size=500)
+        return len(rows)
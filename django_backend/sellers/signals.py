@@ -0,0 +1,96 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from orders.models import OrderItem
+from payments.models import Earning
+from shops.models import Shop
+from store.models import Product
+from .models import SalesRollup, SellerStats
+
+
+@receiver(post_save, sender=Shop)
+def create_seller_stats(sender, instance, created, **kwargs):
+    if created:
+        SellerStats.objects.get_or_create(shop=instance)
+
+
+PRODUCT_STATE_FIELDS = ('shop_id', 'is_active', 'stock')
+
+
+def _product_state(instance):
+    """``(shop_id, is_active, stock)`` as loaded, or ``None`` if any of them was deferred"""
+    if any(field not in instance.__dict__ for field in PRODUCT_STATE_FIELDS):
+        return None
+    return tuple(instance.__dict__[field] for field in PRODUCT_STATE_FIELDS)
+
+
+def _product_deltas(old, new):
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        shop_id, is_active, stock = state
+        for i, count in enumerate(SellerStats.product_counts(is_active, stock)):
+            deltas[shop_id][i] += sign * count
+    return deltas
+
+
+@receiver(post_init, sender=Product)
+def remember_product_state(sender, instance, **kwargs):
+    instance._stats_state = _product_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Product)
+def count_product(sender, instance, created, update_fields=None, **kwargs):
+    """Move the shop's product counters by what this save changed"""
+    if update_fields is not None and not {'shop', 'is_active', 'stock'} & set(update_fields):
+        return
+    old = None if created else instance._stats_state
+    new = instance._stats_state = _product_state(instance)
+    if new is None or (old is None and not created):
+        # The state before the save is unknown (deferred fields): recount
+        SellerStats.refresh_products(instance.shop_id)
+        return
+    SellerStats.record_products(_product_deltas(old, new))
+
+
+@receiver(post_delete, sender=Product)
+def uncount_product(sender, instance, **kwargs):
+    state = _product_state(instance)
+    if state is None:
+        SellerStats.refresh_products(instance.shop_id)
+        return
+    SellerStats.record_products(_product_deltas(state, None))
+
+
+@receiver(post_save, sender=OrderItem)
+def count_order_item(sender, instance, created, **kwargs):
+    """Count the order once per shop, on its first item for that shop"""
+    if not created or not instance.shop_id or getattr(instance, '_stats_recorded', False):
+        return
+    siblings = OrderItem.objects.filter(order_id=instance.order_id, shop_id=instance.shop_id).exclude(pk=instance.pk)
+    first_for_shop = not siblings.exists()
+    if first_for_shop:
+        SellerStats.record_order([instance.shop_id])
+    transaction.on_commit(lambda: SalesRollup.record_items([instance], count_orders=first_for_shop))
+
+
+@receiver(post_delete, sender=OrderItem)
+def uncount_order_item(sender, instance, **kwargs):
+    SellerStats.refresh_orders(instance.shop_id)
+    # Bucket order counts are left to backfill_sales_rollups
+    transaction.on_commit(lambda: SalesRollup.record_items([instance], count_orders=False, reverse=True))
+
+
+@receiver(post_save, sender=Earning)
+def add_earning(sender, instance, created, **kwargs):
+    if created:
+        SellerStats.record_earning(instance.seller_id, instance.amount, instance.created_at)
+        transaction.on_commit(lambda: SalesRollup.record_earnings([instance]))
+
+
+@receiver(post_delete, sender=Earning)
+def remove_earning(sender, instance, **kwargs):
+    SellerStats.record_earning(instance.seller_id, instance.amount, instance.created_at, reverse=True)
+    transaction.on_commit(lambda: SalesRollup.record_earnings([instance], reverse=True))
@@ -0,0 +1,73 @@
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import CustomUser
+from shops.models import Shop
+from store.inventory import release_stock, reserve_stock
+from store.models import Product
+from .models import SellerStats
+
+
+class ProductCounterTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        self.shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        other_owner = CustomUser.objects.create_user('other', 'other@example.com', 'pw', role='seller')
+        self.other_shop = Shop.objects.create(owner=other_owner, name='Other', slug='other', email='o@example.com', phone='1', address='x')
+
+    def counters(self, shop):
+        stats = SellerStats.objects.get(shop=shop)
+        return stats.total_products, stats.active_products, stats.out_of_stock
+
+    def assertCounters(self, shop, expected):
+        self.assertEqual(self.counters(shop), expected)
+        # The deltas agree with a full recount
+        SellerStats.refresh_products(shop.pk)
+        self.assertEqual(self.counters(shop), expected)
+
+    def test_saves_and_deletes_move_counters(self):
+        mug = Product.objects.create(shop=self.shop, name='Mug', price=5, stock=3)
+        Product.objects.create(shop=self.shop, name='Lamp', price=5, stock=0, is_active=False)
+        self.assertCounters(self.shop, (2, 1, 1))
+
+        mug.stock = 0
+        mug.save()
+        self.assertCounters(self.shop, (2, 1, 2))
+
+        mug.is_active = False
+        mug.save()
+        self.assertCounters(self.shop, (2, 0, 2))
+
+        mug.shop = self.other_shop
+        mug.save()
+        self.assertCounters(self.shop, (1, 0, 1))
+        self.assertCounters(self.other_shop, (1, 0, 1))
+
+        mug.delete()
+        self.assertCounters(self.other_shop, (0, 0, 0))
+
+    def test_saves_that_do_not_change_counted_fields_skip_the_counters(self):
+        mug = Product.objects.create(shop=self.shop, name='Mug', price=5, stock=3)
+        with CaptureQueriesContext(connection) as queries:
+            mug.price = 6
+            mug.save(update_fields=['price'])
+            mug = Product.objects.get(pk=mug.pk)
+            mug.name = 'Big mug'
+            mug.save()
+        self.assertFalse([query for query in queries.captured_queries if 'sellers_sellerstats' in query['sql']])
+
+    def test_deferred_fields_fall_back_to_recount(self):
+        Product.objects.create(shop=self.shop, name='Mug', price=5, stock=3)
+        mug = Product.objects.only('id', 'name').get()
+        mug.stock = 0
+        mug.save()
+        self.assertCounters(self.shop, (1, 1, 1))
+
+    def test_selling_out_and_restocking(self):
+        mug = Product.objects.create(shop=self.shop, name='Mug', price=5, stock=2)
+        with transaction.atomic():
+            reserve_stock({mug.pk: 2})
+        self.assertCounters(self.shop, (1, 1, 1))
+        release_stock({mug.pk: 1})
+        self.assertCounters(self.shop, (1, 1, 0))
@@ -21,4 +21,5 @@ urlpatterns = [
     
     # Earnings
     path('earnings/', views.earnings, name='earnings'),
+    path('api/sales/', views.sales_api, name='sales_api'),
 ]
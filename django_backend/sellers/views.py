@@ -1,14 +1,18 @@
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
+from decimal import Decimal
 from accounts.decorators import seller_required
 from store.models import Product, ProductImage, Category
 from orders.models import Order, OrderItem
 from payments.models import SellerWallet, Earning
 from .forms import ProductForm, ProductImageForm
+from .models import SalesRollup, SellerStats, bucket_start
 
 
 @login_required
@@ -24,35 +28,22 @@ def seller_dashboard(request):
     # Get wallet
     wallet, _ = SellerWallet.objects.get_or_create(seller=request.user)
     
-    # Get products
-    products = Product.objects.filter(shop=shop)
-    total_products = products.count()
-    active_products = products.filter(is_active=True).count()
-    out_of_stock = products.filter(stock=0).count()
-    
-    # Get orders
-    order_items = OrderItem.objects.filter(shop=shop)
-    total_orders = order_items.values('order').distinct().count()
+    # Counters come from the materialized SellerStats row
+    stats = SellerStats.for_shop(shop)
     
     # Recent orders
-    recent_orders = order_items.select_related('order', 'product').order_by('-created_at')[:10]
-    
-    # Earnings this month
-    month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    month_earnings = Earning.objects.filter(
-        seller=request.user,
-        created_at__gte=month_start
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    recent_orders = OrderItem.objects.filter(shop=shop).select_related('order', 'product').order_by('-created_at')[:10]
     
     context = {
         'shop': shop,
         'wallet': wallet,
-        'total_products': total_products,
-        'active_products': active_products,
-        'out_of_stock': out_of_stock,
-        'total_orders': total_orders,
+        'stats': stats,
+        'total_products': stats.total_products,
+        'active_products': stats.active_products,
+        'out_of_stock': stats.out_of_stock,
+        'total_orders': stats.total_orders,
         'recent_orders': recent_orders,
-        'month_earnings': month_earnings,
+        'month_earnings': stats.current_month_earnings,
     }
     return render(request, 'sellers/dashboard.html', context)
 
@@ -287,3 +278,73 @@ def earnings(request):
         'month_earnings': month_earnings,
     }
     return render(request, 'sellers/earnings.html', context)
+
+
+# Default reporting window per bucket size
+SALES_API_DEFAULT_SPAN = {
+    'day': timedelta(days=30),
+    'week': timedelta(weeks=12),
+    'month': timedelta(days=365),
+}
+
+
+@login_required
+@seller_required
+def sales_api(request):
+    """
+    Sales and earnings per day, week or month from the pre-aggregated rollups.
+
+    Query parameters: ``period`` (day/week/month), ``start`` and ``end``
+    (YYYY-MM-DD, inclusive) and optionally ``product`` (id). Buckets with no
+    sales are omitted.
+    """
+    if not hasattr(request.user, 'shop'):
+        return JsonResponse({'error': 'Create your shop first'}, status=400)
+    
+    period = request.GET.get('period', 'day')
+    if period not in SalesRollup.PERIODS:
+        return JsonResponse({'error': 'period must be day, week or month'}, status=400)
+    
+    try:
+        end = parse_date(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start = parse_date(request.GET['start']) if request.GET.get('start') else end - SALES_API_DEFAULT_SPAN[period]
+        product_id = int(request.GET['product']) if request.GET.get('product') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, end or product'}, status=400)
+    if start is None or end is None or start > end:
+        return JsonResponse({'error': 'Invalid date range'}, status=400)
+    
+    rollups = SalesRollup.objects.filter(
+        shop=request.user.shop,
+        product_id=product_id,
+        period=period,
+        period_start__gte=bucket_start(period, start),
+        period_start__lte=end,
+    ).order_by('period_start')
+    
+    buckets = []
+    totals = {'orders': 0, 'units': 0, 'revenue': Decimal('0'), 'seller_amount': Decimal('0'), 'earnings': Decimal('0')}
+    for rollup in rollups:
+        bucket = {
+            'start': rollup.period_start.isoformat(),
+            'orders': rollup.orders,
+            'units': rollup.units,
+            'revenue': str(rollup.revenue),
+            'seller_amount': str(rollup.seller_amount),
+            'earnings': str(rollup.earnings),
+        }
+        buckets.append(bucket)
+        for field in totals:
+            totals[field] += getattr(rollup, field)
+    
+    return JsonResponse({
+        'period': period,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'product': product_id,
+        'buckets': buckets,
+        'totals': {
+            field: str(value) if isinstance(value, Decimal) else value
+            for field, value in totals.items()
+        },
+    })
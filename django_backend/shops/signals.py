@@ -0,0 +1,7 @@
+from django.db.models.signals import post_save, post_delete
+from josmee_shop.cache import invalidate_instance
+from .models import Shop
+
+# Cached pages that show shop data are tagged "shop"; drop them on any change
+post_save.connect(invalidate_instance, sender=Shop, dispatch_uid='cache-save-shops.Shop')
+post_delete.connect(invalidate_instance, sender=Shop, dispatch_uid='cache-delete-shops.Shop')
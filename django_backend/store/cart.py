@@ -0,0 +1,279 @@
+"""
+Shopping cart.
+
+A cart is ``{product_id: quantity}`` wherever it lives:
+
+* signed-in customers keep it in ``CartLine`` rows, one per product, and
+  each change is a single-row upsert or delete;
+* anonymous visitors keep it in a signed cookie (``CART_COOKIE_NAME``), so
+  their cart costs no database write at all.
+
+Neither touches the session, so browsing with a full cart never rewrites the
+session row. ``store.middleware.CartMiddleware`` writes the cookie when the
+cart changed and, once the visitor is signed in (including on the login
+request itself), merges the cookie cart into their ``CartLine`` rows and
+drops the cookie.
+
+Use ``get_cart(request)``; it returns the same ``Cart`` for the whole request.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import CartLine, Product
+
+COOKIE_SALT = 'store.cart'
+# Carts kept in the session before carts had their own storage
+LEGACY_SESSION_KEY = 'cart'
+
+
+def cookie_name():
+    return getattr(settings, 'CART_COOKIE_NAME', 'cart')
+
+
+def cookie_age():
+    return getattr(settings, 'CART_COOKIE_AGE', 60 * 60 * 24 * 30)
+
+
+def encode(quantities):
+    """``{12: 2, 15: 1}`` -> ``'12:2|15:1'``"""
+    return '|'.join(f'{product_id}:{qty}' for product_id, qty in quantities.items())
+
+
+def decode(value):
+    quantities = {}
+    for part in (value or '').split('|'):
+        product_id, _, qty = part.partition(':')
+        try:
+            product_id, qty = int(product_id), int(qty)
+        except ValueError:
+            continue
+        if qty > 0:
+            quantities[product_id] = qty
+    return quantities
+
+
+class CookieStorage:
+    """Anonymous cart in a signed cookie; changes are written by ``CartMiddleware``"""
+
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+        self._quantities = None
+
+    def load(self):
+        if self._quantities is None:
+            value = self.request.get_signed_cookie(cookie_name(), default='', salt=COOKIE_SALT, max_age=cookie_age())
+            self._quantities = decode(value)
+        return dict(self._quantities)
+
+    def _save(self, quantities):
+        self._quantities = quantities
+        self.modified = True
+
+    def add(self, product_id, qty):
+        quantities = self.load()
+        quantities[product_id] = quantities.get(product_id, 0) + qty
+        self._save(quantities)
+
+    def set(self, product_id, qty):
+        quantities = self.load()
+        quantities[product_id] = qty
+        self._save(quantities)
+
+    def remove(self, product_id):
+        quantities = self.load()
+        if quantities.pop(product_id, None) is not None:
+            self._save(quantities)
+
+    def clear(self):
+        if self.load():
+            self._save({})
+
+    def write(self, response):
+        if not self._quantities:
+            response.delete_cookie(cookie_name())
+            return
+        response.set_signed_cookie(
+            cookie_name(), encode(self._quantities), salt=COOKIE_SALT, max_age=cookie_age(),
+            httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+class DatabaseStorage:
+    """A signed-in customer's cart as ``CartLine`` rows"""
+
+    def __init__(self, user):
+        self.user = user
+
+    def lines(self):
+        return CartLine.objects.filter(user=self.user)
+
+    def load(self):
+        return dict(self.lines().order_by('id').values_list('product_id', 'quantity'))
+
+    def add(self, product_id, qty):
+        lines = self.lines().filter(product_id=product_id)
+        if lines.update(quantity=F('quantity') + qty, updated_at=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                CartLine.objects.create(user=self.user, product_id=product_id, quantity=qty)
+        except IntegrityError:
+            # Another request created the line first
+            lines.update(quantity=F('quantity') + qty, updated_at=timezone.now())
+
+    def set(self, product_id, qty):
+        self.set_many({product_id: qty})
+
+    def set_many(self, quantities):
+        """Upsert several lines in one statement"""
+        CartLine.objects.bulk_create(
+            [CartLine(user=self.user, product_id=product_id, quantity=qty) for product_id, qty in quantities.items()],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'updated_at'],
+        )
+
+    def remove(self, product_id):
+        self.lines().filter(product_id=product_id).delete()
+
+    def clear(self):
+        self.lines().delete()
+
+    def merge(self, quantities):
+        """Add an anonymous cart's quantities to this one"""
+        if not quantities:
+            return
+        existing = dict(self.lines().filter(product_id__in=quantities).values_list('product_id', 'quantity'))
+        # Products that no longer exist would fail the foreign key
+        valid = set(Product.objects.filter(id__in=quantities).values_list('id', flat=True))
+        merged = {
+            product_id: existing.get(product_id, 0) + qty
+            for product_id, qty in quantities.items() if product_id in valid
+        }
+        if merged:
+            self.set_many(merged)
+
+
+class Cart:
+    """
+    The current visitor's cart, with every line resolved in a single query.
+
+    Prices always come from the product row (with its event price, if any),
+    never from what was stored with the line.
+    """
+
+    def __init__(self, request):
+        if request.user.is_authenticated:
+            self.storage = DatabaseStorage(request.user)
+        else:
+            self.storage = CookieStorage(request)
+        self._adopt_session_cart(request)
+
+    def _adopt_session_cart(self, request):
+        """Move a cart still kept in the session into the cart storage, once"""
+        legacy = request.session.pop(LEGACY_SESSION_KEY, None) if hasattr(request, 'session') else None
+        if not legacy:
+            return
+        # Both old formats: {id: qty} and {id: {"qty", "price", "name"}}
+        for product_id, item_data in legacy.items():
+            try:
+                qty = int(item_data.get('qty', 1)) if isinstance(item_data, dict) else int(item_data)
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                continue
+            if qty > 0:
+                self.storage.add(product_id, qty)
+
+    @cached_property
+    def quantities(self):
+        """``{product_id: qty}`` as stored, without touching products"""
+        return self.storage.load()
+
+    @cached_property
+    def items(self):
+        """Cart lines as dicts with product, qty, price and line_total"""
+        if not self.quantities:
+            return []
+
+        products = Product.objects.filter(
+            id__in=self.quantities.keys(), is_active=True
+        ).select_related('shop', 'category', 'effective_price').in_bulk()
+
+        items = []
+        for product_id, qty in self.quantities.items():
+            product = products.get(product_id)
+            if product is None or qty <= 0:
+                continue
+            price = product.current_price
+            items.append({
+                'product': product,
+                'qty': qty,
+                'price': price,
+                'line_total': price * qty,
+            })
+        return items
+
+    @cached_property
+    def subtotal(self):
+        return sum((item['line_total'] for item in self.items), Decimal('0'))
+
+    @property
+    def count(self):
+        return sum(item['qty'] for item in self.items)
+
+    @property
+    def total_quantity(self):
+        """Units in the cart as stored; cheaper than ``count`` as no product is loaded"""
+        return sum(self.quantities.values())
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        # Stored lines whose product is gone or inactive do not count
+        return bool(self.items)
+
+    def _changed(self):
+        for name in ('quantities', 'items', 'subtotal'):
+            self.__dict__.pop(name, None)
+
+    def add(self, product_id, qty=1):
+        if qty > 0:
+            self.storage.add(int(product_id), qty)
+            self._changed()
+
+    def set(self, product_id, qty):
+        """Change the quantity of a line already in the cart; zero or less removes it"""
+        if int(product_id) not in self.quantities:
+            return
+        if qty > 0:
+            self.storage.set(int(product_id), qty)
+        else:
+            self.storage.remove(int(product_id))
+        self._changed()
+
+    def remove(self, product_id):
+        self.storage.remove(int(product_id))
+        self._changed()
+
+    def clear(self):
+        self.storage.clear()
+        self._changed()
+
+
+def get_cart(request):
+    """The request's cart, created on first use"""
+    cart = getattr(request, '_cart', None)
+    if cart is None:
+        cart = request._cart = Cart(request)
+    return cart
+
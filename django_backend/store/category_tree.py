@@ -0,0 +1,102 @@
+"""
+In-process copy of the category tree.
+
+The whole tree is loaded with one query and kept in module memory, so
+breadcrumbs, subcategory menus and "this category and everything below it"
+lookups cost no queries. Each process checks the version of the ``category``
+cache tag (bumped by store.signals on every category change) and reloads the
+tree when it has moved, and in any case once it is ``CATEGORY_TREE_TTL``
+seconds old, in case the tag bump never reached this process's cache.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from josmee_shop.cache import tag_versions
+
+TAG = 'category'
+
+_lock = threading.Lock()
+_loaded = {'version': None, 'tree': None, 'loaded_at': 0.0}
+
+
+class CategoryNode:
+    __slots__ = ('id', 'name', 'slug', 'parent_id', 'path', 'depth', 'is_active', 'children')
+
+    def __init__(self, id, name, slug, parent_id, path, depth, is_active):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.parent_id = parent_id
+        self.path = path
+        self.depth = depth
+        self.is_active = is_active
+        self.children = []
+
+    def __repr__(self):
+        return f'<CategoryNode {self.id} {self.slug}>'
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        self.nodes = {row[0]: CategoryNode(*row) for row in rows}
+        self.by_slug = {node.slug: node for node in self.nodes.values()}
+        self.roots = []
+        for node in sorted(self.nodes.values(), key=lambda node: node.name):
+            parent = self.nodes.get(node.parent_id)
+            (parent.children if parent else self.roots).append(node)
+
+    @classmethod
+    def load(cls):
+        from .models import Category
+        return cls(Category.objects.values_list('id', 'name', 'slug', 'parent_id', 'path', 'depth', 'is_active'))
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def ancestors(self, category_id):
+        """Nodes from the root down to the parent of ``category_id``, for breadcrumbs"""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        ids = [int(part) for part in node.path.split('/')[:-2]]
+        return [self.nodes[ancestor_id] for ancestor_id in ids if ancestor_id in self.nodes]
+
+    def children(self, category_id, active_only=True):
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        return [child for child in node.children if child.is_active or not active_only]
+
+    def descendant_ids(self, category_id, include_self=True, active_only=True):
+        """Ids of the subtree under ``category_id``; inactive subtrees are skipped by default"""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        ids = [node.id] if include_self else []
+        stack = list(node.children)
+        while stack:
+            child = stack.pop()
+            if active_only and not child.is_active:
+                continue
+            ids.append(child.id)
+            stack.extend(child.children)
+        return ids
+
+
+def get_tree():
+    """The current category tree, reloaded when a category has changed or it has expired"""
+    version = tag_versions([TAG])[TAG]
+
+    def stale():
+        expired = time.monotonic() - _loaded['loaded_at'] > getattr(settings, 'CATEGORY_TREE_TTL', 60)
+        return _loaded['version'] != version or expired
+
+    if stale():
+        with _lock:
+            if stale():
+                _loaded['tree'] = CategoryTree.load()
+                _loaded['version'] = version
+                _loaded['loaded_at'] = time.monotonic()
+    return _loaded['tree']
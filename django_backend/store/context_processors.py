@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+from .cart import get_cart
+
+
+def cart_count(request):
+    """Add the number of units in the cart to all templates (only computed if a template reads it)"""
+    return {'cart_count': SimpleLazyObject(lambda: get_cart(request).total_quantity)}
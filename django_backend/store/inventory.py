@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Now
+from josmee_shop.cache import invalidate_tags, model_tag
+from sellers.models import SellerStats
+from .models import Product
+
+
+def _invalidate_rows(product_ids):
+    """Stock is shown on cached catalog pages; only the pages showing these products are dropped"""
+    tags = [model_tag(Product, product_id) for product_id in product_ids]
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more lines cannot be reserved"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for {len(shortages)} product(s)")
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(id=product_id, then=Value(qty)) for product_id, qty in quantities.items()],
+        output_field=PositiveIntegerField(),
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Decrement stock for every ``{product_id: qty}`` line, or for none of them.
+
+    Rows are locked in primary key order and decremented with one conditional
+    ``UPDATE ... SET stock = stock - qty WHERE stock >= qty``, so concurrent
+    checkouts can never oversell. On failure a per-line report is raised as
+    ``InsufficientStock.shortages``. Must be called inside a transaction.
+    """
+    quantities = {int(pid): int(qty) for pid, qty in quantities.items() if int(qty) > 0}
+    if not quantities:
+        return
+
+    product_ids = sorted(quantities)
+    try:
+        with transaction.atomic():
+            # Deterministic lock order so overlapping carts cannot deadlock
+            locked = list(
+                Product.objects.select_for_update()
+                .filter(id__in=product_ids)
+                .order_by('id')
+                .values_list('id', 'shop_id', 'stock')
+            )
+            requested = _per_product(quantities)
+            updated = Product.objects.filter(
+                id__in=product_ids, is_active=True, stock__gte=requested
+            ).update(stock=F('stock') - requested, updated_at=Now())
+            if updated != len(product_ids):
+                raise InsufficientStock([])
+    except InsufficientStock:
+        available = dict(
+            Product.objects.filter(id__in=product_ids, is_active=True).values_list('id', 'stock')
+        )
+        shortages = [
+            {'product_id': product_id, 'requested': qty, 'available': available.get(product_id, 0)}
+            for product_id, qty in quantities.items()
+            if available.get(product_id, 0) < qty
+        ]
+        raise InsufficientStock(shortages)
+    _invalidate_rows(product_ids)
+    # Seller out-of-stock counters only move when a line sells out
+    sold_out = defaultdict(int)
+    for product_id, shop_id, stock in locked:
+        if stock == quantities[product_id]:
+            sold_out[shop_id] += 1
+    SellerStats.record_products({shop_id: (0, 0, count) for shop_id, count in sold_out.items()})
+
+
+def release_stock(quantities):
+    """Return ``{product_id: qty}`` to stock, e.g. when an order is cancelled"""
+    quantities = {int(pid): int(qty) for pid, qty in quantities.items() if int(qty) > 0}
+    if not quantities:
+        return
+    returned = _per_product(quantities)
+    with transaction.atomic():
+        products = Product.objects.filter(id__in=quantities)
+        # Products back in stock leave their shop's out-of-stock counter
+        restocked = defaultdict(int)
+        for shop_id, stock in products.select_for_update().order_by('id').values_list('shop_id', 'stock'):
+            if stock == 0:
+                restocked[shop_id] += 1
+        products.update(stock=F('stock') + returned, updated_at=Now())
+        SellerStats.record_products({shop_id: (0, 0, -count) for shop_id, count in restocked.items()})
+    _invalidate_rows(quantities)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from store.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from the product table'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Product search index rebuilt.'))
@@ -0,0 +1,28 @@
+from .cart import CookieStorage, DatabaseStorage, cookie_name
+
+
+class CartMiddleware:
+    """
+    Persists cookie carts and merges them into the user's cart on login.
+
+    Must come after ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cart = getattr(request, '_cart', None)
+        signed_in = hasattr(request, 'user') and request.user.is_authenticated
+        if signed_in and cookie_name() in request.COOKIES:
+            # Signed in on this request (or with a cookie left from before): keep what was picked anonymously
+            anonymous = CookieStorage(request)
+            if cart is not None and isinstance(cart.storage, CookieStorage):
+                anonymous = cart.storage
+            DatabaseStorage(request.user).merge(anonymous.load())
+            response.delete_cookie(cookie_name())
+        elif cart is not None and isinstance(cart.storage, CookieStorage) and cart.storage.modified:
+            cart.storage.write(response)
+        return response
+
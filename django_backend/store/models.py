@@ -1,5 +1,11 @@
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 from django.utils.text import slugify
+from josmee_shop.cache import invalidate_tags
 from shops.models import Shop
 
 class Category(models.Model):
@@ -8,20 +14,61 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # Materialized path: ids from the root down to this category, e.g. "3/17/42/".
+    # Descendants are the categories whose path starts with this one's.
+    path = models.CharField(max_length=255, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(editable=False, default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['name']
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for "path LIKE 'x/%'"
+            models.Index(fields=['path'], opclasses=['varchar_pattern_ops'], name='category_path_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
+    def _parent_path(self):
+        # Read from the database: an in-memory parent may predate a move of its subtree
+        if not self.parent_id:
+            return ''
+        return Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+    
+    def clean(self):
+        if self.path and self._parent_path().startswith(self.path):
+            raise ValidationError({'parent': 'A category cannot be moved under itself or one of its subcategories.'})
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        old_path = self.path
+        parent_path = self._parent_path()
+        if old_path and parent_path.startswith(old_path):
+            raise ValueError(f'Category {self.pk} cannot be its own ancestor')
         super().save(*args, **kwargs)
+        
+        path = f'{parent_path}{self.pk}/'
+        if path != old_path:
+            self.path = path
+            self.depth = path.count('/') - 1
+            Category.objects.filter(pk=self.pk).update(path=path, depth=self.depth)
+            if old_path:
+                # Moved: re-root the whole subtree in one UPDATE
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - (old_path.count('/') - 1)),
+                )
+            # post_save already fired before the paths changed; make cached trees reload again
+            transaction.on_commit(lambda: invalidate_tags('category'))
+    
+    def descendants(self, include_self=True):
+        """This category's subtree, in one indexed prefix query"""
+        categories = Category.objects.filter(path__startswith=self.path)
+        return categories if include_self else categories.exclude(pk=self.pk)
 
 class Product(models.Model):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='products')
@@ -39,6 +86,17 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Storefront listings only ever show active products
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_active=True), name='product_active_newest_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_active=True), name='product_active_price_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], condition=models.Q(is_active=True), name='product_active_cat_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, is_featured=True), name='product_featured_idx'),
+            # Seller dashboard and product management
+            models.Index(fields=['shop', 'is_active', 'stock'], name='product_shop_active_idx'),
+            # Shop page: a shop's active products, newest first
+            models.Index(fields=['shop', '-created_at'], condition=models.Q(is_active=True), name='product_shop_newest_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -51,6 +109,19 @@ class Product(models.Model):
     @property
     def in_stock(self):
         return self.stock > 0
+    
+    @property
+    def current_price(self):
+        """
+        Price after the best ongoing event discount (see promotions.pricing).
+
+        Querysets that show prices should ``select_related('effective_price')``
+        so this reads the already joined row.
+        """
+        effective = getattr(self, 'effective_price', None)
+        if effective is not None and effective.valid_until >= timezone.now():
+            return effective.price
+        return self.price
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -64,3 +135,24 @@ class ProductImage(models.Model):
 
     def __str__(self):
         return f"Image for {self.product.name}"
+
+
+class CartLine(models.Model):
+    """
+    One product in a signed-in customer's cart.
+
+    Lines are written one at a time (see ``store.cart.DatabaseStorage``), so
+    changing a quantity touches a single small row instead of the session.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart_lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_cart_line'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for {self.user_id}"
@@ -0,0 +1,147 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with ``WHERE (key, id) > (last_key, last_id) ORDER BY key, id
+LIMIT n`` instead of ``OFFSET``, so page 1000 costs the same as page 1 and no
+``COUNT(*)`` is needed. Cursors are opaque url-safe strings.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+# sort option -> ordering; the primary key is always the final tie-breaker
+ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+    'relevance': ('search_rank', 'id'),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, backwards=False):
+    payload = json.dumps({'v': values, 'b': backwards}, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['v']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, bool(payload.get('b'))
+
+
+def approximate_count(queryset):
+    """
+    Row estimate for ``queryset`` without scanning it where the database can
+    provide one (PostgreSQL planner statistics); exact ``count()`` otherwise.
+    """
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return queryset.count()
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Paginate ``queryset`` on ``ordering`` (a tuple ending in the primary key)"""
+
+    def __init__(self, queryset, ordering, per_page=12):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def _output_field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _values(self, obj):
+        return [getattr(obj, name) for name in self.fields]
+
+    def _to_python(self, name, value):
+        """A cursor value as the field's Python type; anything else is a bad cursor"""
+        if value is None or isinstance(value, (list, dict)):
+            raise InvalidCursor(value)
+        try:
+            return self._output_field(name).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(value)
+
+    def _after(self, values, descending):
+        """Q for rows strictly after ``values`` in the given direction"""
+        values = [self._to_python(name, value) for name, value in zip(self.fields, values)]
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for previous, value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None):
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            values, backwards = decode_cursor(cursor)
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            # Walking backwards means scanning in the opposite direction
+            queryset = queryset.filter(self._after(values, self.descending != backwards))
+
+        if backwards:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = encode_cursor(self._values(rows[-1]))
+            if (has_more and backwards) or (cursor and not backwards):
+                previous_cursor = encode_cursor(self._values(rows[0]), backwards=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
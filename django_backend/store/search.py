@@ -0,0 +1,109 @@
+"""
+Full-text product search.
+
+On SQLite products are indexed in an FTS5 table (``store_product_fts``) that is
+kept in sync from the ``Product`` save/delete signals. On PostgreSQL the index is
+a GIN expression index over ``to_tsvector`` (see migration 0002), so no sync is
+needed. Any other backend falls back to ``icontains`` filtering.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'store_product_fts'
+
+# Must match the expression of the GIN index created in migration 0002
+PG_VECTOR = (
+    "to_tsvector('english', coalesce(store_product.name, '') || ' ' || "
+    "coalesce(store_product.description, ''))"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split a raw search string into lowercase word tokens"""
+    return [token.lower() for token in TOKEN_RE.findall(query or '')]
+
+
+def _fts5_query(tokens):
+    # Every token must match, as a prefix so partial words from the search box hit
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _tsquery(tokens):
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def search_products(queryset, query):
+    """
+    Filter a Product queryset by a search string, ordered by relevance.
+
+    The returned queryset is annotated with ``search_rank`` (lower is more
+    relevant) and ordered by ``(search_rank, id)``, so it can be re-ordered
+    (e.g. by price) or keyset-paginated on the rank like any other field.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = store_product.id', f'{FTS_TABLE} MATCH %s'],
+            params=[_fts5_query(tokens)],
+        )
+        rank = RawSQL(f'{FTS_TABLE}.rank', [], output_field=FloatField())
+    elif vendor == 'postgresql':
+        queryset = queryset.extra(
+            where=[f"{PG_VECTOR} @@ to_tsquery('english', %s)"],
+            params=[_tsquery(tokens)],
+        )
+        rank = RawSQL(
+            f"-ts_rank({PG_VECTOR}, to_tsquery('english', %s))",
+            [_tsquery(tokens)],
+            output_field=FloatField(),
+        )
+    else:
+        condition = Q()
+        for token in tokens:
+            condition &= Q(name__icontains=token) | Q(description__icontains=token)
+        queryset = queryset.filter(condition)
+        rank = Value(0.0, output_field=FloatField())
+
+    return queryset.annotate(search_rank=rank).order_by('search_rank', 'id')
+
+
+def index_product(product):
+    """Insert or refresh a product's row in the SQLite FTS index"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+            [product.pk, product.name, product.description or ''],
+        )
+
+
+def unindex_product(product_id):
+    """Remove a product from the SQLite FTS index"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_index():
+    """Re-populate the SQLite FTS index from the product table"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+            f"SELECT id, name, coalesce(description, '') FROM store_product"
+        )
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from josmee_shop.cache import invalidate_instance
+from .models import Category, Product
+from .search import index_product, unindex_product
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    """Keep the full-text search index in sync with product edits"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'name', 'description'} & set(update_fields):
+        return
+    index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drop deleted products from the full-text search index"""
+    unindex_product(instance.pk)
+
+
+for model in (Product, Category):
+    post_save.connect(invalidate_instance, sender=model, dispatch_uid=f'cache-save-{model._meta.label}')
+    post_delete.connect(invalidate_instance, sender=model, dispatch_uid=f'cache-delete-{model._meta.label}')
@@ -0,0 +1,246 @@
+import base64
+import json
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from shops.models import Shop
+from .cart import LEGACY_SESSION_KEY, get_cart
+from .inventory import release_stock, reserve_stock
+from .models import CartLine, Category, Product
+from .pagination import ORDERINGS, InvalidCursor, KeysetPaginator, decode_cursor
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        for n in range(30):
+            Product.objects.create(shop=shop, name=f'Product {n}', price=n + 1, stock=5)
+
+    def test_walks_every_product_once(self):
+        paginator = KeysetPaginator(Product.objects.all(), ORDERINGS['price_low'], per_page=12)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen += [product.pk for product in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, list(Product.objects.order_by('price', 'id').values_list('pk', flat=True)))
+
+    def test_malformed_cursors_are_invalid(self):
+        paginator = KeysetPaginator(Product.objects.all(), ORDERINGS['newest'])
+        cursors = [
+            'not-a-cursor',
+            raw_cursor([1, 2]),
+            raw_cursor({'v': 'abc'}),
+            raw_cursor({'v': {'a': 1}}),
+            raw_cursor({'v': [1]}),
+            raw_cursor({'v': ['not a date', 1]}),
+            raw_cursor({'v': ['2024-01-01T00:00:00', 'x']}),
+            raw_cursor({'v': [None, 1]}),
+            raw_cursor({'v': [[1], {'a': 1}]}),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+    def test_decode_rejects_non_list_values(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(raw_cursor({'v': 5}))
+
+    def test_views_do_not_fail_on_bad_cursors(self):
+        cursor = raw_cursor({'v': [{'x': 1}, 'y']})
+        response = self.client.get(reverse('store:product_list'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('store:search_api'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        category = Category.objects.create(name='Kitchen', slug='kitchen')
+        cls.mug = Product.objects.create(shop=shop, category=category, name='Mug', slug='mug', price=10, stock=7)
+        cls.lamp = Product.objects.create(name='Lamp', slug='lamp', shop=shop, price=20, stock=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def reserve(self, product, qty):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            reserve_stock({product.pk: qty})
+
+    def get_detail(self, product):
+        return self.client.get(reverse('store:product_detail', args=[product.slug]))
+
+    def test_stock_change_drops_only_pages_showing_the_product(self):
+        self.assertContains(self.get_detail(self.mug), '(7 available)')
+        self.get_detail(self.lamp)
+        with self.assertNumQueries(0):
+            self.get_detail(self.mug)
+            self.get_detail(self.lamp)
+
+        self.reserve(self.mug, 2)
+
+        with self.assertNumQueries(0):
+            self.get_detail(self.lamp)
+        self.assertContains(self.get_detail(self.mug), '(5 available)')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_stock({self.mug.pk: 2})
+        self.assertContains(self.get_detail(self.mug), '(7 available)')
+
+    def test_related_products_tag_the_page(self):
+        lid = Product.objects.create(shop=self.mug.shop, category=self.mug.category, name='Lid', slug='lid', price=2, stock=3)
+        self.get_detail(self.mug)
+        with self.assertNumQueries(0):
+            self.get_detail(self.mug)
+        self.reserve(lid, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.get_detail(self.mug)
+        self.assertTrue(queries.captured_queries, 'the page showing the sold product was served from the cache')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are read from SQLite EXPLAIN QUERY PLAN')
+class ListingQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        cls.shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        cls.category = Category.objects.create(name='Kitchen', slug='kitchen')
+        Product.objects.bulk_create([
+            Product(shop=cls.shop, category=cls.category if n % 2 else None, name=f'P{n}', slug=f'p{n}',
+                    price=n + 1, stock=n % 3, is_active=n % 5 != 0)
+            for n in range(50)
+        ])
+
+    def assertPlanUses(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_listing_queries_use_their_indexes(self):
+        active = Product.objects.filter(is_active=True)
+        self.assertPlanUses(active.order_by('-created_at', '-id')[:13], 'product_active_newest_idx')
+        self.assertPlanUses(active.order_by('price', 'id')[:13], 'product_active_price_idx')
+        self.assertPlanUses(
+            active.filter(category=self.category).order_by('-created_at', '-id')[:13], 'product_active_cat_idx'
+        )
+
+    def test_shop_queries_use_shop_indexes(self):
+        # The shop page
+        self.assertPlanUses(self.shop.products.filter(is_active=True)[:12], 'product_shop_newest_idx')
+        # Seller product counters are counted from the index alone
+        counts = Product.objects.filter(shop_id__in=[self.shop.pk]).values('shop_id').annotate(
+            active=Count('id', filter=Q(is_active=True)), out=Count('id', filter=Q(stock=0)),
+        )
+        self.assertIn('USING COVERING INDEX product_shop_active_idx', counts.explain())
+
+
+class CartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        shop = Shop.objects.create(owner=owner, name='Shop', slug='shop', email='shop@example.com', phone='1', address='x')
+        cls.mug = Product.objects.create(shop=shop, name='Mug', slug='mug', price=10, stock=7)
+        cls.lamp = Product.objects.create(shop=shop, name='Lamp', slug='lamp', price=20, stock=5)
+        cls.buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+
+    def add(self, product, qty=1):
+        return self.client.post(reverse('store:cart_add', args=[product.pk]), {'qty': qty})
+
+    def cookie_cart(self):
+        """The anonymous cart the client's cookies currently hold"""
+        request = RequestFactory().get('/')
+        request.COOKIES = {name: morsel.value for name, morsel in self.client.cookies.items()}
+        request.user = AnonymousUser()
+        return get_cart(request).quantities
+
+    def lines(self):
+        return dict(CartLine.objects.filter(user=self.buyer).values_list('product_id', 'quantity'))
+
+    def test_cookie_cart_round_trip(self):
+        self.add(self.mug, 2)
+        self.add(self.lamp)
+        self.add(self.mug)
+
+        self.assertEqual(self.cookie_cart(), {self.mug.pk: 3, self.lamp.pk: 1})
+        self.assertFalse(CartLine.objects.exists())
+        self.assertNotIn(LEGACY_SESSION_KEY, self.client.session)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(self.mug)
+        signed = self.client.cookies['cart'].value
+        self.client.cookies['cart'] = signed.replace(f'{self.mug.pk}:1', f'{self.mug.pk}:9')
+        self.assertEqual(self.cookie_cart(), {})
+        self.client.cookies['cart'] = f'{self.mug.pk}:9'
+        self.assertEqual(self.cookie_cart(), {})
+
+    def test_login_request_merges_the_cookie_cart(self):
+        CartLine.objects.create(user=self.buyer, product=self.mug, quantity=1)
+        self.add(self.mug, 2)
+        self.add(self.lamp)
+
+        response = self.client.post(reverse('accounts:login'), {'username': 'buyer', 'password': 'pw'})
+
+        self.assertEqual(self.lines(), {self.mug.pk: 3, self.lamp.pk: 1})
+        self.assertEqual(response.cookies['cart'].value, '')
+        # Nothing is merged twice on the next request
+        self.client.get(reverse('store:cart'))
+        self.assertEqual(self.lines(), {self.mug.pk: 3, self.lamp.pk: 1})
+
+    def test_adding_a_product_again_updates_its_line(self):
+        self.client.force_login(self.buyer)
+        self.add(self.mug, 2)
+        self.add(self.mug, 3)
+        self.assertEqual(CartLine.objects.filter(user=self.buyer).count(), 1)
+        self.assertEqual(self.lines(), {self.mug.pk: 5})
+
+        self.client.post(reverse('store:cart_update', args=[self.mug.pk]), {'qty': 1})
+        self.assertEqual(self.lines(), {self.mug.pk: 1})
+
+    def test_legacy_session_carts_are_adopted_once(self):
+        self.client.force_login(self.buyer)
+        legacy_formats = [
+            {str(self.mug.pk): 2, str(self.lamp.pk): 1},
+            {str(self.mug.pk): {'qty': 2, 'price': '10', 'name': 'Mug'}, str(self.lamp.pk): {'qty': 1}},
+        ]
+        for legacy in legacy_formats:
+            with self.subTest(legacy=legacy):
+                CartLine.objects.all().delete()
+                session = self.client.session
+                session[LEGACY_SESSION_KEY] = legacy
+                session.save()
+
+                self.client.get(reverse('store:cart'))
+                self.client.get(reverse('store:cart'))
+
+                self.assertEqual(self.lines(), {self.mug.pk: 2, self.lamp.pk: 1})
+                self.assertNotIn(LEGACY_SESSION_KEY, self.client.session)
+
+    def test_anonymous_legacy_session_cart_moves_to_the_cookie(self):
+        session = self.client.session
+        session[LEGACY_SESSION_KEY] = {str(self.mug.pk): {'qty': 2}}
+        session.save()
+
+        self.client.get(reverse('store:cart'))
+
+        self.assertEqual(self.cookie_cart(), {self.mug.pk: 2})
+        self.assertNotIn(LEGACY_SESSION_KEY, self.client.session)
+
@@ -1,14 +1,48 @@
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
 from django.contrib import messages
-from django.core.paginator import Paginator
+from josmee_shop.cache import add_cache_tags, cache_anonymous_page, model_tag
 from .models import Product, Category
+from .pagination import ORDERINGS, InvalidCursor, KeysetPaginator, approximate_count
+from .search import search_products
+from .cart import get_cart
+from .category_tree import get_tree
 
 BRAND = "Josmee Online Shopping"
+PRODUCTS_PER_PAGE = 12
 
+
+def _keyset_page(request, products, sort_by):
+    """Fetch the page at ``?cursor=`` plus previous/next links that keep the other filters"""
+    paginator = KeysetPaginator(products, ORDERINGS[sort_by], PRODUCTS_PER_PAGE)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginator.page()
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        params['cursor'] = cursor
+        return f'?{params.urlencode()}'
+
+    return page, link(page.previous_cursor), link(page.next_cursor)
+
+
+def _tag_products(request, products):
+    """Cached pages showing ``products`` are dropped when any of them changes (e.g. its stock)"""
+    add_cache_tags(request, *[model_tag(Product, product.pk) for product in products])
+
+
+@cache_anonymous_page('product', 'category', 'shop')
 def home(request):
-    featured_products = Product.objects.filter(is_active=True, is_featured=True)[:6]
+    featured_products = list(
+        Product.objects.filter(is_active=True, is_featured=True).select_related('shop', 'effective_price')[:6]
+    )
+    _tag_products(request, featured_products)
     categories = Category.objects.filter(is_active=True, parent=None)[:6]
     
     context = {
@@ -19,61 +53,72 @@ def home(request):
     return render(request, "home.html", context)
 
 def product_list(request):
-    products = Product.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True).select_related('shop', 'effective_price')
     categories = Category.objects.filter(is_active=True)
     
     # Search functionality
     search_query = request.GET.get('search', '')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
     
     # Category filter
     category_slug = request.GET.get('category', '')
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=category)
+        products = products.filter(category_id__in=get_tree().descendant_ids(category.pk))
     
-    # Price sorting
+    # Sorting; search results default to relevance, everything else to newest
     sort_by = request.GET.get('sort', '')
-    if sort_by == 'price_low':
-        products = products.order_by('price')
-    elif sort_by == 'price_high':
-        products = products.order_by('-price')
-    elif sort_by == 'newest':
-        products = products.order_by('-created_at')
+    if sort_by not in ORDERINGS or (sort_by == 'relevance' and not search_query):
+        sort_by = 'relevance' if search_query else 'newest'
+    
+    page, previous_url, next_url = _keyset_page(request, products, sort_by)
     
     context = {
-        "products": products,
+        "products": page,
         "categories": categories,
         "search_query": search_query,
         "category_slug": category_slug,
         "sort_by": sort_by,
+        "previous_url": previous_url,
+        "next_url": next_url,
     }
     return render(request, "products/product_list.html", context)
 
+@cache_anonymous_page('product', 'category', 'shop')
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, is_active=True)
-    related_products = Product.objects.filter(
+    product = get_object_or_404(Product.objects.select_related('effective_price'), slug=slug, is_active=True)
+    related_products = list(Product.objects.filter(
         category=product.category, 
         is_active=True
-    ).exclude(id=product.id)[:4]
+    ).exclude(id=product.id).select_related('effective_price')[:4])
+    _tag_products(request, [product, *related_products])
     
     context = {
         "product": product,
         "related_products": related_products,
+        "category_ancestors": get_tree().ancestors(product.category_id),
     }
     return render(request, "products/product_detail.html", context)
 
+@cache_anonymous_page('product', 'category', 'shop')
 def category_detail(request, slug):
     category = get_object_or_404(Category, slug=slug, is_active=True)
-    products = Product.objects.filter(category=category, is_active=True)
+    tree = get_tree()
+    # Products of this category and every active subcategory
+    products = Product.objects.filter(
+        category_id__in=tree.descendant_ids(category.pk), is_active=True
+    ).select_related('shop', 'effective_price')
+    page, previous_url, next_url = _keyset_page(request, products, 'newest')
+    _tag_products(request, page)
     
     context = {
         "category": category,
-        "products": products,
+        "breadcrumbs": tree.ancestors(category.pk),
+        "subcategories": tree.children(category.pk),
+        "products": page,
+        "previous_url": previous_url,
+        "next_url": next_url,
     }
     return render(request, "products/category_detail.html", context)
 
@@ -86,19 +131,21 @@ def contact(request):
 def search_api(request):
     """API endpoint for product search with JSON response"""
     search_query = request.GET.get('q', '').strip()
-    page = request.GET.get('page', 1)
     
-    products = Product.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True).select_related('effective_price')
     
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
-    
-    # Pagination
-    paginator = Paginator(products, 12)
-    page_obj = paginator.get_page(page)
+        products = search_products(products, search_query)
+        ordering = ORDERINGS['relevance']
+    else:
+        ordering = ORDERINGS['newest']
+    
+    # Keyset pagination: pass back next_cursor/previous_cursor as ?cursor=
+    paginator = KeysetPaginator(products, ordering, PRODUCTS_PER_PAGE)
+    try:
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
     
     # Format results
     results = []
@@ -107,21 +154,25 @@ def search_api(request):
             'id': product.id,
             'name': product.name,
             'slug': product.slug,
-            'price': str(product.price),
+            'price': str(product.current_price),
+            'original_price': str(product.price),
             'image': product.image.url if product.image else '/placeholder.svg',
             'description': product.description[:100] if product.description else '',
             'in_stock': product.in_stock,
             'stock': product.stock,
         })
     
-    return JsonResponse({
+    data = {
         'results': results,
-        'total': paginator.count,
-        'page': page_obj.number,
-        'pages': paginator.num_pages,
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
         'has_next': page_obj.has_next(),
         'has_previous': page_obj.has_previous(),
-    })
+    }
+    # Counting is the expensive part of a listing, so it is opt-in and estimated
+    if request.GET.get('with_total'):
+        data['total'] = approximate_count(products)
+    return JsonResponse(data)
 
 def products_api(request):
     items = [
@@ -133,28 +184,14 @@ def products_api(request):
 
 def cart(request):
     """Display the shopping cart"""
-    cart_data = request.session.get('cart', {})
-    items = []
-    subtotal = 0
-    
-    for product_id, qty in cart_data.items():
-        try:
-            product = Product.objects.get(id=product_id, is_active=True)
-            line_total = product.price * qty
-            subtotal += line_total
-            items.append({
-                'product': product,
-                'qty': qty,
-                'line_total': line_total
-            })
-        except Product.DoesNotExist:
-            continue
+    cart = get_cart(request)
+    subtotal = cart.subtotal
     
     discount = request.session.get('cart_discount', 0)
     total = subtotal - discount
     
     context = {
-        'items': items,
+        'items': cart.items,
         'subtotal': subtotal,
         'discount': discount,
         'total': total,
@@ -167,15 +204,7 @@ def cart_add(request, product_id):
     
     if request.method == 'POST':
         qty = int(request.POST.get('qty', 1))
-        cart_data = request.session.get('cart', {})
-        
-        if str(product_id) in cart_data:
-            cart_data[str(product_id)] += qty
-        else:
-            cart_data[str(product_id)] = qty
-        
-        request.session['cart'] = cart_data
-        request.session.modified = True
+        get_cart(request).add(product.id, qty)
         messages.success(request, f'{product.name} added to cart!')
     
     return redirect('store:cart')
@@ -184,26 +213,14 @@ def cart_update(request, product_id):
     """Update product quantity in cart"""
     if request.method == 'POST':
         qty = int(request.POST.get('qty', 1))
-        cart_data = request.session.get('cart', {})
-        
-        if qty > 0:
-            cart_data[str(product_id)] = qty
-        else:
-            cart_data.pop(str(product_id), None)
-        
-        request.session['cart'] = cart_data
-        request.session.modified = True
+        get_cart(request).set(product_id, qty)
         messages.success(request, 'Cart updated!')
     
     return redirect('store:cart')
 
 def cart_remove(request, product_id):
     """Remove a product from the cart"""
-    cart_data = request.session.get('cart', {})
-    cart_data.pop(str(product_id), None)
-    
-    request.session['cart'] = cart_data
-    request.session.modified = True
+    get_cart(request).remove(product_id)
     messages.success(request, 'Item removed from cart!')
     
     return redirect('store:cart')
@@ -1,12 +1,11 @@
+from django.utils.functional import SimpleLazyObject
 from .models import Wishlist
 
 
 def wishlist_count(request):
-    """Add wishlist count to all templates"""
-    if request.user.is_authenticated:
-        try:
-            wishlist = Wishlist.objects.get(user=request.user)
-            return {'wishlist_count': wishlist.item_count}
-        except Wishlist.DoesNotExist:
-            return {'wishlist_count': 0}
-    return {'wishlist_count': 0}
+    """Add wishlist count to all templates (only computed if a template reads it)"""
+    def count():
+        if request.user.is_authenticated:
+            return Wishlist.cached_item_count(request.user)
+        return 0
+    return {'wishlist_count': SimpleLazyObject(count)}
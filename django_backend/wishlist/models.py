@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.db import models
 from accounts.models import CustomUser
 from store.models import Product
@@ -15,6 +16,20 @@ class Wishlist(models.Model):
     @property
     def item_count(self):
         return self.items.count()
+    
+    @staticmethod
+    def count_cache_key(user_id):
+        return f'wishlist:count:{user_id}'
+    
+    @classmethod
+    def cached_item_count(cls, user):
+        """Number of wishlist items for a user, cached until the wishlist changes"""
+        key = cls.count_cache_key(user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = WishlistItem.objects.filter(wishlist__user=user).count()
+            cache.set(key, count, 60 * 60)
+        return count
 
 
 class WishlistItem(models.Model):
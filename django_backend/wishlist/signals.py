@@ -0,0 +1,13 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Wishlist, WishlistItem
+
+
+@receiver(post_save, sender=WishlistItem)
+@receiver(post_delete, sender=WishlistItem)
+def invalidate_wishlist_count(sender, instance, **kwargs):
+    """Drop the cached wishlist badge count when items are added or removed"""
+    user_id = Wishlist.objects.filter(pk=instance.wishlist_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        cache.delete(Wishlist.count_cache_key(user_id))